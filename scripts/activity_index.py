@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Índice de atividade para processamento offline em duas passadas
+
+A primeira passada decodifica o vídeo de forma barata (amostrando frames, ou
+apenas keyframes com PyAV), mede movimento dentro da ROI e grava os trechos
+ativos em `<video>.activity.json`. A segunda passada (process_video com
+activity_index) roda o modelo apenas nesses trechos.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+from lazy_imports import LazyModule, is_available
+from motion_gate import MotionGate
+from vision_utils import iter_capture_samples
+
+cv2 = LazyModule('cv2')
+# PyAV (opcional): permite decodificar apenas keyframes
+av = LazyModule('av')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.activity.json'
+
+DEFAULT_SETTINGS = {
+    'sample_every': 5,
+    'keyframes_only': False,
+    'scale': 0.25,
+    'pixel_threshold': 25,
+    'min_changed_ratio': 0.002,
+    'pad_seconds': 1.0,
+    'merge_gap_seconds': 2.0
+}
+
+
+def index_path_for(video_path):
+    """Caminho do índice ao lado do vídeo"""
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + INDEX_SUFFIX)
+
+
+def effective_params(settings=None):
+    """Parâmetros que de fato definem o índice (padrões + config, sem chaves alheias)"""
+    settings = settings or {}
+    params = {key: settings.get(key, default) for key, default in DEFAULT_SETTINGS.items()}
+    if params['keyframes_only'] and not is_available('av'):
+        params['keyframes_only'] = False
+    return params
+
+
+def _roi_key(roi_points):
+    return [list(point) for point in roi_points] if roi_points is not None else None
+
+
+def index_matches(index, roi_points=None, settings=None):
+    """True se o índice foi construído com a mesma ROI e os mesmos parâmetros"""
+    return ('roi_points' in index and index['roi_points'] == _roi_key(roi_points)
+            and index.get('params') == effective_params(settings))
+
+
+def _iter_samples_opencv(video_path, sample_every):
+    """Frames amostrados com OpenCV: grab() nos demais evita a conversão de cor"""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise RuntimeError(f"Erro ao abrir vídeo: {video_path}")
+
+    try:
+        yield from iter_capture_samples(cap, sample_every)
+    finally:
+        cap.release()
+
+
+def _iter_samples_keyframes(video_path):
+    """Apenas keyframes com PyAV (o decodificador descarta os demais frames)"""
+    with av.open(str(video_path)) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = 'NONKEY'
+        rate = float(stream.average_rate or 30)
+        time_base = float(stream.time_base)
+
+        for frame in container.decode(stream):
+            index = int(round(frame.pts * time_base * rate)) if frame.pts is not None else 0
+            yield index, frame.to_ndarray(format='bgr24')
+
+
+def _video_info(video_path):
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, frame_count
+
+
+def segments_from_samples(active_samples, fps, frame_count, sample_step, pad_seconds, merge_gap_seconds):
+    """Converte amostras ativas em trechos [início, fim] com margem e fusão"""
+    pad = int(pad_seconds * fps) + sample_step
+    merge_gap = int(merge_gap_seconds * fps)
+    last_frame = max(0, frame_count - 1)
+
+    segments = []
+    for index in sorted(active_samples):
+        start = max(0, index - pad)
+        end = min(last_frame, index + pad)
+        if segments and start <= segments[-1][1] + merge_gap:
+            segments[-1][1] = max(segments[-1][1], end)
+        else:
+            segments.append([start, end])
+
+    return segments
+
+
+def build_activity_index(video_path, roi_points=None, settings=None, save=True):
+    """Primeira passada: mede movimento na ROI e grava os trechos ativos"""
+    video_path = Path(video_path)
+    if not video_path.exists():
+        raise FileNotFoundError(f"Vídeo não encontrado: {video_path}")
+
+    params = effective_params(settings)
+    keyframes_only = params['keyframes_only']
+    if (settings or {}).get('keyframes_only') and not keyframes_only:
+        logger.warning("⚠️ PyAV não instalado, usando amostragem com OpenCV")
+
+    fps, frame_count = _video_info(video_path)
+    gate = MotionGate(roi_points, scale=params['scale'],
+                      pixel_threshold=params['pixel_threshold'])
+
+    if keyframes_only:
+        samples = _iter_samples_keyframes(video_path)
+    else:
+        samples = _iter_samples_opencv(video_path, params['sample_every'])
+
+    start_time = time.time()
+    active_samples = []
+    sample_count = 0
+    previous_index = 0
+    max_step = 1
+
+    for index, frame in samples:
+        score = gate.motion_score(frame)
+        if sample_count > 0 and score >= params['min_changed_ratio']:
+            active_samples.append(index)
+        max_step = max(max_step, index - previous_index)
+        previous_index = index
+        sample_count += 1
+
+    frame_count = max(frame_count, previous_index + 1)
+    segments = segments_from_samples(active_samples, fps, frame_count, max_step,
+                                     params['pad_seconds'], params['merge_gap_seconds'])
+    active_frames = sum(end - start + 1 for start, end in segments)
+
+    stat = video_path.stat()
+    index = {
+        'video': video_path.name,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'fps': fps,
+        'frame_count': frame_count,
+        'params': params,
+        'roi_points': _roi_key(roi_points),
+        'samples': sample_count,
+        'segments': [
+            {'start_frame': start, 'end_frame': end,
+             'start_s': start / fps, 'end_s': (end + 1) / fps}
+            for start, end in segments
+        ],
+        'active_frames': active_frames,
+        'active_ratio': active_frames / frame_count if frame_count else 0.0,
+        'index_time_s': time.time() - start_time
+    }
+
+    logger.info(f"🗂️ Índice de atividade: {len(segments)} trechos, "
+                f"{index['active_ratio'] * 100:.1f}% do vídeo ativo "
+                f"({sample_count} amostras em {index['index_time_s']:.1f}s)")
+
+    if save:
+        path = index_path_for(video_path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        tmp_path.replace(path)
+        logger.info(f"💾 Índice salvo em: {path}")
+
+    return index
+
+
+def load_activity_index(video_path, index_path=None):
+    """Carrega o índice se ele ainda corresponde ao vídeo (tamanho e data)"""
+    video_path = Path(video_path)
+    path = Path(index_path) if index_path else index_path_for(video_path)
+    if not path.exists():
+        return None
+
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+
+    stat = video_path.stat()
+    if index.get('size') != stat.st_size or index.get('mtime') != stat.st_mtime:
+        logger.warning(f"⚠️ Índice desatualizado para {video_path.name}, ignorando")
+        return None
+
+    return index
+
+
+def get_activity_index(video_path, roi_points=None, settings=None):
+    """Índice em cache ao lado do vídeo, ou construído agora
+
+    O cache só vale se foi construído com a mesma ROI e os mesmos parâmetros.
+    """
+    index = load_activity_index(video_path)
+    if index is not None and not index_matches(index, roi_points, settings):
+        logger.warning(f"⚠️ Índice de {Path(video_path).name} construído com outra ROI ou "
+                       "outros parâmetros, reconstruindo")
+        index = None
+    if index is None:
+        index = build_activity_index(video_path, roi_points, settings)
+    return index
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Índice de trechos ativos de vídeos de esteira")
+    parser.add_argument('videos', nargs='+', help="Vídeos a indexar")
+    parser.add_argument('--roi', help="Arquivo JSON de ROI")
+    parser.add_argument('--sample-every', type=int, default=DEFAULT_SETTINGS['sample_every'])
+    parser.add_argument('--keyframes-only', action='store_true', help="Apenas keyframes (requer PyAV)")
+    parser.add_argument('--min-changed-ratio', type=float, default=DEFAULT_SETTINGS['min_changed_ratio'])
+    parser.add_argument('--pad-seconds', type=float, default=DEFAULT_SETTINGS['pad_seconds'])
+    args = parser.parse_args()
+
+    roi_points = None
+    if args.roi:
+        with open(args.roi, 'r', encoding='utf-8') as f:
+            roi_points = json.load(f)['roi']['points']
+
+    settings = {
+        'sample_every': args.sample_every,
+        'keyframes_only': args.keyframes_only,
+        'min_changed_ratio': args.min_changed_ratio,
+        'pad_seconds': args.pad_seconds
+    }
+
+    for video in args.videos:
+        index = build_activity_index(video, roi_points, settings)
+        print(f"🎬 {index['video']}: {len(index['segments'])} trechos, "
+              f"{index['active_frames']}/{index['frame_count']} frames ativos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
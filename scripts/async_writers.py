@@ -0,0 +1,55 @@
+"""
+Gravação assíncrona em disco com um pool de threads limitado
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWriterPool:
+    """Pool de threads para escrita em disco com limite de tarefas pendentes
+
+    submit() bloqueia quando há `max_pending` tarefas na fila, de modo que a
+    memória (frames aguardando gravação) fica limitada mesmo se o disco atrasar.
+    """
+
+    def __init__(self, workers=4, max_pending=64):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='writer')
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.errors = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Agenda uma escrita; bloqueia se o limite de pendentes foi atingido"""
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self.slots.release()
+        with self.lock:
+            if future.exception() is not None:
+                self.errors += 1
+                logger.error(f"❌ Erro na gravação: {future.exception()}")
+            else:
+                self.completed += 1
+
+    def close(self):
+        """Aguarda todas as escritas pendentes"""
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Rotulagem automática: exporta detecções do modelo como dataset YOLO
+
+Percorre vídeos e pastas de imagens, roda o detector em lotes e grava
+images/<nome>.jpg + labels/<nome>.txt (classe cx cy w h, normalizados); o
+nome leva um hash curto do caminho da fonte. A amostragem é estratificada
+pelo número de detecções no frame e as fontes são intercaladas, para que o
+dataset não fique dominado por esteira vazia ou por um único vídeo ou cena.
+Frames com detecções na faixa de incerteza são descartados: um rótulo
+duvidoso atrapalha mais o retreino do que a ausência do frame.
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+from async_writers import AsyncWriterPool
+from frame_sources import Prefetcher, iter_images, iter_video_samples
+from lazy_imports import LazyModule
+from vision_utils import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, sample_name
+
+cv2 = LazyModule('cv2')
+
+logger = logging.getLogger(__name__)
+
+# Limites inferiores dos estratos por número de detecções: 0, 1, 2-3, 4+
+DEFAULT_STRATA = (0, 1, 2, 4)
+
+
+def stratum_for(count, strata=DEFAULT_STRATA):
+    """Nome do estrato em que cai um frame com `count` detecções"""
+    for i, low in enumerate(strata):
+        high = strata[i + 1] - 1 if i + 1 < len(strata) else None
+        if high is None:
+            if count >= low:
+                return f"{low}+"
+        elif low <= count <= high:
+            return str(low) if low == high else f"{low}-{high}"
+    return str(count)
+
+
+def yolo_lines(boxes, width, height):
+    """Linhas 'classe cx cy w h' normalizadas a partir de caixas x1,y1,x2,y2"""
+    lines = []
+    for x1, y1, x2, y2, _, class_id in boxes:
+        x1, x2 = max(0.0, float(x1)), min(float(width), float(x2))
+        y1, y2 = max(0.0, float(y1)), min(float(height), float(y2))
+        if x2 <= x1 or y2 <= y1:
+            continue
+        cx = (x1 + x2) / 2 / width
+        cy = (y1 + y2) / 2 / height
+        lines.append(f"{int(class_id)} {cx:.6f} {cy:.6f} "
+                     f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}")
+    return lines
+
+
+def _write_sample(image_path, label_path, frame, lines, jpeg_quality):
+    """Grava imagem e rótulo; o rótulo só é escrito se a imagem foi salva"""
+    if not cv2.imwrite(str(image_path), frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]):
+        raise IOError(f"Falha ao gravar {image_path}")
+    label_path.write_text('\n'.join(lines) + ('\n' if lines else ''), encoding='utf-8')
+
+
+def _video_stream(video, sample_every):
+    name = sample_name(video)
+    for index, frame in iter_video_samples(video, sample_every):
+        yield f"{name}_{index:06d}", frame
+
+
+def _image_stream(source):
+    for path, image in iter_images(source):
+        yield sample_name(path), image
+
+
+def _source_streams(sources, sample_every):
+    """Um gerador de itens por vídeo e por pasta (ou arquivo) de imagens"""
+    for source in sources:
+        source = Path(source)
+        if source.is_file() and source.suffix.lower() in VIDEO_EXTENSIONS:
+            yield _video_stream(source, sample_every)
+        elif source.is_dir() or source.suffix.lower() in IMAGE_EXTENSIONS:
+            videos = sorted(p for p in source.iterdir()
+                            if p.suffix.lower() in VIDEO_EXTENSIONS) if source.is_dir() else []
+            for video in videos:
+                yield _video_stream(video, sample_every)
+            yield _image_stream(source)
+        else:
+            logger.warning(f"⚠️ Fonte ignorada: {source}")
+
+
+def iter_sources(sources, sample_every=15, max_open=4):
+    """Itens (nome, frame) de vídeos e pastas/arquivos de imagem, intercalados
+
+    Um item de cada fonte por vez: com cotas por estrato, as primeiras fontes
+    não preenchem sozinhas todas as cotas antes de as demais serem vistas.
+    Só `max_open` fontes ficam abertas (cada vídeo mantém um decodificador);
+    quando uma termina, a próxima entra na janela.
+    """
+    pending = _source_streams(sources, sample_every)
+    streams = deque(itertools.islice(pending, max(1, max_open)))
+    try:
+        while streams:
+            stream = streams.popleft()
+            item = next(stream, None)
+            if item is None:
+                streams.extend(itertools.islice(pending, 1))
+                continue
+            yield item
+            streams.append(stream)
+    finally:
+        # Interrompido no meio (cotas cheias): libera as capturas abertas
+        for stream in streams:
+            stream.close()
+
+
+class AutoLabeler:
+    """Gera um dataset YOLO a partir das detecções de um PackageDetector"""
+
+    def __init__(self, detector, output_dir, label_conf=0.5, uncertain_conf=0.25,
+                 sample_every=15, max_per_stratum=500, strata=DEFAULT_STRATA,
+                 writers=4, jpeg_quality=95, max_open_sources=4):
+        if uncertain_conf > label_conf:
+            raise ValueError("uncertain_conf deve ser <= label_conf")
+
+        self.detector = detector
+        self.output_dir = Path(output_dir)
+        self.label_conf = label_conf
+        self.uncertain_conf = uncertain_conf
+        self.sample_every = sample_every
+        self.max_per_stratum = max_per_stratum
+        self.strata = tuple(strata)
+        self.writers = writers
+        self.jpeg_quality = jpeg_quality
+        self.max_open_sources = max_open_sources
+
+        self.counts = {}
+        self.seen = 0
+        self.skipped_uncertain = 0
+        self.skipped_quota = 0
+
+    @classmethod
+    def from_config(cls, detector, output_dir, settings):
+        """Cria o rotulador a partir da seção 'auto_label' do config"""
+        return cls(
+            detector, output_dir,
+            label_conf=settings.get('label_conf', 0.5),
+            uncertain_conf=settings.get('uncertain_conf', 0.25),
+            sample_every=settings.get('sample_every', 15),
+            max_per_stratum=settings.get('max_per_stratum', 500),
+            strata=settings.get('strata', DEFAULT_STRATA),
+            writers=settings.get('writers', 4),
+            jpeg_quality=settings.get('jpeg_quality', 95),
+            max_open_sources=settings.get('max_open_sources', 4)
+        )
+
+    def _full(self):
+        return bool(self.max_per_stratum) and len(self.counts) == len(self.strata) and \
+            all(n >= self.max_per_stratum for n in self.counts.values())
+
+    def _select(self, boxes):
+        """Decide se um frame entra no dataset: (estrato, caixas) ou None"""
+        self.seen += 1
+        confidences = boxes[:, 4] if len(boxes) else []
+        if any(self.uncertain_conf <= c < self.label_conf for c in confidences):
+            self.skipped_uncertain += 1
+            return None
+
+        kept = boxes[boxes[:, 4] >= self.label_conf] if len(boxes) else boxes
+        stratum = stratum_for(len(kept), self.strata)
+        if self.max_per_stratum and self.counts.get(stratum, 0) >= self.max_per_stratum:
+            self.skipped_quota += 1
+            return None
+
+        self.counts[stratum] = self.counts.get(stratum, 0) + 1
+        return stratum, kept
+
+    def _label_batch(self, batch, pool, images_dir, labels_dir):
+        # Caixas sem filtro de ROI: um pacote fora da ROI continua visível
+        # na imagem e precisa de rótulo
+        outputs = self.detector.backend.predict(
+            [frame for _, frame in batch], conf=self.uncertain_conf,
+            iou=self.detector.nms_threshold, imgsz=self.detector.input_size)
+
+        for (name, frame), boxes in zip(batch, outputs):
+            selected = self._select(boxes)
+            if selected is None:
+                continue
+            _, kept = selected
+            height, width = frame.shape[:2]
+            pool.submit(_write_sample, images_dir / f"{name}.jpg", labels_dir / f"{name}.txt",
+                        frame, yolo_lines(kept, width, height), self.jpeg_quality)
+
+    def write_data_yaml(self):
+        """data.yaml com as classes do modelo (val aponta para o mesmo conjunto)"""
+        names = self.detector.backend.names or {0: 'package'}
+        lines = [f"path: {self.output_dir.resolve().as_posix()}",
+                 "train: images", "val: images", "names:"]
+        lines += [f"  {int(k)}: {v}" for k, v in sorted(names.items())]
+        path = self.output_dir / 'data.yaml'
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return path
+
+    def run(self, sources):
+        """Rotula as fontes e grava o dataset; retorna o resumo"""
+        images_dir = self.output_dir / 'images'
+        labels_dir = self.output_dir / 'labels'
+        images_dir.mkdir(parents=True, exist_ok=True)
+        labels_dir.mkdir(parents=True, exist_ok=True)
+
+        batch_size = max(1, self.detector.batch_size)
+        start = time.time()
+        loader = Prefetcher(iter_sources(sources, self.sample_every, self.max_open_sources),
+                            maxsize=batch_size * 4)
+
+        with AsyncWriterPool(workers=self.writers, max_pending=batch_size * 8) as pool:
+            batch = []
+            try:
+                for item in loader:
+                    batch.append(item)
+                    if len(batch) == batch_size:
+                        self._label_batch(batch, pool, images_dir, labels_dir)
+                        batch = []
+                        if self._full():
+                            logger.info("✅ Todas as cotas de estrato preenchidas")
+                            break
+                if batch:
+                    self._label_batch(batch, pool, images_dir, labels_dir)
+            finally:
+                loader.close()
+
+        summary = {
+            'output_dir': str(self.output_dir),
+            'frames_seen': self.seen,
+            'written': pool.completed,
+            'write_errors': pool.errors,
+            'skipped_uncertain': self.skipped_uncertain,
+            'skipped_quota': self.skipped_quota,
+            'strata': dict(sorted(self.counts.items())),
+            'label_conf': self.label_conf,
+            'uncertain_conf': self.uncertain_conf,
+            'data_yaml': str(self.write_data_yaml()),
+            'elapsed_s': time.time() - start
+        }
+        with open(self.output_dir / 'auto_label_summary.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        print(f"\n🏷️ ROTULAGEM AUTOMÁTICA")
+        print("="*50)
+        print(f"   - Frames avaliados: {summary['frames_seen']}")
+        print(f"   - Amostras gravadas: {summary['written']} ({summary['write_errors']} erros)")
+        print(f"   - Descartados por incerteza: {summary['skipped_uncertain']}")
+        print(f"   - Descartados por cota: {summary['skipped_quota']}")
+        for stratum, count in summary['strata'].items():
+            print(f"   - Estrato {stratum} detecções: {count}")
+        print(f"   - Tempo: {summary['elapsed_s']:.1f}s")
+        print(f"   - Dataset: {self.output_dir}")
+
+        return summary
+
+
+def main():
+    """Função principal"""
+    from package_detector_tracker import PackageDetector
+
+    parser = argparse.ArgumentParser(description="Exporta detecções como dataset YOLO")
+    parser.add_argument('sources', nargs='+', help="Vídeos e/ou pastas de imagens")
+    parser.add_argument('--model', required=True, help="Modelo .pt")
+    parser.add_argument('--output', required=True, help="Pasta do dataset")
+    parser.add_argument('--config', help="Arquivo config.json")
+    parser.add_argument('--label-conf', type=float, help="Confiança mínima para rotular")
+    parser.add_argument('--uncertain-conf', type=float,
+                        help="Abaixo de --label-conf e acima deste valor o frame é descartado")
+    parser.add_argument('--sample-every', type=int, help="Amostra um frame a cada N do vídeo")
+    parser.add_argument('--max-per-stratum', type=int, help="Máximo de frames por estrato")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config_path = Path(args.config) if args.config else Path(__file__).resolve().parent.parent / "config.json"
+    detector = PackageDetector(args.model, config_path=config_path)
+
+    settings = dict(detector.config.get('auto_label', {}))
+    overrides = {'label_conf': args.label_conf, 'uncertain_conf': args.uncertain_conf,
+                 'sample_every': args.sample_every, 'max_per_stratum': args.max_per_stratum}
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+
+    summary = AutoLabeler.from_config(detector, args.output, settings).run(args.sources)
+    return 0 if summary['write_errors'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
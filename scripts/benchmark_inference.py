@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Benchmark e teste de paridade dos backends de inferência
+
+Executa o mesmo conjunto de frames em cada backend, mede a vazão e compara
+os dicionários de detecção de cada backend com os do backend PyTorch.
+
+Com --profiles, mede a vazão de cada perfil de execução em CPU (lista
+'runtime_profiles' do config) em um processo novo por perfil, já que threads
+inter-op e variáveis do OpenMP só valem antes do primeiro uso do torch.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from inference_backends import create_backend
+from lazy_imports import LazyModule
+from package_detector_tracker import PackageDetector
+from vision_utils import IMAGE_EXTENSIONS, box_iou, iter_capture_samples
+
+cv2 = LazyModule('cv2')
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+
+def load_frames(source, limit=50):
+    """Carrega frames de uma pasta de imagens ou amostrados de um vídeo"""
+    source = Path(source)
+    frames = []
+
+    if source.is_dir():
+        paths = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for path in paths[:limit]:
+            image = cv2.imread(str(path))
+            if image is not None:
+                frames.append(image)
+        return frames
+
+    cap = cv2.VideoCapture(str(source))
+    if not cap.isOpened():
+        raise RuntimeError(f"Erro ao abrir vídeo: {source}")
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = max(1, total_frames // limit) if total_frames > 0 else 1
+
+    try:
+        for _, frame in iter_capture_samples(cap, step):
+            frames.append(frame)
+            if len(frames) >= limit:
+                break
+    finally:
+        cap.release()
+    return frames
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """Pareia detecções por IoU (guloso) e retorna pares, faltantes e extras"""
+    pairs = []
+    used = set()
+
+    for ref in sorted(reference, key=lambda d: -d['confidence']):
+        best_j, best_iou = None, iou_threshold
+        for j, cand in enumerate(candidate):
+            if j in used or cand['class_id'] != ref['class_id']:
+                continue
+            iou = box_iou(ref['bbox'], cand['bbox'])
+            if iou >= best_iou:
+                best_j, best_iou = j, iou
+        if best_j is not None:
+            used.add(best_j)
+            pairs.append((ref, candidate[best_j], best_iou))
+
+    missed = len(reference) - len(pairs)
+    extra = len(candidate) - len(pairs)
+    return pairs, missed, extra
+
+
+def compare_detections(reference_frames, candidate_frames, min_iou=0.95, max_conf_diff=0.01):
+    """Compara as detecções de dois backends frame a frame"""
+    report = {
+        'frames': len(reference_frames),
+        'reference_detections': 0,
+        'candidate_detections': 0,
+        'matched': 0,
+        'missed': 0,
+        'extra': 0,
+        'min_iou': 1.0,
+        'max_conf_diff': 0.0
+    }
+
+    for reference, candidate in zip(reference_frames, candidate_frames):
+        pairs, missed, extra = match_detections(reference, candidate)
+        report['reference_detections'] += len(reference)
+        report['candidate_detections'] += len(candidate)
+        report['matched'] += len(pairs)
+        report['missed'] += missed
+        report['extra'] += extra
+
+        for ref, cand, iou in pairs:
+            report['min_iou'] = min(report['min_iou'], iou)
+            report['max_conf_diff'] = max(report['max_conf_diff'],
+                                          abs(ref['confidence'] - cand['confidence']))
+
+    report['parity'] = (report['missed'] == 0 and report['extra'] == 0
+                        and report['min_iou'] >= min_iou
+                        and report['max_conf_diff'] <= max_conf_diff)
+    return report
+
+
+def run_detector(detector, frames):
+    """Executa o detector em lotes e mede o tempo por frame"""
+    detections = []
+    start = time.perf_counter()
+
+    for i in range(0, len(frames), detector.batch_size):
+        detections.extend(detector.detect_packages_batch(frames[i:i + detector.batch_size]))
+
+    elapsed = time.perf_counter() - start
+    return detections, {
+        'ms_per_frame': elapsed * 1000 / max(1, len(frames)),
+        'fps': len(frames) / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def benchmark_backends(detector, backends, frames, warmup=3):
+    """Roda cada backend no mesmo detector e compara com o primeiro da lista"""
+    results = {}
+    reference = None
+
+    for name in backends:
+        detector.backend = create_backend(name, detector.model_path,
+                                          detector.input_size, detector.batch_size)
+
+        # Aquecimento: a primeira chamada inclui alocações e compilação
+        detector.detect_packages_batch(frames[:max(1, min(warmup, len(frames)))])
+
+        detections, timing = run_detector(detector, frames)
+        results[name] = timing
+        logger.info(f"⚡ {name}: {timing['ms_per_frame']:.1f} ms/frame ({timing['fps']:.1f} FPS)")
+
+        if reference is None:
+            reference = detections
+        else:
+            parity = compare_detections(reference, detections)
+            results[name]['parity'] = parity
+            status = "✅" if parity['parity'] else "❌"
+            logger.info(f"{status} Paridade {name} x {backends[0]}: "
+                        f"{parity['matched']} pareadas, {parity['missed']} faltantes, "
+                        f"{parity['extra']} extras, IoU mín {parity['min_iou']:.3f}, "
+                        f"Δconf máx {parity['max_conf_diff']:.4f}")
+
+    return results
+
+
+def _profile_worker(model_path, roi_path, config, profile, source, frame_limit,
+                    input_size=None, batch_size=None, warmup=3):
+    """Processo novo: aplica o perfil, carrega o modelo e mede a vazão"""
+    config = dict(config)
+    config['runtime_profile'] = dict(profile, enabled=True) if profile else {'enabled': False}
+    fd, config_path = tempfile.mkstemp(suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        detector = PackageDetector(model_path, roi_path, config_path)
+    finally:
+        os.unlink(config_path)
+
+    if input_size:
+        detector.input_size = input_size
+    if batch_size:
+        detector.batch_size = batch_size
+    frames = load_frames(source, frame_limit)
+    detector.detect_packages_batch(frames[:max(1, min(warmup, len(frames)))])
+    _, timing = run_detector(detector, frames)
+    timing['settings'] = detector.runtime_profile
+    return timing
+
+
+def benchmark_profiles(model_path, roi_path, config_path, profiles, source, frame_limit,
+                       input_size=None, batch_size=None):
+    """Vazão por perfil de execução (o primeiro, 'default', sem perfil)"""
+    config = {}
+    if config_path and Path(config_path).exists():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    results = {}
+    ctx = mp.get_context('spawn')
+    for profile in [None] + list(profiles):
+        name = profile['name'] if profile else 'default'
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            timing = pool.submit(_profile_worker, str(model_path), str(roi_path) if roi_path else None,
+                                 config, profile, str(source), frame_limit,
+                                 input_size, batch_size).result()
+        results[name] = timing
+        logger.info(f"🧵 {name}: {timing['ms_per_frame']:.1f} ms/frame ({timing['fps']:.1f} FPS)")
+
+    baseline = results['default']['fps']
+    for timing in results.values():
+        timing['speedup'] = timing['fps'] / baseline if baseline else None
+    return results
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Benchmark e paridade dos backends de inferência")
+    parser.add_argument('--model', required=True, help="Modelo .pt")
+    parser.add_argument('--source', required=True, help="Vídeo ou pasta de imagens (ex.: photos/)")
+    parser.add_argument('--roi', help="Arquivo JSON de ROI")
+    parser.add_argument('--config', help="Arquivo config.json")
+    parser.add_argument('--backends', nargs='+', default=['torch', 'onnx'],
+                        help="Backends a comparar (o primeiro é a referência)")
+    parser.add_argument('--frames', type=int, default=50, help="Número de frames")
+    parser.add_argument('--input-size', type=int, help="Sobrescreve o input_size do config")
+    parser.add_argument('--batch-size', type=int, help="Sobrescreve o batch_size do config")
+    parser.add_argument('--profiles', nargs='*',
+                        help="Mede os perfis de execução do config (todos, ou só os nomes dados)")
+    args = parser.parse_args()
+
+    if args.profiles is not None:
+        config_path = args.config or Path(__file__).resolve().parent.parent / "config.json"
+        with open(config_path, 'r', encoding='utf-8') as f:
+            profiles = json.load(f).get('runtime_profiles', [])
+        if args.profiles:
+            unknown = set(args.profiles) - {p['name'] for p in profiles}
+            if unknown:
+                print(f"❌ Perfis não encontrados no config: {sorted(unknown)}")
+                return 1
+            profiles = [p for p in profiles if p['name'] in args.profiles]
+
+        results = benchmark_profiles(args.model, args.roi, config_path, profiles, args.source,
+                                     args.frames, args.input_size, args.batch_size)
+        print(f"\n🧵 PERFIS DE EXECUÇÃO ({os.cpu_count()} CPUs)")
+        print("="*50)
+        for name, timing in results.items():
+            settings = timing['settings'] or {}
+            print(f"   - {name}: {timing['fps']:.1f} FPS ({timing['ms_per_frame']:.1f} ms/frame, "
+                  f"{timing['speedup']:.2f}x) torch {settings.get('torch_threads', '-')}"
+                  f"/{settings.get('torch_interop_threads', '-')}, "
+                  f"OpenCV {settings.get('opencv_threads', '-')}, "
+                  f"channels_last {settings.get('channels_last', False)}")
+        return 0
+
+    detector = PackageDetector(args.model, args.roi, args.config)
+    if args.input_size:
+        detector.input_size = args.input_size
+    if args.batch_size:
+        detector.batch_size = args.batch_size
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        print("❌ Nenhum frame carregado")
+        return 1
+
+    print(f"🎞️ {len(frames)} frames, input {detector.input_size}, lote {detector.batch_size}")
+    results = benchmark_backends(detector, args.backends, frames)
+
+    failed = [name for name, result in results.items()
+              if 'parity' in result and not result['parity']['parity']]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Checkpoints de processamento longo de vídeo
+
+O estado salvo (posição no vídeo, rastreador, contagem, estatísticas e os
+segmentos de saída já fechados) permite retomar um process_video interrompido
+com os mesmos IDs de rastro e a mesma contagem. O vídeo de saída é gravado em
+segmentos, fechados a cada checkpoint e concatenados no final.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path_for(video_path, output_path=None):
+    """Checkpoint ao lado da saída (ou do vídeo, sem saída)"""
+    base = Path(output_path) if output_path else Path(video_path)
+    return base.with_name(base.name + '.checkpoint.json')
+
+
+def segment_path(output_path, number):
+    """Caminho do segmento `number` do vídeo de saída"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.part{number:03d}{output_path.suffix}")
+
+
+def _to_json(value):
+    # Tipos numpy (centroides, contadores) viram tipos nativos
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Tipo não serializável no checkpoint: {type(value).__name__}")
+
+
+def save_checkpoint(path, video_path, state):
+    """Grava o checkpoint atomicamente (arquivo temporário + replace)"""
+    path = Path(path)
+    stat = Path(video_path).stat()
+    data = {
+        'version': CHECKPOINT_VERSION,
+        'video': str(video_path),
+        'video_size': stat.st_size,
+        'video_mtime': stat.st_mtime,
+        'saved_at': time.time(),
+        **state
+    }
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, default=_to_json, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, video_path):
+    """Checkpoint válido para o vídeo atual, ou None"""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Checkpoint ilegível, ignorado: {e}")
+        return None
+
+    stat = Path(video_path).stat()
+    if data.get('version') != CHECKPOINT_VERSION or data.get('video_size') != stat.st_size \
+            or data.get('video_mtime') != stat.st_mtime:
+        logger.warning(f"⚠️ Checkpoint não corresponde a {Path(video_path).name}, ignorado")
+        return None
+
+    missing = [s for s in data.get('segments', []) if not Path(s).exists()]
+    if missing:
+        logger.warning(f"⚠️ Segmentos de saída ausentes ({len(missing)}), checkpoint ignorado")
+        return None
+    return data
+
+
+def concat_segments(segments, output_path, fps):
+    """Concatena os segmentos no vídeo final e os remove
+
+    Usa o ffmpeg (cópia, sem recodificar) se disponível; senão, regrava os
+    frames com OpenCV.
+    """
+    output_path = Path(output_path)
+    segments = [Path(s) for s in segments]
+    if not segments:
+        return None
+
+    if len(segments) == 1:
+        os.replace(segments[0], output_path)
+        return output_path
+
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        list_path = output_path.with_name(output_path.stem + '.segments.txt')
+        list_path.write_text(''.join(f"file '{s.resolve().as_posix()}'\n" for s in segments),
+                             encoding='utf-8')
+        result = subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                                 '-i', str(list_path), '-c', 'copy', str(output_path)],
+                                capture_output=True, text=True)
+        list_path.unlink()
+        if result.returncode != 0:
+            logger.warning(f"⚠️ ffmpeg falhou, concatenando com OpenCV: {result.stderr.strip()}")
+            ffmpeg = None
+
+    if not ffmpeg:
+        out = None
+        for segment in segments:
+            cap = cv2.VideoCapture(str(segment))
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if out is None:
+                    height, width = frame.shape[:2]
+                    out = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*'mp4v'),
+                                          fps, (width, height))
+                out.write(frame)
+            cap.release()
+        if out:
+            out.release()
+
+    for segment in segments:
+        segment.unlink()
+    logger.info(f"🎞️ {len(segments)} segmentos concatenados em {output_path}")
+    return output_path
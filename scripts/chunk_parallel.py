@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Processamento paralelo de um vídeo longo em trechos, com costura de rastros
+
+O vídeo é dividido em trechos de tempo; cada trecho começa `overlap` frames
+antes do seu núcleo, para o rastreador "aquecer". Os trechos rodam em
+processos separados (um modelo por processo) e depois os rastros são
+costurados: na sobreposição, cada rastro local do trecho k é associado ao
+rastro global do trecho k-1 com que mais coincide (IoU por frame). A contagem
+por linha é refeita sobre os rastros globais, na ordem dos frames.
+
+Tolerância: cada fronteira entre trechos pode dividir ou unir no máximo o
+rastro de um pacote que cruza a linha perto dela, então a contagem difere da
+execução serial em até (trechos - 1). --verify-serial mede a diferença real.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import multiprocessing as mp
+
+from counting_line import LineCounter
+from frame_sources import open_source
+from vision_utils import box_iou
+
+logger = logging.getLogger(__name__)
+
+# Detector do processo (carregado uma vez por processo do pool)
+_DETECTOR = None
+
+# Artefatos por vídeo (mesmo arquivo/diretório): processos paralelos se sobrescreveriam
+PER_VIDEO_SECTIONS = ('detection_cache', 'checkpoint', 'event_recorder', 'crop_gallery')
+# Decisões que dependem do tempo de execução ou do histórico: trechos deixariam de
+# reproduzir a execução serial
+ADAPTIVE_SECTIONS = ('latency_controller', 'model_cascade')
+
+
+def disable_sections(config, sections):
+    """Desliga seções do config; retorna as que estavam ligadas"""
+    disabled = [name for name in sections if config.get(name, {}).get('enabled', False)]
+    for name in sections:
+        config[name] = {'enabled': False}
+    return disabled
+
+
+def plan_chunks(total_frames, chunks, overlap):
+    """Trechos (início, início do núcleo, fim) cobrindo todos os frames"""
+    size = -(-total_frames // chunks)
+    if overlap >= size:
+        raise ValueError(f"Sobreposição ({overlap} frames) deve ser menor que o trecho ({size})")
+    plan = []
+    for core_start in range(0, total_frames, size):
+        core_end = min(core_start + size, total_frames) - 1
+        plan.append((max(0, core_start - overlap), core_start, core_end))
+    return plan
+
+
+def _init_worker(model_path, roi_path, config_path, threads):
+    global _DETECTOR
+    # Antes de importar o modelo: evita que cada processo abra todas as threads
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    from package_detector_tracker import PackageDetector
+
+    _DETECTOR = PackageDetector(model_path, roi_path, config_path)
+    disable_sections(_DETECTOR.config, PER_VIDEO_SECTIONS + ADAPTIVE_SECTIONS)
+
+
+def _process_chunk(video_path, start, core_start, end):
+    frames = {}
+
+    def record(index, detections):
+        frames[index] = [(*d['bbox'], d['confidence'], d.get('track_id')) for d in detections]
+
+    # Um trecho "ativo" só, com rastreador zerado no início
+    index = {'segments': [{'start_frame': start, 'end_frame': end}]}
+    begin = time.time()
+    _DETECTOR.process_video(video_path, None, activity_index=index,
+                            show_preview=False, on_frame=record)
+    counter = _DETECTOR.line_counter
+    return {
+        'start': start,
+        'core_start': core_start,
+        'end': end,
+        'frames': frames,
+        'line': (counter.points, counter.direction) if counter else None,
+        'elapsed_s': time.time() - begin
+    }
+
+
+def stitch_chunks(results, match_iou=0.5, min_match_frames=3):
+    """IDs globais por trecho: lista de dicionários {ID local: ID global}"""
+    next_global = 0
+    mappings = []
+    matched = 0
+
+    for k, chunk in enumerate(results):
+        mapping = {}
+
+        if k > 0:
+            previous, previous_map = results[k - 1], mappings[k - 1]
+            votes = defaultdict(int)
+            for index in range(chunk['start'], chunk['core_start']):
+                current = [d for d in chunk['frames'].get(index, []) if d[5] is not None]
+                before = [d for d in previous['frames'].get(index, [])
+                          if d[5] is not None and d[5] in previous_map]
+                # Melhor par por frame (guloso por IoU)
+                pairs = sorted(((box_iou(c, b), c[5], previous_map[b[5]]) for c in current for b in before),
+                               reverse=True)
+                used_local, used_global = set(), set()
+                for iou, local_id, global_id in pairs:
+                    if iou < match_iou or local_id in used_local or global_id in used_global:
+                        continue
+                    votes[(local_id, global_id)] += 1
+                    used_local.add(local_id)
+                    used_global.add(global_id)
+
+            taken = set()
+            for (local_id, global_id), count in sorted(votes.items(), key=lambda kv: -kv[1]):
+                if count < min_match_frames or local_id in mapping or global_id in taken:
+                    continue
+                mapping[local_id] = global_id
+                taken.add(global_id)
+                matched += 1
+
+        # Rastros novos recebem IDs globais na ordem em que aparecem no núcleo
+        for index in range(chunk['core_start'], chunk['end'] + 1):
+            for d in chunk['frames'].get(index, []):
+                if d[5] is not None and d[5] not in mapping:
+                    mapping[d[5]] = next_global
+                    next_global += 1
+
+        mappings.append(mapping)
+
+    return mappings, next_global, matched
+
+
+def merge_tracks(results, mappings):
+    """Detecções por frame (núcleos dos trechos) com IDs globais"""
+    merged = {}
+    for chunk, mapping in zip(results, mappings):
+        for index in range(chunk['core_start'], chunk['end'] + 1):
+            merged[index] = [
+                {'bbox': list(d[:4]), 'confidence': d[4],
+                 'track_id': mapping.get(d[5]) if d[5] is not None else None}
+                for d in chunk['frames'].get(index, [])
+            ]
+    return merged
+
+
+def count_crossings(merged, total_frames, line):
+    """Contagem por linha sobre os rastros globais, frame a frame"""
+    if not line:
+        return None
+    points, direction = line
+    counter = LineCounter(points, direction)
+    for index in range(total_frames):
+        counter.update(merged.get(index, []))
+    return counter.counts()
+
+
+def run_chunk_parallel(model_path, video_path, roi_path=None, config_path=None, workers=None,
+                       chunks=None, overlap_seconds=2.0, match_iou=0.5, min_match_frames=3):
+    """Processa o vídeo em trechos paralelos e costura os rastros"""
+    source = open_source(video_path)
+    total_frames, fps = source.frame_count, source.fps
+    source.release()
+
+    workers = workers or os.cpu_count() or 1
+    chunks = chunks or workers
+    overlap = int(round(overlap_seconds * fps))
+    plan = plan_chunks(total_frames, chunks, overlap)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    logger.info(f"🧩 {len(plan)} trechos de ~{plan[0][2] + 1} frames, sobreposição {overlap} frames, "
+                f"{workers} processos x {threads} threads")
+
+    if config_path:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            ignored = disable_sections(json.load(f), PER_VIDEO_SECTIONS + ADAPTIVE_SECTIONS)
+        if ignored:
+            logger.warning(f"⚠️ Desligado nos trechos paralelos: {', '.join(ignored)}")
+
+    start_time = time.time()
+    results = [None] * len(plan)
+    ctx = mp.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(str(model_path), str(roi_path) if roi_path else None,
+                                       str(config_path) if config_path else None, threads)) as pool:
+        futures = {pool.submit(_process_chunk, str(video_path), *chunk): k
+                   for k, chunk in enumerate(plan)}
+        for future in as_completed(futures):
+            k = futures[future]
+            results[k] = future.result()
+            logger.info(f"✅ Trecho {k + 1}/{len(plan)} ({results[k]['start']}-{results[k]['end']}) "
+                        f"em {results[k]['elapsed_s']:.1f}s")
+
+    mappings, global_tracks, matched = stitch_chunks(results, match_iou, min_match_frames)
+    merged = merge_tracks(results, mappings)
+    line = next((r['line'] for r in results if r['line']), None)
+    counts = count_crossings(merged, total_frames, line)
+    elapsed = time.time() - start_time
+
+    summary = {
+        'frames_processed': len(merged),
+        'total_packages': counts['total'] if counts else 0,
+        'line_counts': counts,
+        'tracks': global_tracks,
+        'stitched_tracks': matched,
+        'chunks': len(plan),
+        'overlap_frames': overlap,
+        'count_tolerance': len(plan) - 1,
+        'processing_time': elapsed,
+        'average_fps': len(merged) / elapsed if elapsed > 0 else 0,
+        'chunk_times_s': [round(r['elapsed_s'], 2) for r in results]
+    }
+    logger.info(f"🧵 {matched} rastros costurados nas fronteiras, {global_tracks} rastros globais")
+    return summary, merged
+
+
+def run_serial(model_path, video_path, roi_path=None, config_path=None):
+    """Execução serial de referência (mesmo registro por frame)"""
+    from package_detector_tracker import PackageDetector
+
+    detector = PackageDetector(model_path, roi_path, config_path)
+    # Mesmas condições dos trechos, para a comparação valer
+    disable_sections(detector.config, ADAPTIVE_SECTIONS)
+    start_time = time.time()
+    results = detector.process_video(video_path, show_preview=False)
+    results['processing_time'] = time.time() - start_time
+    return results
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Processa um vídeo longo em trechos paralelos")
+    parser.add_argument('video', help="Vídeo a processar")
+    parser.add_argument('--model', required=True, help="Modelo .pt")
+    parser.add_argument('--roi', help="Arquivo JSON de ROI")
+    parser.add_argument('--config', help="Arquivo config.json")
+    parser.add_argument('--workers', type=int, help="Processos em paralelo")
+    parser.add_argument('--chunks', type=int, help="Número de trechos (padrão: um por processo)")
+    parser.add_argument('--overlap', type=float, help="Sobreposição entre trechos, em segundos")
+    parser.add_argument('--output', help="JSON com o resumo e as detecções por frame")
+    parser.add_argument('--verify-serial', action='store_true',
+                        help="Roda também a execução serial e compara as contagens")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config_path = Path(args.config) if args.config else Path(__file__).resolve().parent.parent / "config.json"
+    settings = {}
+    if config_path.exists():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            settings = json.load(f).get('chunk_parallel', {})
+
+    summary, merged = run_chunk_parallel(
+        args.model, args.video, args.roi, config_path,
+        workers=args.workers or settings.get('workers'),
+        chunks=args.chunks or settings.get('chunks'),
+        overlap_seconds=args.overlap if args.overlap is not None else settings.get('overlap_seconds', 2.0),
+        match_iou=settings.get('match_iou', 0.5),
+        min_match_frames=settings.get('min_match_frames', 3)
+    )
+
+    if args.verify_serial:
+        serial = run_serial(args.model, args.video, args.roi, config_path)
+        difference = summary['total_packages'] - serial['total_packages']
+        summary['serial'] = {
+            'total_packages': serial['total_packages'],
+            'processing_time': serial['processing_time'],
+            'difference': difference,
+            'within_tolerance': abs(difference) <= summary['count_tolerance'],
+            'speedup': serial['processing_time'] / summary['processing_time']
+        }
+
+    print(f"\n🧩 PROCESSAMENTO EM TRECHOS")
+    print("="*50)
+    print(f"   - Trechos: {summary['chunks']} (sobreposição de {summary['overlap_frames']} frames)")
+    print(f"   - Frames: {summary['frames_processed']}")
+    print(f"   - Pacotes contados: {summary['total_packages']}")
+    print(f"   - Rastros globais: {summary['tracks']} ({summary['stitched_tracks']} costurados)")
+    print(f"   - Tempo: {summary['processing_time']:.1f}s ({summary['average_fps']:.1f} FPS)")
+    if 'serial' in summary:
+        serial = summary['serial']
+        status = "✅" if serial['within_tolerance'] else "❌"
+        print(f"   - Serial: {serial['total_packages']} pacotes em {serial['processing_time']:.1f}s "
+              f"{status} diferença {serial['difference']} (tolerância {summary['count_tolerance']}), "
+              f"speedup {serial['speedup']:.1f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary,
+                       'frames': {str(k): v for k, v in sorted(merged.items())}}, f, ensure_ascii=False)
+        print(f"💾 {args.output}")
+
+    if 'serial' in summary and not summary['serial']['within_tolerance']:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Contagem de pacotes por linha
+
+Um pacote rastreado é contado uma única vez, quando o centro da sua caixa
+cruza a linha (polilinha do ROI creator do tipo counting_line ou pontos do
+config). A direção do cruzamento é o lado da linha para onde o centro foi.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS = ('any', 'positive', 'negative')
+
+
+def _side(a, b, p):
+    """> 0 à esquerda de a->b, < 0 à direita, 0 sobre a reta"""
+    return (b[0] - a[0]) * (p[1] - a[1]) - (b[1] - a[1]) * (p[0] - a[0])
+
+
+class LineCounter:
+    """Conta rastros que cruzam uma polilinha"""
+
+    def __init__(self, points, direction='any', max_idle=300):
+        if len(points) < 2:
+            raise ValueError("A linha de contagem precisa de pelo menos 2 pontos")
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Direção de contagem desconhecida: {direction}")
+
+        self.points = [tuple(p) for p in points]
+        self.segments = list(zip(self.points[:-1], self.points[1:]))
+        self.direction = direction
+        self.max_idle = max_idle
+
+        self.positions = {}
+        self.counted = set()
+        self.crossed = []
+        self.updates = 0
+        self.total = 0
+        self.positive = 0
+        self.negative = 0
+
+    @classmethod
+    def from_config(cls, settings, points=None):
+        """Cria o contador a partir da seção 'counting_line' do config"""
+        return cls(
+            points or settings['points'],
+            direction=settings.get('direction', 'any'),
+            max_idle=settings.get('max_idle', 300)
+        )
+
+    def crossing(self, p, q):
+        """+1/-1 se o movimento p->q cruza a linha (lado de chegada), senão 0"""
+        for a, b in self.segments:
+            before, after = _side(a, b, p), _side(a, b, q)
+            if not ((before < 0 <= after) or (before > 0 >= after)):
+                continue
+            # O movimento precisa passar dentro do segmento, não no seu prolongamento
+            if _side(p, q, a) * _side(p, q, b) <= 0:
+                return 1 if before < 0 else -1
+        return 0
+
+    def update(self, detections):
+        """Atualiza com as detecções rastreadas de um frame; retorna novos contados
+
+        Os IDs contados neste frame ficam em `crossed`.
+        """
+        self.updates += 1
+        self.crossed = []
+        new = 0
+
+        for detection in detections:
+            track_id = detection.get('track_id')
+            if track_id is None:
+                continue
+
+            x1, y1, x2, y2 = detection['bbox']
+            center = ((x1 + x2) / 2, (y1 + y2) / 2)
+            previous = self.positions.get(track_id)
+            self.positions[track_id] = (center, self.updates)
+
+            if previous is None or track_id in self.counted:
+                continue
+
+            sign = self.crossing(previous[0], center)
+            if sign == 0:
+                continue
+            if self.direction == 'positive' and sign < 0:
+                continue
+            if self.direction == 'negative' and sign > 0:
+                continue
+
+            self.counted.add(track_id)
+            self.crossed.append(track_id)
+            self.total += 1
+            if sign > 0:
+                self.positive += 1
+            else:
+                self.negative += 1
+            new += 1
+
+        # Esquece rastros que não aparecem há muito tempo
+        if self.updates % 100 == 0:
+            self.positions = {tid: v for tid, v in self.positions.items()
+                              if self.updates - v[1] <= self.max_idle}
+
+        return new
+
+    def reset(self):
+        self.positions = {}
+        self.counted = set()
+        self.crossed = []
+        self.updates = 0
+        self.total = self.positive = self.negative = 0
+
+    def get_state(self):
+        """Estado serializável (para checkpoints)"""
+        return {
+            'positions': {str(tid): [list(center), seen] for tid, (center, seen) in self.positions.items()},
+            'counted': sorted(self.counted),
+            'updates': self.updates,
+            'total': self.total,
+            'positive': self.positive,
+            'negative': self.negative
+        }
+
+    def set_state(self, state):
+        """Restaura o estado salvo por get_state()"""
+        self.positions = {int(tid): (tuple(center), seen)
+                          for tid, (center, seen) in state['positions'].items()}
+        self.counted = set(state['counted'])
+        self.updates = state['updates']
+        self.total = state['total']
+        self.positive = state['positive']
+        self.negative = state['negative']
+
+    def counts(self):
+        return {'total': self.total, 'positive': self.positive, 'negative': self.negative}
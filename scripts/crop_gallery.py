@@ -0,0 +1,245 @@
+"""
+Galeria de recortes: uma imagem por pacote, para auditoria
+
+Enquanto um rastro está ativo, guarda apenas o melhor recorte dele (maior
+confiança ou maior nitidez). Quando o PackageTracker descarta o rastro, o
+recorte e um JSON com os metadados (ID, primeiro/último frame, confiança,
+cruzamento da linha) são gravados pelo pool de escrita. A memória fica
+limitada a um recorte por rastro ativo.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+
+from async_writers import AsyncWriterPool
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+
+logger = logging.getLogger(__name__)
+
+SCORES = ('confidence', 'sharpness')
+
+# Melhor recorte dos rastros ativos no último checkpoint (PNG, sem perda)
+PENDING_DIR = '.pending'
+
+
+def sharpness(image):
+    """Variância do Laplaciano (maior = mais nítido)"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class CropGallery:
+    """Mantém o melhor recorte de cada rastro ativo e o grava ao final do rastro"""
+
+    def __init__(self, output_dir, fps, score='confidence', padding=0.1, counted_only=True,
+                 min_frames=3, jpeg_quality=95, writers=2):
+        if score not in SCORES:
+            raise ValueError(f"Critério de recorte desconhecido: {score}")
+
+        self.output_dir = Path(output_dir)
+        self.fps = fps
+        self.score = score
+        self.padding = padding
+        self.counted_only = counted_only
+        self.min_frames = min_frames
+        self.jpeg_quality = jpeg_quality
+
+        self.tracks = {}
+        # Rastro -> best_frame do recorte já gravado em PENDING_DIR
+        self.pending = {}
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.pool = AsyncWriterPool(workers=writers, max_pending=writers * 8)
+
+        self.written = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_config(cls, settings, output_dir, fps, counting=False):
+        """Cria a galeria a partir da seção 'crop_gallery' do config"""
+        return cls(
+            output_dir, fps,
+            score=settings.get('score', 'confidence'),
+            padding=settings.get('padding', 0.1),
+            # Sem linha de contagem não há "pacote contado": guarda todos os rastros
+            counted_only=settings.get('counted_only', True) and counting,
+            min_frames=settings.get('min_frames', 3),
+            jpeg_quality=settings.get('jpeg_quality', 95),
+            writers=settings.get('writers', 2)
+        )
+
+    def _crop(self, frame, bbox):
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = bbox
+        pad_x = int((x2 - x1) * self.padding)
+        pad_y = int((y2 - y1) * self.padding)
+        x1, y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        x2, y2 = min(width, x2 + pad_x), min(height, y2 + pad_y)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        # Cópia: o frame pode ser reaproveitado pela fonte (ou ser uma visão do frame store)
+        return frame[y1:y2, x1:x2].copy()
+
+    def update(self, index, frame, detections):
+        """Atualiza os rastros com as detecções (novas, não repetidas) de um frame"""
+        for detection in detections:
+            track_id = detection.get('track_id')
+            if track_id is None:
+                continue
+
+            track = self.tracks.get(track_id)
+            if track is None:
+                track = self.tracks[track_id] = {
+                    'first_frame': index, 'frames_seen': 0, 'score': None,
+                    'crossing_frame': None
+                }
+            track['last_frame'] = index
+            track['frames_seen'] += 1
+
+            confidence = detection['confidence']
+            if self.score == 'confidence':
+                if track['score'] is not None and confidence <= track['score']:
+                    continue
+                crop = self._crop(frame, detection['bbox'])
+                if crop is None:
+                    continue
+                score = confidence
+            else:
+                crop = self._crop(frame, detection['bbox'])
+                if crop is None:
+                    continue
+                score = sharpness(crop)
+                if track['score'] is not None and score <= track['score']:
+                    continue
+
+            track.update(score=score, crop=crop, confidence=confidence, best_frame=index,
+                         bbox=list(detection['bbox']))
+
+    def mark_crossed(self, track_ids, index):
+        """Registra o cruzamento da linha de contagem"""
+        for track_id in track_ids:
+            track = self.tracks.get(track_id)
+            if track is not None and track['crossing_frame'] is None:
+                track['crossing_frame'] = index
+
+    def release(self, track_ids):
+        """Rastros descartados pelo tracker: grava (ou descarta) o melhor recorte"""
+        for track_id in track_ids:
+            track = self.tracks.pop(track_id, None)
+            if track is None:
+                continue
+            if self.pending.pop(track_id, None) is not None:
+                self._pending_path(track_id).unlink(missing_ok=True)
+            if track.get('crop') is None or track['frames_seen'] < self.min_frames \
+                    or (self.counted_only and track['crossing_frame'] is None):
+                self.skipped += 1
+                continue
+            self.written += 1
+            self.pool.submit(self._write, track_id, track)
+
+    def reset(self):
+        """Descontinuidade (novo trecho ativo): encerra todos os rastros ativos"""
+        self.release(list(self.tracks))
+
+    def _pending_path(self, track_id):
+        return self.output_dir / PENDING_DIR / f"track_{track_id:06d}.png"
+
+    def get_state(self):
+        """Rastros ativos para o checkpoint; os recortes vão para PENDING_DIR"""
+        tracks = {}
+        for track_id, track in self.tracks.items():
+            meta = {key: value for key, value in track.items() if key != 'crop'}
+            if track.get('crop') is not None:
+                path = self._pending_path(track_id)
+                # Só regrava se o melhor recorte mudou desde o último checkpoint
+                if self.pending.get(track_id) != track['best_frame']:
+                    path.parent.mkdir(exist_ok=True)
+                    ok, encoded = cv2.imencode('.png', track['crop'])
+                    if not ok:
+                        raise RuntimeError(f"Falha ao codificar o recorte do rastro {track_id}")
+                    tmp_path = path.with_name(path.name + '.tmp')
+                    with open(tmp_path, 'wb') as f:
+                        f.write(encoded.tobytes())
+                    os.replace(tmp_path, path)
+                    self.pending[track_id] = track['best_frame']
+                meta['crop_path'] = str(path)
+            tracks[str(track_id)] = meta
+        return {'tracks': tracks, 'written': self.written, 'skipped': self.skipped}
+
+    def set_state(self, state):
+        """Restaura os rastros ativos (e seus recortes) de um checkpoint"""
+        self.written = state.get('written', 0)
+        self.skipped = state.get('skipped', 0)
+        self.tracks = {}
+        self.pending = {}
+        for key, meta in state.get('tracks', {}).items():
+            track = dict(meta)
+            path = track.pop('crop_path', None)
+            if path:
+                track['crop'] = cv2.imread(path)
+                if track['crop'] is None:
+                    logger.warning(f"⚠️ Recorte do rastro {key} ausente: {path}")
+                else:
+                    self.pending[int(key)] = track['best_frame']
+            self.tracks[int(key)] = track
+
+    def _seconds(self, index):
+        return round(index / self.fps, 3) if index is not None and self.fps else None
+
+    def _write(self, track_id, track):
+        stem = f"track_{track_id:06d}"
+        image_path = self.output_dir / f"{stem}.jpg"
+        ok, encoded = cv2.imencode('.jpg', track['crop'], [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise RuntimeError(f"Falha ao codificar o recorte do rastro {track_id}")
+
+        sidecar = {
+            'track_id': track_id,
+            'image': image_path.name,
+            'first_frame': track['first_frame'],
+            'last_frame': track['last_frame'],
+            'frames_seen': track['frames_seen'],
+            'best_frame': track['best_frame'],
+            'confidence': round(track['confidence'], 4),
+            'sharpness': round(sharpness(track['crop']), 2),
+            'bbox': track['bbox'],
+            'crossing_frame': track['crossing_frame'],
+            'crossing_s': self._seconds(track['crossing_frame']),
+            'first_s': self._seconds(track['first_frame']),
+            'last_s': self._seconds(track['last_frame'])
+        }
+
+        # Imagem antes do JSON: um sidecar sempre aponta para uma imagem completa
+        for path, data in ((image_path, encoded.tobytes()),
+                           (image_path.with_suffix('.json'),
+                            json.dumps(sidecar, ensure_ascii=False, indent=2).encode('utf-8'))):
+            tmp_path = path.with_name(path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def close(self, flush=True):
+        """Grava os rastros ainda ativos (fim do vídeo) e aguarda o pool
+
+        flush=False (execução interrompida com checkpoint): os rastros ativos
+        ficam no checkpoint e em PENDING_DIR, para a retomada.
+        """
+        if flush:
+            self.reset()
+        self.pool.close()
+        if flush:
+            try:
+                (self.output_dir / PENDING_DIR).rmdir()
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+            'output_dir': str(self.output_dir),
+            'crops': self.written,
+            'skipped_tracks': self.skipped,
+            'write_errors': self.pool.errors
+        }
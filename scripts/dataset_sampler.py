@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Amostragem de fotos em lote a partir de uma pasta de vídeos
+
+Cada vídeo é processado em um processo separado: frames são amostrados a cada
+`intervalo` segundos e quase-duplicatas (esteira parada) são descartadas por
+hash perceptual (dHash). O que foi mantido fica registrado em manifest.jsonl.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from lazy_imports import LazyModule
+from vision_utils import VIDEO_EXTENSIONS, iter_capture_samples, sample_name
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+
+def hash_perceptual(frame, tamanho=8):
+    """dHash de 64 bits: compara o brilho de pixels vizinhos em uma miniatura"""
+    cinza = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    mini = cv2.resize(cinza, (tamanho + 1, tamanho), interpolation=cv2.INTER_AREA)
+    bits = (mini[:, 1:] > mini[:, :-1]).flatten()
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+
+def distancia_hamming(a, b):
+    """Número de bits diferentes entre dois hashes"""
+    return bin(a ^ b).count('1')
+
+
+def _recorte_roi(frame, roi_points):
+    """Recorte retangular da ROI (o hash ignora o que está fora da esteira)"""
+    if not roi_points:
+        return frame
+    x, y, w, h = cv2.boundingRect(np.array(roi_points, dtype=np.int32))
+    return frame[max(0, y):y + h, max(0, x):x + w]
+
+
+def _iniciar_processo():
+    # Um processo por vídeo: evita que cada um abra várias threads do OpenCV
+    cv2.setNumThreads(1)
+
+
+def amostrar_video(caminho_video, pasta_destino, intervalo=1.0, limiar=5,
+                   janela=50, roi_points=None, qualidade_jpeg=95):
+    """
+    Amostra um vídeo descartando quase-duplicatas.
+
+    Args:
+        caminho_video (str): Caminho do vídeo
+        pasta_destino (str): Pasta onde salvar as fotos
+        intervalo (float): Segundos entre amostras
+        limiar (int): Distância de Hamming máxima para considerar duplicata
+        janela (int): Quantos hashes mantidos recentes são comparados
+        roi_points (list): Pontos da ROI usada no hash (opcional)
+        qualidade_jpeg (int): Qualidade das fotos salvas
+
+    Returns:
+        dict: Entradas mantidas e contadores do vídeo
+    """
+    caminho_video = Path(caminho_video)
+    pasta_destino = Path(pasta_destino)
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+
+    cap = cv2.VideoCapture(str(caminho_video))
+    if not cap.isOpened():
+        return {'video': caminho_video.name, 'erro': 'não foi possível abrir o vídeo',
+                'amostrados': 0, 'mantidos': []}
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    passo = max(1, int(round(intervalo * fps)))
+    recentes = deque(maxlen=janela)
+    # Prefixo único por arquivo: a.mp4 e a.avi (ou pastas diferentes) não se sobrescrevem
+    prefixo = sample_name(caminho_video)
+    mantidos = []
+    amostrados = 0
+    inicio = time.time()
+
+    try:
+        for indice, frame in iter_capture_samples(cap, passo):
+            amostrados += 1
+
+            valor_hash = hash_perceptual(_recorte_roi(frame, roi_points))
+            if any(distancia_hamming(valor_hash, h) <= limiar for h in recentes):
+                continue
+
+            recentes.append(valor_hash)
+            nome_foto = f"{prefixo}_frame_{indice:06d}.jpg"
+            caminho_foto = pasta_destino / nome_foto
+            if cv2.imwrite(str(caminho_foto), frame, [cv2.IMWRITE_JPEG_QUALITY, qualidade_jpeg]):
+                mantidos.append({
+                    'video': str(caminho_video),
+                    'frame': indice,
+                    'segundo': round(indice / fps, 3),
+                    'arquivo': nome_foto,
+                    'hash': f"{valor_hash:016x}"
+                })
+    finally:
+        cap.release()
+
+    return {
+        'video': caminho_video.name,
+        'amostrados': amostrados,
+        'mantidos': mantidos,
+        'tempo_s': time.time() - inicio
+    }
+
+
+def amostrar_pasta(pasta_videos, pasta_destino, intervalo=1.0, limiar=5, janela=50,
+                   roi_points=None, processos=None):
+    """
+    Amostra todos os vídeos de uma pasta em paralelo e grava o manifesto.
+
+    Returns:
+        dict: Resumo com totais e caminho do manifesto
+    """
+    pasta_videos = Path(pasta_videos)
+    pasta_destino = Path(pasta_destino)
+    pasta_destino.mkdir(parents=True, exist_ok=True)
+
+    videos = sorted(p for p in pasta_videos.iterdir() if p.suffix.lower() in VIDEO_EXTENSIONS)
+    if not videos:
+        print(f"❌ Nenhum vídeo encontrado em {pasta_videos}")
+        return None
+
+    processos = processos or min(len(videos), os.cpu_count() or 1)
+    print(f"🎞️  {len(videos)} vídeos, {processos} processos, amostra a cada {intervalo}s")
+
+    manifesto = pasta_destino / 'manifest.jsonl'
+    resumo = {'videos': len(videos), 'amostrados': 0, 'mantidos': 0, 'erros': []}
+    inicio = time.time()
+
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as pool, \
+            open(manifesto, 'w', encoding='utf-8') as f:
+        futuros = {
+            pool.submit(amostrar_video, str(video), str(pasta_destino), intervalo,
+                        limiar, janela, roi_points): video
+            for video in videos
+        }
+
+        for futuro in as_completed(futuros):
+            video = futuros[futuro]
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                print(f"❌ {video.name}: {e}")
+                resumo['erros'].append(video.name)
+                continue
+
+            if 'erro' in resultado:
+                print(f"❌ {video.name}: {resultado['erro']}")
+                resumo['erros'].append(video.name)
+                continue
+
+            for entrada in resultado['mantidos']:
+                f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+
+            resumo['amostrados'] += resultado['amostrados']
+            resumo['mantidos'] += len(resultado['mantidos'])
+            print(f"✅ {video.name}: {len(resultado['mantidos'])}/{resultado['amostrados']} "
+                  f"mantidos ({resultado['tempo_s']:.1f}s)")
+
+    resumo['tempo_s'] = time.time() - inicio
+    resumo['manifesto'] = str(manifesto)
+    descartados = resumo['amostrados'] - resumo['mantidos']
+
+    print(f"\n📊 Resumo:")
+    print(f"   - Frames amostrados: {resumo['amostrados']}")
+    print(f"   - Mantidos: {resumo['mantidos']} ({descartados} quase-duplicatas descartadas)")
+    print(f"   - Tempo total: {resumo['tempo_s']:.1f}s")
+    print(f"   - Manifesto: {manifesto}")
+
+    return resumo
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Amostragem paralela de fotos a partir de vídeos")
+    parser.add_argument('pasta_videos', help="Pasta com os vídeos")
+    parser.add_argument('pasta_destino', help="Pasta de destino das fotos (ex.: photos/)")
+    parser.add_argument('--intervalo', type=float, default=1.0, help="Segundos entre amostras")
+    parser.add_argument('--limiar', type=int, default=5,
+                        help="Distância de Hamming máxima para considerar duplicata (0-64)")
+    parser.add_argument('--janela', type=int, default=50, help="Hashes recentes comparados")
+    parser.add_argument('--roi', help="Arquivo JSON de ROI (o hash considera só a ROI)")
+    parser.add_argument('--processos', type=int, help="Número de processos")
+    args = parser.parse_args()
+
+    roi_points = None
+    if args.roi:
+        with open(args.roi, 'r', encoding='utf-8') as f:
+            roi_points = json.load(f)['roi']['points']
+
+    resumo = amostrar_pasta(args.pasta_videos, args.pasta_destino, args.intervalo,
+                            args.limiar, args.janela, roi_points, args.processos)
+    return 0 if resumo and not resumo['erros'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
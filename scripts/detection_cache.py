@@ -0,0 +1,123 @@
+"""
+Cache em disco das detecções brutas por frame
+
+As saídas do modelo só dependem do vídeo, do modelo e da configuração de
+inferência; ROI, limiar de confiança, rastreamento e contagem são aplicados
+depois. Guardando as caixas brutas (com um piso de confiança baixo), mudanças
+nesses parâmetros são reavaliadas sem rodar o modelo de novo.
+
+O nome do arquivo é derivado do conteúdo: hash rápido do vídeo, hash do
+modelo, tamanho de entrada, piso de confiança, IoU do NMS e backend.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from inference_backends import file_hash
+from lazy_imports import LazyModule
+
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = '.detection_cache'
+
+
+def video_quick_hash(path, chunk_size=1 << 20):
+    """Hash do tamanho e de três trechos do arquivo (início, meio e fim)
+
+    Ler um vídeo de vários GB inteiro para calcular o hash custaria quase
+    tanto quanto decodificá-lo.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        for offset in (0, max(0, size // 2 - chunk_size // 2), max(0, size - chunk_size)):
+            f.seek(offset)
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()[:16]
+
+
+class DetectionCache:
+    """Caixas brutas (N, 6) por índice de frame de um vídeo"""
+
+    def __init__(self, video_path, model_path, input_size, conf_floor=0.05, iou=0.4,
+                 backend='torch', cache_dir=None):
+        self.video_path = Path(video_path)
+        self.conf_floor = conf_floor
+        self.meta = {
+            'video': self.video_path.name,
+            'video_hash': video_quick_hash(self.video_path),
+            'model_hash': file_hash(model_path),
+            'input_size': int(input_size),
+            'conf_floor': float(conf_floor),
+            'iou': float(iou),
+            'backend': backend
+        }
+        key = (f"{self.meta['video_hash']}_{self.meta['model_hash']}_{input_size}"
+               f"_c{conf_floor:g}_iou{iou:g}_{backend}")
+
+        cache_dir = Path(cache_dir) if cache_dir else self.video_path.parent / CACHE_DIR
+        self.path = cache_dir / f"{key}.npz"
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                frames, offsets, boxes = data['frames'], data['offsets'], data['boxes']
+            for i, frame_index in enumerate(frames):
+                self.entries[int(frame_index)] = boxes[offsets[i]:offsets[i + 1]]
+            logger.info(f"♻️ Cache de detecções: {len(self.entries)} frames ({self.path.name})")
+        except Exception as e:
+            logger.warning(f"⚠️ Cache de detecções ilegível, ignorado: {e}")
+            self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, frame_index):
+        return frame_index in self.entries
+
+    def get(self, frame_index):
+        """Caixas do frame ou None se não estiver no cache"""
+        boxes = self.entries.get(frame_index)
+        if boxes is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return boxes
+
+    def put(self, frame_index, boxes):
+        self.entries[frame_index] = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        self.dirty = True
+
+    def save(self):
+        """Grava o cache (atomicamente) se houve frames novos"""
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        frames = sorted(self.entries)
+        counts = [len(self.entries[i]) for i in frames]
+        boxes = np.concatenate([self.entries[i] for i in frames]) if frames else np.zeros((0, 6), np.float32)
+
+        tmp_path = self.path.with_name(self.path.stem + '.tmp.npz')
+        np.savez(tmp_path, frames=np.array(frames, dtype=np.int64),
+                 offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+                 boxes=boxes, meta=json.dumps(self.meta))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        logger.info(f"💾 Cache de detecções salvo: {len(frames)} frames ({self.path.name})")
+
+    def stats(self):
+        return {'path': str(self.path), 'frames': len(self.entries),
+                'hits': self.hits, 'misses': self.misses}
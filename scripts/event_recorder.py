@@ -0,0 +1,254 @@
+"""
+Gravação de clipes por evento, no lugar do vídeo anotado completo
+
+Os últimos frames anotados ficam em um buffer circular (pré-roll). Quando
+ocorre um evento - pacote cruzando a linha de contagem, detecção de baixa
+confiança ou rastro perdido dentro da ROI - abre-se um clipe com o pré-roll,
+que segue até `post_roll` frames depois do último evento (limitado a
+`max_clip`). O VideoWriter do clipe abre no evento: o pré-roll é gravado
+primeiro e cada frame seguinte segue por uma fila curta até a thread de
+escrita, de modo que a memória fica limitada ao pré-roll mais essa fila.
+Clipes e o índice de eventos (events.jsonl) são gravados em segundo plano
+pelo pool de escrita.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from async_writers import AsyncWriterPool
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('line_crossing', 'low_confidence', 'track_lost')
+
+# Frames do clipe aguardando a thread de escrita
+CLIP_QUEUE_FRAMES = 32
+
+
+class EventRecorder:
+    """Mantém o pré-roll e grava clipes curtos em volta dos eventos"""
+
+    def __init__(self, output_dir, fps, pre_roll=90, post_roll=90, max_clip=900,
+                 events=EVENT_TYPES, low_confidence=0.6, roi_points=None,
+                 lost_edge_margin=40, scale=0.5, writers=2):
+        unknown = set(events) - set(EVENT_TYPES)
+        if unknown:
+            raise ValueError(f"Eventos desconhecidos: {sorted(unknown)}")
+
+        self.output_dir = Path(output_dir)
+        self.fps = fps
+        self.pre_roll = max(1, pre_roll)
+        self.post_roll = post_roll
+        self.max_clip = max(self.pre_roll + 1, max_clip)
+        self.events = set(events)
+        self.low_confidence = low_confidence
+        self.roi_points = roi_points
+        self.lost_edge_margin = lost_edge_margin
+        self.scale = scale
+
+        self.ring = deque(maxlen=self.pre_roll)
+        self.clip = None
+        self.flagged_tracks = set()
+        self.polygon = None
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.output_dir / 'events.jsonl'
+        self.index_lock = threading.Lock()
+        self.pool = AsyncWriterPool(workers=writers, max_pending=writers * 2)
+
+        self.frames = 0
+        self.clips = 0
+        self.clip_frames = 0
+        self.event_counts = {kind: 0 for kind in EVENT_TYPES}
+
+    @classmethod
+    def from_config(cls, settings, output_dir, fps, roi_points=None):
+        """Cria o gravador a partir da seção 'event_recorder' do config"""
+        return cls(
+            output_dir, fps,
+            pre_roll=int(round(settings.get('pre_roll_seconds', 3.0) * fps)),
+            post_roll=int(round(settings.get('post_roll_seconds', 3.0) * fps)),
+            max_clip=int(round(settings.get('max_clip_seconds', 30.0) * fps)),
+            events=settings.get('events', EVENT_TYPES),
+            low_confidence=settings.get('low_confidence', 0.6),
+            roi_points=roi_points,
+            lost_edge_margin=settings.get('lost_edge_margin', 40),
+            scale=settings.get('scale', 0.5),
+            writers=settings.get('writers', 2)
+        )
+
+    def _is_lost_inside(self, centroid, frame_shape):
+        """Rastro sumiu longe da borda da ROI (ou do frame, sem ROI)"""
+        if self.polygon is None:
+            height, width = frame_shape[:2]
+            points = self.roi_points or [[0, 0], [width, 0], [width, height], [0, height]]
+            self.polygon = np.array(points, dtype=np.float32)
+        distance = cv2.pointPolygonTest(self.polygon, (float(centroid[0]), float(centroid[1])), True)
+        return distance >= self.lost_edge_margin
+
+    def find_events(self, index, detections, crossed=(), lost=(), frame_shape=None):
+        """Eventos do frame (lista de dicionários)"""
+        found = []
+
+        if 'line_crossing' in self.events:
+            for track_id in crossed:
+                found.append({'type': 'line_crossing', 'frame': index, 'track_id': track_id})
+
+        if 'low_confidence' in self.events:
+            for detection in detections:
+                if detection['confidence'] >= self.low_confidence:
+                    continue
+                track_id = detection.get('track_id')
+                # Um evento por rastro; sem rastro, só se não há clipe aberto
+                if track_id is not None:
+                    if track_id in self.flagged_tracks:
+                        continue
+                    self.flagged_tracks.add(track_id)
+                elif self.clip is not None:
+                    continue
+                found.append({'type': 'low_confidence', 'frame': index, 'track_id': track_id,
+                              'confidence': round(detection['confidence'], 4),
+                              'bbox': detection['bbox']})
+
+        for track_id, centroid in lost:
+            self.flagged_tracks.discard(track_id)
+            if 'track_lost' in self.events and frame_shape is not None \
+                    and self._is_lost_inside(centroid, frame_shape):
+                found.append({'type': 'track_lost', 'frame': index, 'track_id': track_id,
+                              'centroid': [int(centroid[0]), int(centroid[1])]})
+
+        return found
+
+    def update(self, index, frame, detections, crossed=(), lost=()):
+        """Registra o frame anotado e os eventos dele; retorna os eventos"""
+        self.frames += 1
+        events = self.find_events(index, detections, crossed, lost, frame.shape)
+
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale,
+                               interpolation=cv2.INTER_AREA)
+
+        if self.clip is None:
+            self.ring.append((index, frame))
+        else:
+            self._send(self.clip, frame)
+            self.clip['end_frame'] = index
+
+        if events:
+            if self.clip is None:
+                # Clipe começa com o pré-roll (que já inclui o frame atual)
+                self._open_clip(index)
+            self.clip['events'].extend(events)
+            self.clip['until'] = index + self.post_roll
+            for event in events:
+                self.event_counts[event['type']] += 1
+
+        if self.clip is not None and (index >= self.clip['until']
+                                      or self.clip['frames'] >= self.max_clip):
+            self._flush()
+
+        return events
+
+    def reset(self):
+        """Descontinuidade (novo trecho ativo): fecha o clipe e esvazia o pré-roll"""
+        self._flush()
+        self.ring.clear()
+        self.flagged_tracks.clear()
+
+    def _open_clip(self, index):
+        """Abre o clipe na thread de escrita e envia o pré-roll"""
+        self.clip = {
+            'start_frame': self.ring[0][0],
+            'end_frame': index,
+            'frames': 0,
+            'events': [],
+            'wall_time': time.time(),
+            'queue': queue.Queue(maxsize=CLIP_QUEUE_FRAMES)
+        }
+        self.clip['future'] = self.pool.submit(self._write_clip, self.clip)
+        for _, frame in self.ring:
+            self._send(self.clip, frame)
+        self.ring.clear()
+
+    def _send(self, clip, frame):
+        """Entrega um frame (ou None, fim do clipe) à thread de escrita"""
+        if frame is not None:
+            clip['frames'] += 1
+        while True:
+            try:
+                clip['queue'].put(frame, timeout=1.0)
+                return
+            except queue.Full:
+                # Gravação falhou: descarta em vez de travar o processamento
+                if clip['future'].done():
+                    return
+
+    def _flush(self):
+        if self.clip is None:
+            return
+        clip, self.clip = self.clip, None
+        self.clips += 1
+        self.clip_frames += clip['frames']
+        self._send(clip, None)
+
+    def _write_clip(self, clip):
+        start_path = self.output_dir / f"event_{clip['start_frame']:08d}.tmp.mp4"
+        out = None
+        written = 0
+        try:
+            while True:
+                frame = clip['queue'].get()
+                if frame is None:
+                    break
+                if out is None:
+                    height, width = frame.shape[:2]
+                    out = cv2.VideoWriter(str(start_path), cv2.VideoWriter_fourcc(*'mp4v'),
+                                          self.fps, (width, height))
+                out.write(frame)
+                written += 1
+        finally:
+            if out is not None:
+                out.release()
+        # Nome final só é conhecido no fim do clipe (último frame)
+        clip_path = self.output_dir / f"event_{clip['start_frame']:08d}_{clip['end_frame']:08d}.mp4"
+        os.replace(start_path, clip_path)
+
+        entry = {
+            'clip': clip_path.name,
+            'start_frame': clip['start_frame'],
+            'end_frame': clip['end_frame'],
+            'start_s': round(clip['start_frame'] / self.fps, 3) if self.fps else None,
+            'frames': written,
+            'wall_time': clip['wall_time'],
+            'events': clip['events']
+        }
+        with self.index_lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def close(self):
+        """Fecha o clipe aberto e aguarda as gravações pendentes"""
+        self._flush()
+        self.ring.clear()
+        self.pool.close()
+
+    def stats(self):
+        return {
+            'output_dir': str(self.output_dir),
+            'clips': self.clips,
+            'clip_frames': self.clip_frames,
+            'frames': self.frames,
+            'recorded_ratio': round(self.clip_frames / self.frames, 4) if self.frames else 0.0,
+            'events': dict(self.event_counts),
+            'write_errors': self.pool.errors
+        }
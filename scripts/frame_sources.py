@@ -0,0 +1,425 @@
+"""
+Fontes de frames para o detector de pacotes
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from lazy_imports import LazyModule
+from video_index import MAX_GRAB_SKIP, FrameSeeker, cached_index
+from vision_utils import IMAGE_EXTENSIONS, iter_capture_samples
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Frame store: cabeçalho JSON de tamanho fixo (alinhado à página) + frames BGR crus
+FRAME_STORE_SUFFIX = '.frames'
+FRAME_STORE_MAGIC = b'PKGFRAMES1\n'
+FRAME_STORE_HEADER_SIZE = 4096
+
+STREAM_PREFIXES = ('rtsp://', 'rtsps://', 'rtmp://', 'http://', 'https://', 'udp://', 'tcp://')
+
+
+class VideoFileSource:
+    """Arquivo de vídeo lido com OpenCV, com posicionamento por índice de frame"""
+
+    def __init__(self, video_path):
+        self.path = Path(video_path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Vídeo não encontrado: {self.path}")
+
+        self.cap = cv2.VideoCapture(str(self.path))
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Erro ao abrir vídeo: {self.path}")
+
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.position = 0
+        # Posicionamento exato (video_index.py), criado no primeiro salto longo
+        self.seeker = None
+
+    @property
+    def name(self):
+        return self.path.name
+
+    def read(self):
+        """Lê o próximo frame: (ret, frame)"""
+        ret, frame = self.cap.read()
+        if ret:
+            self.position += 1
+        return ret, frame
+
+    def seek(self, frame_index):
+        """Posiciona a leitura exatamente no frame indicado
+
+        CAP_PROP_POS_FRAMES sozinho não é preciso em H.264 com GOP longo, e
+        retomada e trechos paralelos dependem do índice exato. Saltos longos
+        conferem o PTS de onde o salto caiu e fazem o resto com grab(), usando
+        o índice de keyframes/PTS já salvo ao lado do vídeo (video_index.py)
+        quando existe; sem ele, o PTS esperado vem do FPS.
+        """
+        skip = frame_index - self.position
+        if skip == 0:
+            return
+
+        if 0 < skip <= MAX_GRAB_SKIP:
+            for _ in range(skip):
+                if not self.cap.grab():
+                    break
+                self.position += 1
+            return
+
+        if self.seeker is None:
+            self.seeker = FrameSeeker(self.cap, cached_index(self.path), self.fps)
+        if not self.seeker.seek(frame_index):
+            logger.warning(f"⚠️ Posicionamento pode estar impreciso no frame {frame_index}")
+        self.position = frame_index
+
+    def release(self):
+        self.cap.release()
+
+
+def read_frame_store_header(path):
+    """Metadados do cabeçalho de um frame store"""
+    with open(path, 'rb') as f:
+        header = f.read(FRAME_STORE_HEADER_SIZE)
+    if not header.startswith(FRAME_STORE_MAGIC):
+        raise ValueError(f"Arquivo não é um frame store: {path}")
+    return json.loads(header[len(FRAME_STORE_MAGIC):].decode('utf-8'))
+
+
+class FrameStoreSource:
+    """Frames pré-decodificados em um arquivo mapeado em memória
+
+    read() devolve uma visão (somente leitura) do mapeamento, sem cópia. Vários
+    processos abrindo o mesmo arquivo compartilham as páginas do cache do SO.
+    """
+
+    def __init__(self, store_path):
+        self.path = Path(store_path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Frame store não encontrado: {self.path}")
+
+        self.meta = read_frame_store_header(self.path)
+        self.fps = self.meta['fps']
+        self.frame_count = self.meta['frame_count']
+        self.width = self.meta['width']
+        self.height = self.meta['height']
+        self.frames = np.memmap(self.path, dtype=np.uint8, mode='r',
+                                offset=FRAME_STORE_HEADER_SIZE,
+                                shape=(self.frame_count, self.height, self.width, 3))
+        self.position = 0
+
+    @property
+    def name(self):
+        return self.path.name
+
+    def read(self):
+        """Próximo frame: (ret, visão do frame)"""
+        if self.position >= self.frame_count:
+            return False, None
+        frame = self.frames[self.position]
+        self.position += 1
+        return True, frame
+
+    def seek(self, frame_index):
+        self.position = max(0, min(frame_index, self.frame_count))
+
+    def release(self):
+        # O mapeamento é liberado quando a última visão deixa de existir
+        self.frames = None
+
+
+def is_live_url(path):
+    """True para URLs de stream e índices de câmera ('0', '1', ...)"""
+    text = str(path)
+    return text.lower().startswith(STREAM_PREFIXES) or text.isdigit()
+
+
+class LiveSource:
+    """Câmera/stream ao vivo lido por uma thread de captura
+
+    Modo 'latest': só o frame mais recente fica guardado; 'ring': os últimos
+    `ring_size`. Com `drop_frames`, frames não consumidos a tempo são
+    descartados (e contados) em vez de acumular atraso; sem ele, a captura
+    espera o consumidor. Quedas do stream disparam reconexão com espera
+    exponencial. Um arquivo local funciona como substituto do stream, lido no
+    ritmo do FPS (tempo real) para testes.
+    """
+
+    def __init__(self, url, mode='latest', ring_size=4, drop_frames=True,
+                 reconnect_initial_s=0.5, reconnect_max_s=10.0, max_reconnects=None,
+                 loop_replay=False):
+        if mode not in ('latest', 'ring'):
+            raise ValueError(f"Modo de captura desconhecido: {mode}")
+
+        self.url = str(url)
+        self.is_replay = not is_live_url(url)
+        self.path = Path(url) if self.is_replay else None
+        self.drop_frames = drop_frames
+        self.reconnect_initial_s = reconnect_initial_s
+        self.reconnect_max_s = reconnect_max_s
+        self.max_reconnects = max_reconnects
+        self.loop_replay = loop_replay
+
+        self.buffer = deque(maxlen=1 if mode == 'latest' else ring_size)
+        self.cond = threading.Condition()
+        self.stopped = threading.Event()
+        self.finished = False
+        self.error = None
+
+        self.captured = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.position = 0
+        self.capture_ts = None
+        self.capture_seq = None
+
+        self.cap = self._open()
+        if self.cap is None:
+            raise RuntimeError(f"Erro ao abrir stream: {self.url}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Stream ao vivo não tem fim conhecido
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.is_replay else 0
+
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True, name='live-capture')
+        self.thread.start()
+
+    @classmethod
+    def from_config(cls, url, settings):
+        """Cria a fonte a partir da seção 'live_source' do config"""
+        return cls(
+            url,
+            mode=settings.get('mode', 'latest'),
+            ring_size=settings.get('ring_size', 4),
+            drop_frames=settings.get('drop_frames', True),
+            reconnect_initial_s=settings.get('reconnect_initial_s', 0.5),
+            reconnect_max_s=settings.get('reconnect_max_s', 10.0),
+            max_reconnects=settings.get('max_reconnects'),
+            loop_replay=settings.get('loop_replay', False)
+        )
+
+    @property
+    def name(self):
+        return self.path.name if self.path else self.url
+
+    def _open(self):
+        target = int(self.url) if self.url.isdigit() else self.url
+        cap = cv2.VideoCapture(target)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def _reconnect(self):
+        """Reabre o stream com espera exponencial; False se desistiu"""
+        delay = self.reconnect_initial_s
+        while not self.stopped.is_set():
+            if self.max_reconnects is not None and self.reconnects >= self.max_reconnects:
+                logger.error(f"❌ Stream perdido após {self.reconnects} reconexões: {self.url}")
+                return False
+            self.reconnects += 1
+            logger.warning(f"⚠️ Stream caiu, reconectando em {delay:.1f}s "
+                           f"(tentativa {self.reconnects})")
+            if self.stopped.wait(delay):
+                return False
+            self.cap = self._open()
+            if self.cap is not None:
+                logger.info(f"✅ Stream reconectado: {self.url}")
+                return True
+            delay = min(delay * 2, self.reconnect_max_s)
+        return False
+
+    def _capture_loop(self):
+        start = time.time()
+        replayed = 0
+        try:
+            while not self.stopped.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    if self.is_replay and self.loop_replay:
+                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    if self.is_replay:
+                        break
+                    self.cap.release()
+                    if not self._reconnect():
+                        break
+                    continue
+
+                # Substituto de arquivo: entrega no ritmo do FPS, como uma câmera
+                if self.is_replay:
+                    replayed += 1
+                    delay = start + replayed / self.fps - time.time()
+                    if delay > 0 and self.stopped.wait(delay):
+                        break
+
+                self.captured += 1
+                item = (self.captured, time.time(), frame)
+                with self.cond:
+                    if self.drop_frames:
+                        if len(self.buffer) == self.buffer.maxlen:
+                            self.dropped += 1
+                        self.buffer.append(item)
+                    else:
+                        while len(self.buffer) == self.buffer.maxlen and not self.stopped.is_set():
+                            self.cond.wait(0.1)
+                        self.buffer.append(item)
+                    self.cond.notify_all()
+        except Exception as e:
+            self.error = e
+            logger.error(f"❌ Erro na captura: {e}")
+        finally:
+            with self.cond:
+                self.finished = True
+                self.cond.notify_all()
+
+    def read(self):
+        """Frame mais antigo ainda guardado: (ret, frame); espera se não houver"""
+        with self.cond:
+            while not self.buffer and not self.finished:
+                self.cond.wait(0.5)
+            if not self.buffer:
+                return False, None
+            self.capture_seq, self.capture_ts, frame = self.buffer.popleft()
+            self.cond.notify_all()
+
+        self.delivered += 1
+        self.position += 1
+        return True, frame
+
+    def seek(self, frame_index):
+        raise ValueError("Fonte ao vivo não permite posicionamento")
+
+    def release(self):
+        self.stopped.set()
+        with self.cond:
+            self.cond.notify_all()
+        self.thread.join(timeout=5)
+        if self.cap is not None:
+            self.cap.release()
+
+    def stats(self):
+        """Contadores de captura, entrega e descarte"""
+        return {
+            'captured': self.captured,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'drop_rate': self.dropped / self.captured if self.captured else 0.0,
+            'reconnects': self.reconnects
+        }
+
+
+def open_source(path):
+    """Fonte de frames adequada ao arquivo: frame store ou vídeo"""
+    if Path(path).suffix.lower() == FRAME_STORE_SUFFIX:
+        return FrameStoreSource(path)
+    return VideoFileSource(path)
+
+
+def iter_image_paths(paths_or_dir):
+    """Caminhos de imagens a partir de uma pasta, um arquivo ou uma lista"""
+    if isinstance(paths_or_dir, (str, Path)):
+        paths_or_dir = [paths_or_dir]
+
+    for item in paths_or_dir:
+        item = Path(item)
+        if item.is_dir():
+            for path in sorted(item.iterdir()):
+                if path.suffix.lower() in IMAGE_EXTENSIONS:
+                    yield path
+        elif item.suffix.lower() in IMAGE_EXTENSIONS:
+            yield item
+
+
+def iter_images(paths_or_dir):
+    """Imagens lidas do disco: (caminho, imagem); ilegíveis são puladas"""
+    for path in iter_image_paths(paths_or_dir):
+        image = cv2.imread(str(path))
+        if image is None:
+            logger.warning(f"⚠️ Imagem ilegível: {path}")
+            continue
+        yield path, image
+
+
+def iter_video_samples(video_path, sample_every=1):
+    """Frames de um vídeo a cada `sample_every`: (índice, frame)"""
+    source = VideoFileSource(video_path)
+    try:
+        yield from iter_capture_samples(source.cap, sample_every)
+    finally:
+        source.release()
+
+
+class Prefetcher:
+    """Consome um iterador em uma thread, mantendo até `maxsize` itens prontos"""
+
+    _END = object()
+
+    def __init__(self, iterable, maxsize=16):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(iterable,), daemon=True)
+        self.thread.start()
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            # Consumidor parou antes do fim: fecha o gerador (e a captura que ele mantém)
+            if self.stopped.is_set() and hasattr(iterable, 'close'):
+                iterable.close()
+            if not self._put(self._END):
+                try:
+                    self.queue.put_nowait(self._END)
+                except queue.Full:
+                    pass
+
+    def _put(self, item):
+        """Enfileira enquanto o consumidor não desistir; False se ele parou"""
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is self._END:
+                if self.error:
+                    raise self.error
+                return
+            yield item
+
+    def close(self, timeout=5.0):
+        """Interrompe a leitura antecipada e aguarda a thread liberar a fonte"""
+        self.stopped.set()
+        # Esvazia a fila: a thread pode estar esperando vaga para um item
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            logger.warning("⚠️ Leitura antecipada não encerrou a tempo")
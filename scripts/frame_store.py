@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Frame store: decodifica um clipe uma vez para um arquivo mapeável em memória
+
+Quando o mesmo clipe é processado dezenas de vezes (ajuste de parâmetros,
+regressão, benchmarks), a decodificação H.264 domina o tempo. O frame store
+guarda os frames BGR uint8 já decodificados (opcionalmente reduzidos) após um
+cabeçalho JSON de 4 KiB; process_video aceita o arquivo .frames no lugar do
+vídeo e lê os frames direto do mapeamento, sem cópia.
+
+Uso:
+    python frame_store.py videos/clipe.mp4 --scale 0.5
+    python frame_store.py videos/clipe.frames --info
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from frame_sources import (FRAME_STORE_HEADER_SIZE, FRAME_STORE_MAGIC, FRAME_STORE_SUFFIX,
+                           VideoFileSource, read_frame_store_header)
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+
+logger = logging.getLogger(__name__)
+
+
+def store_path_for(video_path, scale=1.0):
+    """Caminho padrão do frame store ao lado do vídeo"""
+    video_path = Path(video_path)
+    suffix = '' if scale == 1.0 else f"_x{scale:g}"
+    return video_path.with_name(f"{video_path.stem}{suffix}{FRAME_STORE_SUFFIX}")
+
+
+def _encode_header(meta):
+    header = FRAME_STORE_MAGIC + json.dumps(meta, ensure_ascii=False).encode('utf-8')
+    if len(header) > FRAME_STORE_HEADER_SIZE:
+        raise ValueError("Metadados excedem o cabeçalho do frame store")
+    return header.ljust(FRAME_STORE_HEADER_SIZE, b' ')
+
+
+def is_store_valid(store_path, video_path):
+    """True se o frame store corresponde ao vídeo atual (tamanho e mtime)"""
+    try:
+        meta = read_frame_store_header(store_path)
+        stat = Path(video_path).stat()
+    except (OSError, ValueError):
+        return False
+    return meta.get('source_size') == stat.st_size and meta.get('source_mtime') == stat.st_mtime
+
+
+def build_frame_store(video_path, store_path=None, scale=1.0, max_frames=None):
+    """Decodifica o vídeo para o frame store e retorna os metadados"""
+    video_path = Path(video_path)
+    store_path = Path(store_path) if store_path else store_path_for(video_path, scale)
+
+    source = VideoFileSource(video_path)
+    width = max(1, int(round(source.width * scale)))
+    height = max(1, int(round(source.height * scale)))
+    limit = max_frames or source.frame_count or None
+    stat = video_path.stat()
+    meta = {
+        'source': video_path.name,
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+        'source_width': source.width,
+        'source_height': source.height,
+        'scale': scale,
+        'width': width,
+        'height': height,
+        'fps': source.fps,
+        'frame_count': 0,
+        'dtype': 'uint8',
+        'layout': 'NHWC-BGR'
+    }
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = store_path.with_name(store_path.name + '.tmp')
+    start = time.time()
+    count = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_encode_header(meta))
+            while limit is None or count < limit:
+                ret, frame = source.read()
+                if not ret:
+                    break
+                if scale != 1.0:
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                f.write(frame.tobytes())
+                count += 1
+
+            # Contagem real de frames (o valor do contêiner pode divergir)
+            meta['frame_count'] = count
+            f.seek(0)
+            f.write(_encode_header(meta))
+        os.replace(tmp_path, store_path)
+    finally:
+        source.release()
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    size_mb = store_path.stat().st_size / (1024 * 1024)
+    logger.info(f"🗄️ Frame store: {count} frames {width}x{height} em {time.time() - start:.1f}s "
+                f"({size_mb:.0f} MB) -> {store_path}")
+    return meta
+
+
+def get_frame_store(video_path, scale=1.0):
+    """Caminho de um frame store válido para o vídeo, criando-o se preciso"""
+    store_path = store_path_for(video_path, scale)
+    if not is_store_valid(store_path, video_path):
+        build_frame_store(video_path, store_path, scale)
+    return store_path
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Decodifica um vídeo para um frame store mapeável")
+    parser.add_argument('path', help="Vídeo (para criar) ou arquivo .frames (com --info)")
+    parser.add_argument('--output', help="Arquivo .frames de saída")
+    parser.add_argument('--scale', type=float, default=1.0, help="Fator de redução (ex.: 0.5)")
+    parser.add_argument('--max-frames', type=int, help="Limite de frames")
+    parser.add_argument('--info', action='store_true', help="Mostra o cabeçalho de um frame store")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.info:
+        print(json.dumps(read_frame_store_header(args.path), indent=2, ensure_ascii=False))
+        return 0
+
+    build_frame_store(args.path, args.output, args.scale, args.max_frames)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
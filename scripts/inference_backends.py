@@ -0,0 +1,237 @@
+"""
+Backends de inferência para o detector de pacotes
+
+- torch: modelo .pt original via ultralytics
+- torch_lean: modelo .pt chamando a rede direto, sem o predictor (lean_inference.py)
+- onnx: modelo exportado para ONNX (executado com ONNX Runtime)
+- openvino: modelo exportado para OpenVINO (CPUs Intel)
+
+Os modelos exportados ficam em cache ao lado do .pt, em `.export_cache/`,
+com nome derivado do hash do modelo, do tamanho de entrada e do lote.
+"""
+
+import hashlib
+import logging
+import shutil
+from pathlib import Path
+
+from lazy_imports import LazyModule
+
+# Pacotes pesados: importados apenas no primeiro uso
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+ultralytics = LazyModule('ultralytics')
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CACHE_DIR = '.export_cache'
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Hash SHA-256 (16 primeiros caracteres) do conteúdo de um arquivo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def export_cache_path(model_path, backend, input_size, batch_size, tag=''):
+    """Caminho do artefato exportado no cache ao lado do modelo"""
+    model_path = Path(model_path)
+    name = f"{model_path.stem}_{file_hash(model_path)}_{input_size}_b{batch_size}{tag}"
+
+    if backend == 'onnx':
+        name += '.onnx'
+    elif backend == 'openvino':
+        # ultralytics reconhece o formato pelo sufixo do diretório
+        name += '_openvino_model'
+    else:
+        raise ValueError(f"Backend sem exportação: {backend}")
+
+    return model_path.parent / EXPORT_CACHE_DIR / name
+
+
+def export_model(model_path, backend, input_size, batch_size):
+    """Exporta o modelo .pt uma única vez e retorna o artefato em cache"""
+    target = export_cache_path(model_path, backend, input_size, batch_size)
+    if target.exists():
+        logger.info(f"♻️ Modelo exportado em cache: {target.name}")
+        return target
+
+    logger.info(f"📤 Exportando {Path(model_path).name} para {backend} "
+                f"(input {input_size}, lote {batch_size})...")
+
+    exported = ultralytics.YOLO(str(model_path)).export(
+        format=backend, imgsz=input_size, batch=batch_size,
+        dynamic=False, half=False, verbose=False
+    )
+
+    # Move para o cache (tmp + rename evita artefatos parciais)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_target = target.with_name(target.name + '.tmp')
+    if tmp_target.exists():
+        shutil.rmtree(tmp_target) if tmp_target.is_dir() else tmp_target.unlink()
+    shutil.move(str(exported), str(tmp_target))
+    tmp_target.rename(target)
+
+    logger.info(f"✅ Modelo exportado: {target}")
+    return target
+
+
+def letterbox(image, size, color=(114, 114, 114), stride=None):
+    """Redimensiona mantendo a proporção e centraliza em um quadro size x size
+
+    Com `stride`, completa só até o múltiplo de stride (retângulo mínimo, como
+    o predictor do ultralytics faz com modelos .pt).
+    """
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x, pad_y = size - new_w, size - new_h
+    if stride:
+        pad_x, pad_y = pad_x % stride, pad_y % stride
+    pad_x, pad_y = pad_x / 2, pad_y / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right,
+                               cv2.BORDER_CONSTANT, value=color)
+    return image, scale, (left, top)
+
+
+def to_input_tensor(frames, size):
+    """Frames BGR -> tensor float32 NCHW RGB normalizado, como na exportação"""
+    batch = np.empty((len(frames), 3, size, size), dtype=np.float32)
+    for i, frame in enumerate(frames):
+        image, _, _ = letterbox(frame, size)
+        batch[i] = image[:, :, ::-1].transpose(2, 0, 1) / 255.0
+    return batch
+
+
+def results_to_arrays(results):
+    """Converte resultados do ultralytics em arrays (N, 6): x1, y1, x2, y2, conf, cls"""
+    outputs = []
+    for result in results:
+        if result.boxes is None or len(result.boxes) == 0:
+            outputs.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+
+        boxes = result.boxes
+        outputs.append(np.concatenate([
+            boxes.xyxy.cpu().numpy().reshape(-1, 4),
+            boxes.conf.cpu().numpy().reshape(-1, 1),
+            boxes.cls.cpu().numpy().reshape(-1, 1)
+        ], axis=1).astype(np.float32))
+
+    return outputs
+
+
+class TorchBackend:
+    """Inferência com o modelo PyTorch original"""
+
+    name = 'torch'
+
+    def __init__(self, model_path, input_size=640, batch_size=1):
+        self.model_path = Path(model_path)
+        self.input_size = input_size
+        self.batch_size = batch_size
+        self.model = ultralytics.YOLO(str(self.model_path))
+
+    @property
+    def names(self):
+        return getattr(self.model, 'names', {})
+
+    def predict(self, frames, conf, iou, imgsz):
+        """Executa o modelo em uma lista de frames BGR"""
+        results = self.model(frames, conf=conf, iou=iou, imgsz=imgsz, verbose=False)
+        return results_to_arrays(results)
+
+
+class ExportedBackend:
+    """Inferência com modelo exportado (ONNX ou OpenVINO) de forma e lote fixos"""
+
+    def __init__(self, model_path, backend, input_size=640, batch_size=1, precision='fp32'):
+        self.model_path = Path(model_path)
+        self.name = backend if precision == 'fp32' else f"{backend}-{precision}"
+        self.format = backend
+        self.precision = precision
+        self.input_size = input_size
+        self.batch_size = batch_size
+        self.models = {}
+
+        # Exporta/carrega o tamanho configurado já na inicialização
+        self.model = self.get_model(input_size)
+
+    @property
+    def names(self):
+        return getattr(self.model, 'names', {})
+
+    def artifact_path(self, imgsz):
+        """Artefato exportado para um tamanho de entrada"""
+        if self.precision == 'int8':
+            # O INT8 depende de calibração: é gerado explicitamente por quantize_model.py
+            artifact = export_cache_path(self.model_path, self.format, imgsz,
+                                         self.batch_size, tag='_int8')
+            if not artifact.exists():
+                raise FileNotFoundError(
+                    f"Modelo INT8 não encontrado: {artifact.name} "
+                    f"(gere com quantize_model.py --input-size {imgsz} --batch-size {self.batch_size})"
+                )
+            return artifact
+
+        return export_model(self.model_path, self.format, imgsz, self.batch_size)
+
+    def get_model(self, imgsz):
+        """Modelo exportado para o tamanho de entrada (exporta na primeira vez)"""
+        if imgsz not in self.models:
+            artifact = self.artifact_path(imgsz)
+            self.models[imgsz] = ultralytics.YOLO(str(artifact), task='detect')
+        return self.models[imgsz]
+
+    def prepare(self, sizes):
+        """Garante artefatos exportados para vários tamanhos (ex.: níveis de SLO)"""
+        for imgsz in sizes:
+            self.get_model(imgsz)
+
+    def predict(self, frames, conf, iou, imgsz):
+        """Executa o modelo em blocos do tamanho de lote exportado"""
+        model = self.get_model(imgsz)
+        outputs = []
+
+        for start in range(0, len(frames), self.batch_size):
+            chunk = list(frames[start:start + self.batch_size])
+            real = len(chunk)
+
+            # Lote fixo: completa com o último frame e descarta o excedente
+            chunk += [chunk[-1]] * (self.batch_size - real)
+
+            results = model(chunk, conf=conf, iou=iou, imgsz=imgsz, verbose=False)
+            outputs.extend(results_to_arrays(results)[:real])
+
+        return outputs
+
+
+def create_backend(name, model_path, input_size=640, batch_size=1, precision='fp32'):
+    """Cria o backend de inferência pelo nome ('torch', 'torch_lean', 'onnx' ou 'openvino')"""
+    name = (name or 'torch').lower()
+    precision = (precision or 'fp32').lower()
+
+    if precision not in ('fp32', 'int8'):
+        raise ValueError(f"Precisão desconhecida: {precision}")
+    if precision == 'int8' and name != 'onnx':
+        raise ValueError("Modelos INT8 são suportados apenas no backend 'onnx'")
+
+    if name == 'torch':
+        return TorchBackend(model_path, input_size, batch_size)
+    if name == 'torch_lean':
+        # Importado aqui: lean_inference depende deste módulo
+        from lean_inference import LeanTorchBackend
+        return LeanTorchBackend(model_path, input_size, batch_size)
+    if name in ('onnx', 'openvino'):
+        return ExportedBackend(model_path, name, input_size, batch_size, precision)
+
+    raise ValueError(f"Backend de inferência desconhecido: {name}")
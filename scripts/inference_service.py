@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Serviço local de inferência com micro-lotes dinâmicos
+
+Um único PackageDetector atende várias ferramentas pela rede local. Pedidos
+concorrentes são agrupados em micro-lotes (até `max_batch_size` frames ou
+`max_wait_ms` de espera, o que vier primeiro) e executados em uma chamada ao
+backend. Com `max_queue` frames já na fila, novos pedidos recebem 503 em vez
+de esperar sem limite.
+
+Rotas:
+    POST /detect[?roi=<id>]  corpo JPEG/PNG, ou BGR cru (application/octet-stream
+                             com cabeçalhos X-Width e X-Height)
+    GET  /metrics            fila, tamanhos de lote e latências
+    GET  /health
+
+Uso:
+    python inference_service.py serve --model modelo.pt --roi-dir roi/
+    python inference_service.py client foto.jpg --requests 64 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import logging
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from latency_controller import percentile
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_LINES = 100
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               413: 'Payload Too Large', 500: 'Internal Server Error',
+               503: 'Service Unavailable'}
+
+
+class RequestError(Exception):
+    """Erro do pedido, devolvido ao cliente com o status HTTP"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def load_rois(roi_dir):
+    """ROIs disponíveis por ID (nome do arquivo JSON sem extensão)"""
+    rois = {}
+    if not roi_dir:
+        return rois
+    for path in sorted(Path(roi_dir).glob('*.json')):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                rois[path.stem] = json.load(f)['roi']['points']
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"⚠️ ROI ignorada {path.name}: {e}")
+    return rois
+
+
+def filter_by_roi(detections, roi_points):
+    """Mantém as detecções com centro dentro do polígono"""
+    if not roi_points:
+        return detections
+    polygon = np.array(roi_points, dtype=np.float32)
+    kept = []
+    for d in detections:
+        x1, y1, x2, y2 = d['bbox']
+        if cv2.pointPolygonTest(polygon, ((x1 + x2) / 2, (y1 + y2) / 2), False) >= 0:
+            kept.append(d)
+    return kept
+
+
+def decode_frame(body, content_type, headers):
+    """Frame BGR a partir do corpo do pedido"""
+    if content_type == 'application/octet-stream':
+        try:
+            width, height = int(headers['x-width']), int(headers['x-height'])
+        except (KeyError, ValueError):
+            raise RequestError(400, "Frame cru exige cabeçalhos X-Width e X-Height")
+        if len(body) != width * height * 3:
+            raise RequestError(400, f"Tamanho do corpo ({len(body)}) não é {width}x{height}x3")
+        return np.frombuffer(body, dtype=np.uint8).reshape(height, width, 3)
+
+    frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise RequestError(400, "Imagem inválida")
+    return frame
+
+
+class MicroBatcher:
+    """Agrupa pedidos concorrentes em lotes para o detector"""
+
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=10, max_queue=64):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # Fila limitada: sob sobrecarga, recusa em vez de acumular frames na memória
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        # Uma thread só: o modelo não é chamado em paralelo
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        self.task = None
+
+        self.requests = 0
+        self.batches = 0
+        self.batch_sizes = Counter()
+        self.queue_ms = deque(maxlen=1000)
+        self.inference_ms = deque(maxlen=1000)
+        self.max_queue_depth = 0
+        self.rejected = 0
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, frame):
+        """Enfileira um frame e aguarda suas detecções"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((frame, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise RequestError(503, f"Fila cheia ({self.queue.maxsize} frames): tente novamente")
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def _collect(self):
+        """Primeiro pedido + o que chegar até encher o lote ou estourar a espera"""
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            start = time.perf_counter()
+            for _, _, queued_at in batch:
+                self.queue_ms.append((start - queued_at) * 1000)
+
+            try:
+                outputs = await loop.run_in_executor(
+                    self.executor, self.detector.detect_packages_batch,
+                    [frame for frame, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.inference_ms.append(elapsed_ms)
+            self.requests += len(batch)
+            self.batches += 1
+            self.batch_sizes[len(batch)] += 1
+
+            for (_, future, _), detections in zip(batch, outputs):
+                if not future.done():
+                    future.set_result((detections, len(batch), elapsed_ms))
+
+    def metrics(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'avg_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            'batch_size_histogram': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'max_queue': self.queue.maxsize,
+            'rejected': self.rejected,
+            'queue_ms_p50': round(percentile(self.queue_ms, 0.5), 2),
+            'queue_ms_p95': round(percentile(self.queue_ms, 0.95), 2),
+            'inference_ms_p50': round(percentile(self.inference_ms, 0.5), 2),
+            'inference_ms_p95': round(percentile(self.inference_ms, 0.95), 2),
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
+
+
+class InferenceService:
+    """Servidor HTTP mínimo (asyncio) sobre o MicroBatcher"""
+
+    def __init__(self, detector, host='127.0.0.1', port=8765, max_batch_size=8,
+                 max_wait_ms=10, rois=None, max_body_mb=20, max_queue=64):
+        self.detector = detector
+        self.host = host
+        self.port = port
+        self.rois = rois or {}
+        self.max_body = int(max_body_mb * 1024 * 1024)
+        self.batcher = MicroBatcher(detector, max_batch_size, max_wait_ms, max_queue)
+        self.started_at = time.time()
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls, detector, settings, rois=None):
+        """Cria o serviço a partir da seção 'inference_service' do config"""
+        return cls(
+            detector,
+            host=settings.get('host', '127.0.0.1'),
+            port=settings.get('port', 8765),
+            max_batch_size=settings.get('max_batch_size', 8),
+            max_wait_ms=settings.get('max_wait_ms', 10),
+            rois=rois,
+            max_body_mb=settings.get('max_body_mb', 20),
+            max_queue=settings.get('max_queue', 64)
+        )
+
+    async def _read_request(self, reader):
+        """(método, caminho, cabeçalhos, corpo) ou None se a conexão fechou"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise RequestError(400, "Linha de pedido inválida")
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise RequestError(400, "Content-Length inválido")
+        if length > self.max_body:
+            raise RequestError(413, f"Corpo maior que {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _handle_detect(self, query, headers, body):
+        if not body:
+            raise RequestError(400, "Corpo vazio")
+
+        roi_id = query.get('roi', [None])[0]
+        if roi_id and roi_id not in self.rois:
+            raise RequestError(404, f"ROI desconhecida: {roi_id}")
+
+        content_type = headers.get('content-type', '').split(';')[0].strip()
+        loop = asyncio.get_running_loop()
+        # Decodificação fora do loop de eventos (cv2 libera o GIL)
+        frame = await loop.run_in_executor(None, decode_frame, body, content_type, headers)
+
+        start = time.perf_counter()
+        detections, batch_size, inference_ms = await self.batcher.submit(frame)
+        detections = filter_by_roi(detections, self.rois.get(roi_id))
+
+        return {
+            'detections': [{'bbox': d['bbox'], 'confidence': round(d['confidence'], 4),
+                            'class_id': d['class_id']} for d in detections],
+            'width': frame.shape[1],
+            'height': frame.shape[0],
+            'roi': roi_id,
+            'batch_size': batch_size,
+            'inference_ms': round(inference_ms, 2),
+            'total_ms': round((time.perf_counter() - start) * 1000, 2)
+        }
+
+    async def _dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        if method == 'POST' and url.path == '/detect':
+            return await self._handle_detect(parse_qs(url.query), headers, body)
+        if method == 'GET' and url.path == '/metrics':
+            metrics = self.batcher.metrics()
+            metrics['errors'] = self.errors
+            metrics['uptime_s'] = round(time.time() - self.started_at, 1)
+            return metrics
+        if method == 'GET' and url.path == '/health':
+            return {'status': 'ok', 'model': self.detector.model_path.name,
+                    'rois': sorted(self.rois)}
+        raise RequestError(404, f"Rota desconhecida: {method} {url.path}")
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, payload = 200, await self._dispatch(method, target, headers, body)
+                except RequestError as e:
+                    self.errors += 1
+                    status, payload = e.status, {'error': str(e)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"❌ Erro no pedido: {e}")
+                    status, payload = 500, {'error': str(e)}
+
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive or status in (400, 413):
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Atende até ser interrompido"""
+        self.batcher.start()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"🛰️ Serviço de inferência em http://{self.host}:{self.port} "
+                    f"(lote até {self.batcher.max_batch_size}, espera {self.batcher.max_wait * 1000:.0f}ms)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def detect(image_path, host='127.0.0.1', port=8765, roi=None, connection=None):
+    """Cliente: envia uma imagem ao serviço e retorna o JSON de resposta"""
+    conn = connection or http.client.HTTPConnection(host, port, timeout=30)
+    body = Path(image_path).read_bytes()
+    content_type = 'image/png' if str(image_path).lower().endswith('.png') else 'image/jpeg'
+    conn.request('POST', f"/detect?roi={roi}" if roi else '/detect', body=body,
+                 headers={'Content-Type': content_type})
+    response = conn.getresponse()
+    payload = json.loads(response.read())
+    if connection is None:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"{response.status}: {payload.get('error')}")
+    return payload
+
+
+def run_client(image_path, host, port, roi=None, requests=32, concurrency=8):
+    """Dispara pedidos concorrentes e imprime as métricas do serviço"""
+    def worker(count):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            return [detect(image_path, roi=roi, connection=conn) for _ in range(count)]
+        finally:
+            conn.close()
+
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0)
+                  for i in range(concurrency)]
+    start = time.perf_counter()
+    responses = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in as_completed([pool.submit(worker, n) for n in per_worker if n]):
+            responses.extend(future.result())
+    elapsed = time.perf_counter() - start
+
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.request('GET', '/metrics')
+    metrics = json.loads(conn.getresponse().read())
+    conn.close()
+
+    print(f"\n📡 {len(responses)} pedidos em {elapsed:.2f}s ({len(responses) / elapsed:.1f} req/s)")
+    if responses:
+        print(f"   - Detecções no último pedido: {len(responses[-1]['detections'])}")
+    print(f"   - Lote médio: {metrics['avg_batch_size']} {metrics['batch_size_histogram']}")
+    print(f"   - Fila p50/p95: {metrics['queue_ms_p50']}/{metrics['queue_ms_p95']}ms")
+    print(f"   - Recusados (fila cheia): {metrics['rejected']}")
+    print(f"   - Inferência p50/p95: {metrics['inference_ms_p50']}/{metrics['inference_ms_p95']}ms")
+    return metrics
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Serviço local de inferência com micro-lotes")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help="Inicia o serviço")
+    serve.add_argument('--model', required=True, help="Modelo .pt")
+    serve.add_argument('--config', help="Arquivo config.json")
+    serve.add_argument('--roi-dir', help="Pasta com ROIs JSON (ID = nome do arquivo)")
+    serve.add_argument('--host', help="Endereço (padrão do config: 127.0.0.1)")
+    serve.add_argument('--port', type=int, help="Porta")
+
+    client = sub.add_parser('client', help="Cliente de teste local")
+    client.add_argument('image', help="Imagem JPEG/PNG")
+    client.add_argument('--host', default='127.0.0.1')
+    client.add_argument('--port', type=int, default=8765)
+    client.add_argument('--roi', help="ID da ROI")
+    client.add_argument('--requests', type=int, default=32)
+    client.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'client':
+        run_client(args.image, args.host, args.port, args.roi, args.requests, args.concurrency)
+        return 0
+
+    from package_detector_tracker import PackageDetector
+
+    config_path = Path(args.config) if args.config else Path(__file__).resolve().parent.parent / "config.json"
+    # Sem ROI no detector: cada pedido escolhe a sua
+    detector = PackageDetector(args.model, config_path=config_path)
+    settings = dict(detector.config.get('inference_service', {}))
+    if args.host:
+        settings['host'] = args.host
+    if args.port:
+        settings['port'] = args.port
+
+    service = InferenceService.from_config(detector, settings, load_rois(args.roi_dir))
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        logger.info("⚠️ Serviço interrompido")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
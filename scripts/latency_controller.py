@@ -0,0 +1,192 @@
+"""
+Controlador de latência (SLO) para processamento de esteiras ao vivo
+"""
+
+import json
+import logging
+import math
+import time
+from collections import deque
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, q):
+    """Percentil q (0-1) pelo posto mais próximo: o menor valor com ao menos q das amostras"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def build_default_levels(input_size, batch_size=1):
+    """Gera a escada padrão de qualidade, da melhor para a mais barata"""
+
+    def scaled(factor):
+        # Resolução múltipla de 32, como o YOLO espera
+        return max(160, int(input_size * factor) // 32 * 32)
+
+    return [
+        {'input_size': input_size, 'detection_stride': 1, 'batch_size': batch_size},
+        {'input_size': scaled(0.75), 'detection_stride': 1, 'batch_size': batch_size},
+        {'input_size': scaled(0.75), 'detection_stride': 2, 'batch_size': batch_size},
+        {'input_size': scaled(0.5), 'detection_stride': 2, 'batch_size': max(batch_size, 2)},
+        {'input_size': scaled(0.5), 'detection_stride': 3, 'batch_size': max(batch_size, 4)},
+    ]
+
+
+class LatencySLOController:
+    """Mantém o orçamento de tempo real ajustando resolução, stride e lote"""
+
+    def __init__(self, budget_ms, levels, max_queue=5, degrade_ratio=1.0,
+                 restore_ratio=0.6, window=30, cooldown=30, restore_windows=3,
+                 metrics_path=None):
+        if not levels:
+            raise ValueError("É necessário pelo menos um nível de qualidade")
+
+        self.budget_ms = float(budget_ms)
+        self.levels = levels
+        self.max_queue = max_queue
+        self.degrade_ratio = degrade_ratio
+        self.restore_ratio = restore_ratio
+        self.cooldown = cooldown
+        # Folga exigida para subir de nível: restore_windows janelas completas, em frames
+        self.window = window
+        self.restore_windows = restore_windows
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+
+        self.level = 0
+        self.latencies = deque(maxlen=window)
+        self.queue_depth = 0
+        self.frames_seen = 0
+        self.last_adjustment_frame = 0
+        self.headroom_since = None
+        self.adjustments = []
+        self.degrade_count = 0
+        self.restore_count = 0
+
+    @classmethod
+    def from_config(cls, settings, input_size, batch_size, fps):
+        """Cria o controlador a partir da seção 'latency_controller' do config"""
+        budget_ms = settings.get('budget_ms') or (1000.0 / fps if fps else 33.3)
+        levels = settings.get('levels') or build_default_levels(input_size, batch_size)
+
+        return cls(
+            budget_ms=budget_ms,
+            levels=levels,
+            max_queue=settings.get('max_queue', 5),
+            degrade_ratio=settings.get('degrade_ratio', 1.0),
+            restore_ratio=settings.get('restore_ratio', 0.6),
+            window=settings.get('window', 30),
+            cooldown=settings.get('cooldown', 30),
+            restore_windows=settings.get('restore_windows', 3),
+            metrics_path=settings.get('metrics_path')
+        )
+
+    @property
+    def current(self):
+        """Nível de qualidade em uso"""
+        return self.levels[self.level]
+
+    def mean_latency(self):
+        """Latência média por frame na janela (ms)"""
+        if not self.latencies:
+            return 0.0
+        return sum(self.latencies) / len(self.latencies)
+
+    def update(self, frame_latency_ms, queue_depth=0, frames=1):
+        """Registra a latência observada e retorna o novo nível se houver ajuste"""
+        self.latencies.append(frame_latency_ms)
+        self.queue_depth = queue_depth
+        self.frames_seen += frames
+
+        if self.frames_seen - self.last_adjustment_frame < self.cooldown:
+            return None
+
+        mean_ms = self.mean_latency()
+        overloaded = (mean_ms > self.budget_ms * self.degrade_ratio
+                      or queue_depth > self.max_queue)
+        headroom = (mean_ms < self.budget_ms * self.restore_ratio
+                    and queue_depth == 0)
+
+        if overloaded:
+            self.headroom_since = None
+            if self.level < len(self.levels) - 1:
+                reason = (f"latência {mean_ms:.1f}ms / orçamento {self.budget_ms:.1f}ms, "
+                          f"fila {queue_depth}")
+                return self._adjust(self.level + 1, reason)
+        elif headroom:
+            if self.headroom_since is None:
+                self.headroom_since = self.frames_seen - frames
+            headroom_frames = self.frames_seen - self.headroom_since
+            if self.level > 0 and headroom_frames >= self.restore_windows * self.window:
+                reason = f"folga: latência {mean_ms:.1f}ms / orçamento {self.budget_ms:.1f}ms"
+                return self._adjust(self.level - 1, reason)
+        else:
+            self.headroom_since = None
+
+        return None
+
+    def _adjust(self, new_level, reason):
+        """Aplica a troca de nível e registra o evento"""
+        old = self.current
+        degrading = new_level > self.level
+        self.level = new_level
+        self.last_adjustment_frame = self.frames_seen
+        self.latencies.clear()
+        self.headroom_since = None
+
+        if degrading:
+            self.degrade_count += 1
+        else:
+            self.restore_count += 1
+
+        event = {
+            'time': time.time(),
+            'frame': self.frames_seen,
+            'action': 'degrade' if degrading else 'restore',
+            'from': old,
+            'to': self.current,
+            'reason': reason
+        }
+        self.adjustments.append(event)
+
+        log = logger.warning if degrading else logger.info
+        log(f"{'⬇️' if degrading else '⬆️'} SLO nível {self.level}: "
+            f"input {self.current['input_size']}, stride {self.current['detection_stride']}, "
+            f"lote {self.current['batch_size']} ({reason})")
+
+        self.write_metrics()
+        return self.current
+
+    def metrics(self):
+        """Métricas atuais do controlador"""
+        return {
+            'budget_ms': self.budget_ms,
+            'level': self.level,
+            'input_size': self.current['input_size'],
+            'detection_stride': self.current['detection_stride'],
+            'batch_size': self.current['batch_size'],
+            'mean_latency_ms': self.mean_latency(),
+            'p95_latency_ms': percentile(self.latencies, 0.95),
+            'queue_depth': self.queue_depth,
+            'frames_seen': self.frames_seen,
+            'degrade_count': self.degrade_count,
+            'restore_count': self.restore_count,
+            'adjustments': self.adjustments
+        }
+
+    def write_metrics(self):
+        """Grava as métricas em JSON (escrita atômica)"""
+        if not self.metrics_path:
+            return
+
+        try:
+            self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.metrics_path.with_suffix(self.metrics_path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.metrics(), f, indent=2, ensure_ascii=False)
+            tmp_path.replace(self.metrics_path)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar métricas de latência: {e}")
@@ -0,0 +1,50 @@
+"""
+Importação preguiçosa dos pacotes pesados (cv2, numpy, torch, ultralytics)
+
+O módulo real só é importado no primeiro acesso a um atributo, e o tempo de
+cada importação fica registrado em IMPORT_TIMES para o perfil de inicialização.
+"""
+
+import importlib
+import importlib.util
+import time
+
+# Tempo (s) gasto em cada importação preguiçosa já realizada
+IMPORT_TIMES = {}
+
+
+class LazyModule:
+    """Representa um módulo que é importado apenas quando usado"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            start = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            IMPORT_TIMES.setdefault(self._name, time.perf_counter() - start)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'carregado' if self._module is not None else 'não carregado'
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def is_available(name):
+    """Indica se o módulo está instalado, sem importá-lo"""
+    return importlib.util.find_spec(name) is not None
+
+
+def preload(names):
+    """Importa os módulos agora e retorna o tempo de cada um (s)"""
+    timings = {}
+    for name in names:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+    return timings
@@ -0,0 +1,163 @@
+"""
+Caminho enxuto de inferência PyTorch, sem o predictor do ultralytics
+
+Cada chamada `model(frames, ...)` do ultralytics monta o predictor, converte
+e empilha os frames, cria objetos Results e só então devolve as caixas. Em
+lote 1 e entradas pequenas (modo ao vivo) esse custo fixo pesa. Aqui a rede
+(DetectionModel já fundida) é chamada direto, sob `torch.inference_mode`:
+
+- letterbox (o mesmo de inference_backends, com o retângulo mínimo do
+  predictor) e normalização num tensor de entrada pré-alocado e reaproveitado;
+- decodificação da saída bruta (B, 4 + classes, âncoras) e NMS por classe
+  (torchvision.ops.batched_nms, o mesmo do predictor), direto para arrays
+  (N, 6) como os demais backends.
+
+Paridade com o caminho padrão:
+    python benchmark_inference.py --model modelo.pt --source photos/ --backends torch torch_lean
+"""
+
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+from inference_backends import letterbox
+from lazy_imports import LazyModule
+
+np = LazyModule('numpy')
+torch = LazyModule('torch')
+torchvision = LazyModule('torchvision')
+ultralytics = LazyModule('ultralytics')
+
+logger = logging.getLogger(__name__)
+
+MAX_DETECTIONS = 300
+# Mesmo teto de candidatos ao NMS do predictor do ultralytics (max_nms)
+MAX_CANDIDATES = 30000
+# Formatos de entrada mantidos; o menos usado sai quando o tamanho muda muito
+MAX_BUFFERS = 4
+
+
+class LeanTorchBackend:
+    """Inferência com o modelo .pt chamando a rede diretamente"""
+
+    name = 'torch_lean'
+
+    def __init__(self, model_path, input_size=640, batch_size=1, rect=True):
+        self.model_path = Path(model_path)
+        self.input_size = input_size
+        self.batch_size = batch_size
+        # Retângulo mínimo (múltiplo do stride), como o predictor faz com modelos .pt
+        self.rect = rect
+
+        self.model = ultralytics.YOLO(str(self.model_path))
+        net = self.model.model
+        if hasattr(net, 'fuse'):
+            net = net.fuse(verbose=False)
+        self.net = net.float().eval()
+        self.stride = max(32, int(net.stride.max())) if hasattr(net, 'stride') else 32
+        self.num_classes = len(self.names)
+        self.buffers = OrderedDict()
+        # Ligado pelo perfil de execução (runtime_profile.py) junto com os pesos
+        self.channels_last = False
+
+    @property
+    def names(self):
+        return getattr(self.model, 'names', {})
+
+    def _buffer(self, shape):
+        """Tensor de entrada pré-alocado (e sua visão numpy) para um formato
+
+        Com channels_last, o próprio buffer já nasce nesse layout: a visão numpy
+        (N, C, H, W) tem os strides de NHWC e a rede recebe o tensor sem cópia.
+        """
+        key = (shape, self.channels_last)
+        if key in self.buffers:
+            self.buffers.move_to_end(key)
+            return self.buffers[key]
+
+        memory_format = torch.channels_last if self.channels_last else torch.contiguous_format
+        tensor = torch.empty(shape, dtype=torch.float32, memory_format=memory_format)
+        self.buffers[key] = (tensor, tensor.numpy())
+        if len(self.buffers) > MAX_BUFFERS:
+            self.buffers.popitem(last=False)
+        return self.buffers[key]
+
+    def preprocess(self, frames, imgsz):
+        """Letterbox + BGR->RGB + /255 no tensor pré-alocado; retorna (tensor, escalas, pads)"""
+        stride = self.stride if self.rect else None
+        images, scales, pads = [], [], []
+        for frame in frames:
+            image, scale, pad = letterbox(frame, imgsz, stride=stride)
+            images.append(image)
+            scales.append(scale)
+            pads.append(pad)
+
+        # Frames de tamanhos diferentes: quadro comum, como o predictor (sem retângulo)
+        if len({image.shape for image in images}) > 1:
+            return self.preprocess_square(frames, imgsz)
+
+        height, width = images[0].shape[:2]
+        tensor, array = self._buffer((len(frames), 3, height, width))
+        for i, image in enumerate(images):
+            np.multiply(image[:, :, ::-1].transpose(2, 0, 1), 1 / 255.0, out=array[i], casting='unsafe')
+        return tensor, scales, pads
+
+    def preprocess_square(self, frames, imgsz):
+        tensor, array = self._buffer((len(frames), 3, imgsz, imgsz))
+        scales, pads = [], []
+        for i, frame in enumerate(frames):
+            image, scale, pad = letterbox(frame, imgsz)
+            np.multiply(image[:, :, ::-1].transpose(2, 0, 1), 1 / 255.0, out=array[i], casting='unsafe')
+            scales.append(scale)
+            pads.append(pad)
+        return tensor, scales, pads
+
+    def decode(self, output, conf, iou, scale, pad, shape):
+        """Saída bruta (4 + classes, âncoras) de um frame -> caixas (N, 6) no frame original"""
+        scores = output[4:4 + self.num_classes]
+        class_ids = scores.argmax(axis=0)
+        confidences = scores[class_ids, np.arange(scores.shape[1])]
+        keep = confidences > conf
+        if not keep.any():
+            return np.zeros((0, 6), dtype=np.float32)
+
+        xywh = output[:4, keep].T
+        confidences, class_ids = confidences[keep], class_ids[keep]
+        if len(confidences) > MAX_CANDIDATES:
+            top = np.argsort(-confidences)[:MAX_CANDIDATES]
+            xywh, confidences, class_ids = xywh[top], confidences[top], class_ids[top]
+
+        boxes = np.empty((len(xywh), 6), dtype=np.float32)
+        boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+        boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+        boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+        boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+        boxes[:, 4] = confidences
+        boxes[:, 5] = class_ids
+        candidates = torch.from_numpy(boxes)
+        keep = torchvision.ops.batched_nms(candidates[:, :4], candidates[:, 4], candidates[:, 5].long(), iou)
+        boxes = boxes[keep[:MAX_DETECTIONS].numpy()]
+
+        # Volta para coordenadas do frame original
+        height, width = shape[:2]
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / scale).clip(0, width)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / scale).clip(0, height)
+        return boxes
+
+    def predict(self, frames, conf, iou, imgsz):
+        """Executa a rede em uma lista de frames BGR"""
+        if not len(frames):
+            return []
+        tensor, scales, pads = self.preprocess(frames, imgsz)
+
+        with torch.inference_mode():
+            output = self.net(tensor)
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        output = output.float().numpy()
+        if output.ndim != 3 or output.shape[1] != 4 + self.num_classes:
+            raise ValueError(f"Saída inesperada da rede {tuple(output.shape)}: "
+                             "use o backend 'torch' para este modelo")
+
+        return [self.decode(output[i], conf, iou, scales[i], pads[i], frame.shape)
+                for i, frame in enumerate(frames)]
@@ -0,0 +1,135 @@
+"""
+Cascata de modelos: detector barato em todo frame, modelo completo só onde precisa
+
+O modelo barato (outro .pt pequeno ou o mesmo modelo em resolução menor) roda
+em todos os frames de inferência. O modelo completo só roda nos frames em que
+o barato está incerto (confiança entre `uncertain_low` e `uncertain_high`),
+vê um objeto novo (longe de todos os rastros) ou discorda do rastreador (um
+rastro ativo sem caixa por perto); e, por segurança, a cada `force_every`
+frames. Nos frames escalados, as duas saídas são comparadas para medir a
+discordância real entre os modelos.
+"""
+
+import logging
+import time
+
+from lazy_imports import LazyModule
+from vision_utils import box_iou
+
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+REASONS = ('forced', 'uncertain', 'new_object', 'tracker_disagreement')
+
+
+class ModelCascade:
+    """Decide, frame a frame, se a saída do modelo barato basta"""
+
+    def __init__(self, backend, input_size=320, uncertain_low=0.3, uncertain_high=0.7,
+                 match_distance=50, force_every=30, match_iou=0.5):
+        if not uncertain_low <= uncertain_high:
+            raise ValueError("uncertain_low deve ser menor ou igual a uncertain_high")
+
+        self.backend = backend
+        self.input_size = input_size
+        self.uncertain_low = uncertain_low
+        self.uncertain_high = uncertain_high
+        self.match_distance = match_distance
+        self.force_every = force_every
+        self.match_iou = match_iou
+
+        self.since_full = 0
+        self.frames = 0
+        self.escalated = 0
+        self.reasons = {reason: 0 for reason in REASONS}
+        self.disagreements = 0
+        self.cheap_s = 0.0
+        self.full_s = 0.0
+
+    @classmethod
+    def from_config(cls, settings, backend, match_distance=50):
+        """Cria a cascata a partir da seção 'model_cascade' do config"""
+        return cls(
+            backend,
+            input_size=settings.get('cheap_input_size', 320),
+            uncertain_low=settings.get('uncertain_low', 0.3),
+            uncertain_high=settings.get('uncertain_high', 0.7),
+            match_distance=settings.get('match_distance') or match_distance,
+            force_every=settings.get('force_every', 30),
+            match_iou=settings.get('match_iou', 0.5)
+        )
+
+    def predict(self, frames, iou):
+        """Caixas brutas do modelo barato (acima de uncertain_low)"""
+        start = time.perf_counter()
+        outputs = self.backend.predict(frames, conf=self.uncertain_low, iou=iou, imgsz=self.input_size)
+        self.cheap_s += time.perf_counter() - start
+        return outputs
+
+    def escalation_reason(self, boxes, tracked_centroids):
+        """Motivo para rodar o modelo completo neste frame, ou None
+
+        boxes: caixas do modelo barato dentro da ROI; tracked_centroids:
+        centroides dos rastros vistos no último frame de inferência.
+        """
+        self.frames += 1
+        self.since_full += 1
+
+        reason = None
+        centers = [((b[0] + b[2]) / 2, (b[1] + b[3]) / 2) for b in boxes]
+        if self.force_every and self.since_full >= self.force_every:
+            reason = 'forced'
+        elif any(b[4] < self.uncertain_high for b in boxes):
+            reason = 'uncertain'
+        elif any(self._nearest(center, tracked_centroids) > self.match_distance for center in centers):
+            reason = 'new_object'
+        elif any(self._nearest(centroid, centers) > self.match_distance for centroid in tracked_centroids):
+            reason = 'tracker_disagreement'
+
+        if reason:
+            self.escalated += 1
+            self.reasons[reason] += 1
+            self.since_full = 0
+        return reason
+
+    @staticmethod
+    def _nearest(point, others):
+        if not len(others):
+            return float('inf')
+        others = np.asarray(others, dtype=np.float32)
+        return float(np.min(np.hypot(others[:, 0] - point[0], others[:, 1] - point[1])))
+
+    def compare(self, cheap_boxes, full_boxes, conf_threshold):
+        """Conta discordância entre os modelos num frame escalado"""
+        cheap = [b for b in cheap_boxes if b[4] >= conf_threshold]
+        full = [b for b in full_boxes if b[4] >= conf_threshold]
+        unmatched = list(cheap)
+        agree = len(cheap) == len(full)
+        for box in full:
+            best = max(unmatched, key=lambda c: box_iou(box, c), default=None)
+            if best is None or box_iou(box, best) < self.match_iou:
+                agree = False
+                break
+            unmatched.remove(best)
+        if not agree:
+            self.disagreements += 1
+
+    def stats(self):
+        cheap_ms = self.cheap_s * 1000 / self.frames if self.frames else 0.0
+        full_ms = self.full_s * 1000 / self.escalated if self.escalated else None
+        savings = None
+        if full_ms:
+            # Custo real (barato em todos + completo nos escalados) contra completo em todos
+            savings = 1 - (self.cheap_s + self.full_s) * 1000 / (full_ms * self.frames)
+        return {
+            'frames': self.frames,
+            'escalated': self.escalated,
+            'hit_rate': round(1 - self.escalated / self.frames, 4) if self.frames else 0.0,
+            'reasons': dict(self.reasons),
+            'disagreements': self.disagreements,
+            'disagreement_rate': round(self.disagreements / self.escalated, 4) if self.escalated else 0.0,
+            'cheap_ms_per_frame': round(cheap_ms, 3),
+            'full_ms_per_frame': round(full_ms, 3) if full_ms is not None else None,
+            'estimated_savings': round(savings, 4) if savings is not None else None
+        }
@@ -0,0 +1,163 @@
+"""
+Gate de movimento: evita rodar o modelo em frames de esteira vazia
+
+Compara cada frame (apenas dentro da ROI, em resolução reduzida) com o frame
+anterior ou com um fundo médio. Sem movimento e sem rastros ativos, a
+inferência é pulada; a cada `force_every` frames ela é forçada por segurança.
+"""
+
+import logging
+
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """Decide, frame a frame, se a inferência é necessária"""
+
+    def __init__(self, roi_points=None, scale=0.25, pixel_threshold=25,
+                 min_changed_ratio=0.002, force_every=30, mode='diff',
+                 background_alpha=0.05, blur=5):
+        if mode not in ('diff', 'background'):
+            raise ValueError(f"Modo do gate desconhecido: {mode}")
+
+        self.roi_points = roi_points
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.force_every = force_every
+        self.mode = mode
+        self.background_alpha = background_alpha
+        self.blur = blur
+
+        self.crop = None
+        self.mask = None
+        self.mask_pixels = 0
+        self.reference = None
+        self.since_inference = 0
+
+        self.frames = 0
+        self.inferred = 0
+        self.skipped = 0
+        self.forced = 0
+        self.last_score = 0.0
+
+    @classmethod
+    def from_config(cls, settings, roi_points=None):
+        """Cria o gate a partir da seção 'motion_gate' do config"""
+        return cls(
+            roi_points=roi_points,
+            scale=settings.get('scale', 0.25),
+            pixel_threshold=settings.get('pixel_threshold', 25),
+            min_changed_ratio=settings.get('min_changed_ratio', 0.002),
+            force_every=settings.get('force_every', 30),
+            mode=settings.get('mode', 'diff'),
+            background_alpha=settings.get('background_alpha', 0.05),
+            blur=settings.get('blur', 5)
+        )
+
+    def _build_mask(self, frame_shape):
+        """Recorte retangular da ROI e máscara do polígono em escala reduzida"""
+        height, width = frame_shape[:2]
+
+        if self.roi_points is not None and len(self.roi_points) >= 3:
+            points = np.array(self.roi_points, dtype=np.int32)
+            bx, by, bw, bh = cv2.boundingRect(points)
+            # Recorte limitado ao frame (a ROI pode passar da borda)
+            x, y = max(0, bx), max(0, by)
+            w, h = min(width, bx + bw) - x, min(height, by + bh) - y
+            if w <= 0 or h <= 0:
+                raise ValueError(f"ROI fora do frame {width}x{height}: retângulo "
+                                 f"({bx}, {by}, {bw}, {bh}) não tem área visível")
+        else:
+            points = None
+            x, y, w, h = 0, 0, width, height
+
+        self.crop = (x, y, w, h)
+        small_w = max(1, int(w * self.scale))
+        small_h = max(1, int(h * self.scale))
+
+        self.mask = np.zeros((small_h, small_w), dtype=np.uint8)
+        if points is not None:
+            shifted = ((points - [x, y]) * [small_w / w, small_h / h]).astype(np.int32)
+            cv2.fillPoly(self.mask, [shifted], 255)
+        else:
+            self.mask[:] = 255
+
+        self.mask_pixels = max(1, cv2.countNonZero(self.mask))
+
+    def _prepare(self, frame):
+        """ROI recortada, reduzida, em cinza e suavizada"""
+        if self.mask is None:
+            self._build_mask(frame.shape)
+
+        x, y, w, h = self.crop
+        region = frame[y:y + h, x:x + w]
+        small = cv2.resize(region, (self.mask.shape[1], self.mask.shape[0]),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        if self.blur > 1:
+            gray = cv2.GaussianBlur(gray, (self.blur, self.blur), 0)
+        return gray
+
+    def motion_score(self, frame):
+        """Fração dos pixels da ROI que mudaram em relação à referência"""
+        gray = self._prepare(frame)
+
+        if self.reference is None:
+            self.reference = gray.astype(np.float32)
+            return 1.0
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.reference))
+        changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]
+        changed = cv2.bitwise_and(changed, self.mask)
+        score = cv2.countNonZero(changed) / self.mask_pixels
+
+        # Atualiza a referência (frame anterior ou fundo médio)
+        if self.mode == 'background':
+            cv2.accumulateWeighted(gray.astype(np.float32), self.reference, self.background_alpha)
+        else:
+            self.reference = gray.astype(np.float32)
+
+        return score
+
+    def reset(self):
+        """Descarta a referência (ex.: após um salto no vídeo)"""
+        self.reference = None
+        self.since_inference = 0
+
+    def should_infer(self, frame, active_tracks=0):
+        """True se o frame deve passar pelo modelo"""
+        self.frames += 1
+        self.last_score = self.motion_score(frame)
+        self.since_inference += 1
+
+        if self.last_score >= self.min_changed_ratio or active_tracks > 0:
+            infer = True
+        elif self.force_every and self.since_inference >= self.force_every:
+            infer = True
+            self.forced += 1
+        else:
+            infer = False
+
+        if infer:
+            self.inferred += 1
+            self.since_inference = 0
+        else:
+            self.skipped += 1
+
+        return infer
+
+    def stats(self):
+        """Estatísticas de frames pulados"""
+        return {
+            'frames': self.frames,
+            'inferred': self.inferred,
+            'skipped': self.skipped,
+            'forced': self.forced,
+            'skip_rate': self.skipped / self.frames if self.frames else 0.0
+        }
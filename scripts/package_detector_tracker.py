@@ -1,14 +1,37 @@
-import cv2
-import numpy as np
-from ultralytics import YOLO
+import time
+
+_STARTUP_T0 = time.perf_counter()
+
+import argparse
+import csv
 import json
 import os
 from pathlib import Path
 from datetime import datetime
-import time
 from collections import defaultdict, deque
 import logging
 
+from async_writers import AsyncWriterPool
+from checkpoint import (checkpoint_path_for, concat_segments, load_checkpoint, save_checkpoint,
+                        segment_path)
+from counting_line import LineCounter
+from crop_gallery import CropGallery
+from detection_cache import DetectionCache
+from event_recorder import EventRecorder
+from frame_sources import (FrameStoreSource, LiveSource, Prefetcher, is_live_url, iter_images,
+                           open_source)
+from inference_backends import create_backend
+from latency_controller import LatencySLOController, percentile
+from model_cascade import ModelCascade
+from runtime_profile import apply_model_profile, apply_runtime_profile
+from lazy_imports import LazyModule, preload
+from motion_gate import MotionGate
+from tiled_inference import TiledBackend
+
+# Pacotes pesados: importados apenas no primeiro uso
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,6 +45,8 @@ class PackageTracker:
         self.disappeared = {}
         self.max_disappeared = max_disappeared
         self.max_distance = max_distance
+        # Chamada com (ID, último centroide) quando um rastro é descartado
+        self.on_deregister = None
         
     def register(self, centroid):
         """Registra um novo objeto"""
@@ -31,6 +56,8 @@ class PackageTracker:
         
     def deregister(self, object_id):
         """Remove um objeto do rastreamento"""
+        if self.on_deregister:
+            self.on_deregister(object_id, self.objects[object_id])
         del self.objects[object_id]
         del self.disappeared[object_id]
         
@@ -107,16 +134,105 @@ class PackageTracker:
     def get_objects(self):
         """Retorna objetos ativos"""
         return self.objects
+    
+    def reset(self):
+        """Esquece os objetos ativos mantendo a sequência de IDs"""
+        self.objects = {}
+        self.disappeared = {}
+    
+    def get_state(self):
+        """Estado serializável (para checkpoints)"""
+        return {
+            'next_object_id': self.next_object_id,
+            'objects': {str(k): [int(v[0]), int(v[1])] for k, v in self.objects.items()},
+            'disappeared': {str(k): v for k, v in self.disappeared.items()}
+        }
+    
+    def set_state(self, state):
+        """Restaura o estado salvo por get_state()"""
+        self.next_object_id = state['next_object_id']
+        self.objects = {int(k): np.array(v, dtype="int") for k, v in state['objects'].items()}
+        self.disappeared = {int(k): v for k, v in state['disappeared'].items()}
+
+def assign_track_ids(detections, objects, max_distance=50):
+    """Associa a cada detecção o ID do objeto rastreado mais próximo"""
+    tracked_detections = []
+    for detection in detections:
+        bbox = detection['bbox']
+        center_x = (bbox[0] + bbox[2]) / 2
+        center_y = (bbox[1] + bbox[3]) / 2
+        
+        # Encontra o objeto mais próximo
+        min_distance = float('inf')
+        best_id = None
+        
+        for obj_id, centroid in objects.items():
+            distance = np.sqrt((center_x - centroid[0])**2 + (center_y - centroid[1])**2)
+            if distance < min_distance:
+                min_distance = distance
+                best_id = obj_id
+        
+        detection['track_id'] = best_id if min_distance < max_distance else None
+        tracked_detections.append(detection)
+    
+    return tracked_detections
+
+def color_for_id(track_id):
+    """Gera cor consistente para um ID"""
+    colors = [
+        (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0),
+        (255, 0, 255), (0, 255, 255), (128, 0, 128), (255, 165, 0),
+        (255, 192, 203), (0, 128, 0), (128, 128, 0), (128, 0, 0)
+    ]
+    return colors[track_id % len(colors)]
+
+def draw_boxes(frame, detections):
+    """Desenha caixas e rótulos (ID ou confiança) no próprio frame"""
+    for detection in detections:
+        bbox = detection['bbox']
+        confidence = detection['confidence']
+        track_id = detection.get('track_id')
+        
+        x1, y1, x2, y2 = bbox
+        
+        # Cor baseada no track_id
+        if track_id is not None:
+            color = color_for_id(track_id)
+            label = f"ID:{track_id} {confidence:.2f}"
+        else:
+            color = (0, 255, 0)
+            label = f"Det {confidence:.2f}"
+        
+        # Desenha bounding box
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        
+        # Desenha label
+        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+        cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), 
+                     (x1 + label_size[0], y1), color, -1)
+        cv2.putText(frame, label, (x1, y1 - 5), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+    return frame
 
 class PackageDetector:
     """Detector de pacotes em esteira com rastreamento"""
     
-    def __init__(self, model_path, roi_path=None):
+    def __init__(self, model_path, roi_path=None, config_path=None):
         self.model_path = Path(model_path)
         self.roi_path = Path(roi_path) if roi_path else None
+        self.config_path = Path(config_path) if config_path else None
+        self.config = {}
         self.model = None
+        self.backend = None
         self.roi_data = None
         self.tracker = PackageTracker()
+        self.line_points = None
+        # ROI e linha na resolução original; as ativas são escaladas para a fonte
+        self.base_roi_data = None
+        self.base_line_points = None
+        self.geometry_scale = 1.0
+        self.line_counter = None
+        self.runtime_profile = None
         
         # Estatísticas
         self.stats = {
@@ -128,28 +244,112 @@ class PackageDetector:
         # Configurações
         self.conf_threshold = 0.5
         self.nms_threshold = 0.4
+        self.warmup_enabled = True
+        self.startup_times = {}
+        self.input_size = 640
+        self.batch_size = 1
+        self.detection_stride = 1
         self.tracking_enabled = True
         
+        self.load_config()
+        self.apply_runtime_profile()
         self.load_model()
         self.load_roi()
+        
+        if self.warmup_enabled:
+            self.warmup()
+        
+        self.enable_tiling()
+    
+    def load_config(self):
+        """Carrega configurações do config.json"""
+        if not self.config_path or not self.config_path.exists():
+            return
+        
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                self.config = json.load(f)
+            
+            model_settings = self.config.get('model_settings', {})
+            self.conf_threshold = model_settings.get('confidence_threshold', self.conf_threshold)
+            self.nms_threshold = model_settings.get('nms_threshold', self.nms_threshold)
+            self.input_size = model_settings.get('input_size', self.input_size)
+            self.batch_size = model_settings.get('batch_size', self.batch_size)
+            self.detection_stride = model_settings.get('detection_stride', self.detection_stride)
+            self.warmup_enabled = model_settings.get('warmup', self.warmup_enabled)
+            
+            tracking_settings = self.config.get('tracking_settings', {})
+            self.tracking_enabled = tracking_settings.get('enabled', self.tracking_enabled)
+            self.tracker = PackageTracker(
+                max_disappeared=tracking_settings.get('max_disappeared', 30),
+                max_distance=tracking_settings.get('max_distance', 50)
+            )
+            
+            logger.info(f"✅ Configuração carregada: {self.config_path.name}")
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar configuração: {e}")
     
     def load_model(self):
-        """Carrega o modelo YOLO"""
+        """Carrega o modelo YOLO no backend de inferência configurado"""
         try:
             if not self.model_path.exists():
                 raise FileNotFoundError(f"Modelo não encontrado: {self.model_path}")
             
-            self.model = YOLO(str(self.model_path))
-            logger.info(f"✅ Modelo carregado: {self.model_path.name}")
+            start = time.perf_counter()
+            backend_settings = self.config.get('inference_backend', {})
+            self.backend = create_backend(
+                backend_settings.get('name', 'torch'),
+                self.model_path, self.input_size, self.batch_size,
+                precision=backend_settings.get('precision', 'fp32')
+            )
+            self.model = self.backend.model
+            profile_settings = self.config.get('runtime_profile', {})
+            if self.runtime_profile is not None:
+                self.runtime_profile.update(apply_model_profile(self.backend, profile_settings))
+            self.startup_times['model_load_s'] = time.perf_counter() - start
+            logger.info(f"✅ Modelo carregado: {self.model_path.name} (backend: {self.backend.name})")
             
             # Verifica classes do modelo
-            if hasattr(self.model, 'names'):
-                logger.info(f"📦 Classes detectáveis: {list(self.model.names.values())}")
+            if self.backend.names:
+                logger.info(f"📦 Classes detectáveis: {list(self.backend.names.values())}")
             
         except Exception as e:
             logger.error(f"❌ Erro ao carregar modelo: {e}")
             raise
     
+    def apply_runtime_profile(self):
+        """Threads do torch/OpenCV e afinidade de núcleos (antes da carga do modelo)"""
+        settings = self.config.get('runtime_profile', {})
+        if not settings.get('enabled', False):
+            return
+        self.runtime_profile = apply_runtime_profile(settings)
+    
+    def warmup(self):
+        """Executa uma inferência descartável no tamanho de entrada e lote configurados"""
+        start = time.perf_counter()
+        frames = [np.full((self.input_size, self.input_size, 3), 114, dtype=np.uint8)
+                  for _ in range(self.batch_size)]
+        self.backend.predict(frames, conf=self.conf_threshold,
+                             iou=self.nms_threshold, imgsz=self.input_size)
+        
+        self.startup_times['warmup_s'] = time.perf_counter() - start
+        logger.info(f"🔥 Aquecimento concluído em {self.startup_times['warmup_s']:.2f}s "
+                    f"(input {self.input_size}, lote {self.batch_size})")
+    
+    def enable_tiling(self):
+        """Envolve o backend em blocos da ROI se habilitado no config"""
+        settings = self.config.get('tiled_inference', {})
+        if not settings.get('enabled', False):
+            return
+        
+        roi_points = self.roi_data['roi']['points'] if self.roi_data else None
+        if roi_points is None:
+            logger.warning("⚠️ Mosaico sem ROI: os blocos cobrem o frame inteiro")
+        self.backend = TiledBackend.from_config(settings, self.backend, roi_points)
+        logger.info(f"🧩 Inferência em mosaico: blocos de {self.backend.tile_size}px, "
+                    f"sobreposição {self.backend.overlap * 100:.0f}%")
+    
     def load_roi(self):
         """Carrega configuração de ROI"""
         if not self.roi_path or not self.roi_path.exists():
@@ -164,10 +364,46 @@ class PackageDetector:
             logger.info(f"📍 Tipo: {self.roi_data['roi']['type']}")
             logger.info(f"📍 Pontos: {self.roi_data['roi']['points_count']}")
             
+            # Linha de contagem: conta cruzamentos, não restringe a área de detecção
+            if self.roi_data['roi']['type'] == 'counting_line':
+                self.line_points = self.roi_data['roi']['points']
+                self.roi_data = None
+            self.base_roi_data = self.roi_data
+            self.base_line_points = self.line_points
+            
         except Exception as e:
             logger.error(f"❌ Erro ao carregar ROI: {e}")
             self.roi_data = None
     
+    def scale_points(self, points):
+        """Pontos na resolução original -> resolução dos frames processados"""
+        if points is None or self.geometry_scale == 1.0:
+            return points
+        return [[int(round(x * self.geometry_scale)), int(round(y * self.geometry_scale))]
+                for x, y in points]
+    
+    def set_geometry_scale(self, scale):
+        """Escala ROI e linha de contagem para frames reduzidos (frame store com --scale)
+        
+        Sempre parte dos pontos originais, então chamadas repetidas não acumulam.
+        """
+        if scale == self.geometry_scale:
+            return
+        self.geometry_scale = scale
+        
+        if self.base_roi_data:
+            roi = dict(self.base_roi_data['roi'], points=self.scale_points(self.base_roi_data['roi']['points']))
+            self.roi_data = dict(self.base_roi_data, roi=roi)
+        self.line_points = self.scale_points(self.base_line_points)
+        
+        # O plano de blocos depende da ROI
+        if isinstance(self.backend, TiledBackend) and self.backend.roi_points is not None:
+            self.backend.roi_points = self.roi_data['roi']['points']
+            self.backend.plans.clear()
+        
+        if scale != 1.0:
+            logger.info(f"📐 ROI e linha de contagem escaladas para {scale:g}x (frame store reduzido)")
+    
     def is_point_in_roi(self, point):
         """Verifica se um ponto está dentro da ROI"""
         if not self.roi_data:
@@ -190,34 +426,89 @@ class PackageDetector:
     
     def detect_packages(self, frame):
         """Detecta pacotes no frame"""
+        return self.detect_packages_batch([frame])[0]
+    
+    def detect_packages_batch(self, frames):
+        """Detecta pacotes em um lote de frames (uma chamada ao backend)"""
         try:
             # Executa detecção
-            results = self.model(frame, conf=self.conf_threshold, verbose=False)
+            outputs = self.backend.predict(frames, conf=self.conf_threshold,
+                                           iou=self.nms_threshold, imgsz=self.input_size)
             
             # Processa detecções
-            detections = []
-            for result in results:
-                if result.boxes is not None:
-                    for box in result.boxes:
-                        # Coordenadas
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        confidence = float(box.conf[0].cpu().numpy())
-                        class_id = int(box.cls[0].cpu().numpy())
-                        
-                        # Verifica se está na ROI
-                        if self.is_detection_in_roi([x1, y1, x2, y2]):
-                            detections.append({
-                                'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                                'confidence': confidence,
-                                'class_id': class_id,
-                                'timestamp': time.time()
-                            })
+            return [self.filter_detections(boxes) for boxes in outputs]
             
-            return detections
+        except Exception as e:
+            logger.error(f"❌ Erro na detecção: {e}")
+            return [[] for _ in frames]
+    
+    def filter_detections(self, boxes):
+        """Caixas brutas (N, 6) -> detecções acima do limiar e dentro da ROI"""
+        detections = []
+        for x1, y1, x2, y2, confidence, class_id in boxes:
+            if confidence < self.conf_threshold:
+                continue
+            # Verifica se está na ROI
+            if self.is_detection_in_roi([x1, y1, x2, y2]):
+                detections.append({
+                    'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                    'confidence': float(confidence),
+                    'class_id': int(class_id),
+                    'timestamp': time.time()
+                })
+        return detections
+    
+    def detect_frames(self, frames, frame_indexes, cache=None, cascade=None):
+        """Detecções de um lote, reaproveitando e preenchendo o cache de detecções
+        
+        Frames None (replay sem decodificação) só podem vir do cache.
+        """
+        if cascade is not None:
+            return self.detect_cascade(frames, cascade)
+        if cache is None:
+            return self.detect_packages_batch(frames)
+        
+        raw = [cache.get(index) for index in frame_indexes]
+        missing = [i for i, boxes in enumerate(raw) if boxes is None and frames[i] is not None]
+        if missing:
+            try:
+                outputs = self.backend.predict([frames[i] for i in missing], conf=cache.conf_floor,
+                                               iou=self.nms_threshold, imgsz=self.input_size)
+                for i, boxes in zip(missing, outputs):
+                    cache.put(frame_indexes[i], boxes)
+                    raw[i] = boxes
+            except Exception as e:
+                logger.error(f"❌ Erro na detecção: {e}")
+        
+        return [self.filter_detections(boxes) if boxes is not None else [] for boxes in raw]
+    
+    def detect_cascade(self, frames, cascade):
+        """Detecções de um lote com a cascata: modelo completo só nos frames escalados"""
+        try:
+            cheap = cascade.predict(frames, self.nms_threshold)
+            
+            # Rastros vistos no último frame de inferência
+            tracked = [centroid for object_id, centroid in self.tracker.objects.items()
+                       if self.tracker.disappeared[object_id] == 0] if self.tracking_enabled else []
+            escalate = [i for i, boxes in enumerate(cheap)
+                        if cascade.escalation_reason([b for b in boxes if self.is_detection_in_roi(b[:4])],
+                                                     tracked)]
+            
+            outputs = list(cheap)
+            if escalate:
+                start = time.perf_counter()
+                full = self.backend.predict([frames[i] for i in escalate], conf=self.conf_threshold,
+                                            iou=self.nms_threshold, imgsz=self.input_size)
+                cascade.full_s += time.perf_counter() - start
+                for i, boxes in zip(escalate, full):
+                    cascade.compare(cheap[i], boxes, self.conf_threshold)
+                    outputs[i] = boxes
+            
+            return [self.filter_detections(boxes) for boxes in outputs]
             
         except Exception as e:
             logger.error(f"❌ Erro na detecção: {e}")
-            return []
+            return [[] for _ in frames]
     
     def update_tracking(self, detections):
         """Atualiza rastreamento dos pacotes"""
@@ -234,26 +525,7 @@ class PackageDetector:
         objects = self.tracker.update(rects)
         
         # Associa IDs às detecções
-        tracked_detections = []
-        for detection in detections:
-            bbox = detection['bbox']
-            center_x = (bbox[0] + bbox[2]) / 2
-            center_y = (bbox[1] + bbox[3]) / 2
-            
-            # Encontra o objeto mais próximo
-            min_distance = float('inf')
-            best_id = None
-            
-            for obj_id, centroid in objects.items():
-                distance = np.sqrt((center_x - centroid[0])**2 + (center_y - centroid[1])**2)
-                if distance < min_distance:
-                    min_distance = distance
-                    best_id = obj_id
-            
-            detection['track_id'] = best_id if min_distance < 50 else None
-            tracked_detections.append(detection)
-        
-        return tracked_detections
+        return assign_track_ids(detections, objects)
     
     def update_stats(self, detections):
         """Atualiza estatísticas"""
@@ -273,12 +545,10 @@ class PackageDetector:
             'detections': detections
         })
         
-        # Conta novos pacotes (tracking)
+        # Conta novos pacotes (rastros que cruzaram a linha de contagem)
         new_packages = 0
-        for detection in detections:
-            if detection.get('track_id') is not None:
-                # Lógica para contar apenas pacotes que cruzaram uma linha
-                pass
+        if self.line_counter:
+            new_packages = self.line_counter.update(detections)
         
         self.stats['total_packages'] += new_packages
     
@@ -293,31 +563,13 @@ class PackageDetector:
             cv2.putText(annotated_frame, f"ROI: {self.roi_data['roi']['type']}", 
                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
         
+        # Desenha linha de contagem
+        if self.line_counter:
+            line_points = np.array(self.line_counter.points, dtype=np.int32)
+            cv2.polylines(annotated_frame, [line_points], False, (0, 255, 0), 3)
+        
         # Desenha detecções
-        for detection in detections:
-            bbox = detection['bbox']
-            confidence = detection['confidence']
-            track_id = detection.get('track_id')
-            
-            x1, y1, x2, y2 = bbox
-            
-            # Cor baseada no track_id
-            if track_id is not None:
-                color = self.get_color_for_id(track_id)
-                label = f"ID:{track_id} {confidence:.2f}"
-            else:
-                color = (0, 255, 0)
-                label = f"Det {confidence:.2f}"
-            
-            # Desenha bounding box
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-            
-            # Desenha label
-            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-            cv2.rectangle(annotated_frame, (x1, y1 - label_size[1] - 10), 
-                         (x1 + label_size[0], y1), color, -1)
-            cv2.putText(annotated_frame, label, (x1, y1 - 5), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        draw_boxes(annotated_frame, detections)
         
         # Desenha estatísticas
         self.draw_stats(annotated_frame, detections)
@@ -326,12 +578,7 @@ class PackageDetector:
     
     def get_color_for_id(self, track_id):
         """Gera cor consistente para um ID"""
-        colors = [
-            (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0),
-            (255, 0, 255), (0, 255, 255), (128, 0, 128), (255, 165, 0),
-            (255, 192, 203), (0, 128, 0), (128, 128, 0), (128, 0, 0)
-        ]
-        return colors[track_id % len(colors)]
+        return color_for_id(track_id)
     
     def draw_stats(self, frame, detections):
         """Desenha estatísticas na tela"""
@@ -355,83 +602,562 @@ class PackageDetector:
             cv2.putText(frame, text, (frame.shape[1] - 295, y_pos), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
     
-    def process_video(self, video_path, output_path=None, max_frames=None):
-        """Processa um vídeo detectando pacotes"""
+    def create_latency_controller(self, fps):
+        """Cria o controlador de latência se habilitado no config"""
+        settings = self.config.get('latency_controller', {})
+        if not settings.get('enabled', False):
+            return None
         
-        video_path = Path(video_path)
-        if not video_path.exists():
-            raise FileNotFoundError(f"Vídeo não encontrado: {video_path}")
+        controller = LatencySLOController.from_config(
+            settings, self.input_size, self.batch_size, fps
+        )
+        self.apply_quality_level(controller.current)
         
-        # Abre vídeo
-        cap = cv2.VideoCapture(str(video_path))
-        if not cap.isOpened():
-            raise RuntimeError(f"Erro ao abrir vídeo: {video_path}")
+        # Backends exportados precisam de um artefato por resolução
+        if hasattr(self.backend, 'prepare'):
+            self.backend.prepare(sorted({level['input_size'] for level in controller.levels}))
+        
+        logger.info(f"⏱️ Controle de latência ativo - orçamento {controller.budget_ms:.1f}ms/frame, "
+                    f"{len(controller.levels)} níveis")
+        return controller
+    
+    def create_motion_gate(self):
+        """Cria o gate de movimento se habilitado no config"""
+        settings = self.config.get('motion_gate', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        roi_points = self.roi_data['roi']['points'] if self.roi_data else None
+        gate = MotionGate.from_config(settings, roi_points)
+        logger.info(f"🌙 Gate de movimento ativo - inferência forçada a cada {gate.force_every} frames")
+        return gate
+    
+    def create_model_cascade(self):
+        """Cria a cascata de modelos se habilitada no config"""
+        settings = self.config.get('model_cascade', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        cheap_size = settings.get('cheap_input_size', 320)
+        if settings.get('cheap_model'):
+            backend_settings = self.config.get('inference_backend', {})
+            backend = create_backend(
+                backend_settings.get('name', 'torch'),
+                Path(settings['cheap_model']), cheap_size, self.batch_size,
+                precision=backend_settings.get('precision', 'fp32')
+            )
+            name = Path(settings['cheap_model']).name
+        else:
+            # Mesmo modelo em resolução menor
+            backend = self.backend
+            name = f"{self.model_path.name} @ {cheap_size}"
+        if hasattr(backend, 'prepare'):
+            backend.prepare([cheap_size])
+        
+        cascade = ModelCascade.from_config(settings, backend, self.tracker.max_distance)
+        if self.warmup_enabled:
+            frames = [np.full((cheap_size, cheap_size, 3), 114, dtype=np.uint8)
+                      for _ in range(self.batch_size)]
+            backend.predict(frames, conf=cascade.uncertain_low, iou=self.nms_threshold, imgsz=cheap_size)
+        
+        logger.info(f"🪜 Cascata de modelos: {name} em todo frame, {self.model_path.name} "
+                    f"quando incerto (confiança {cascade.uncertain_low:.2f}-{cascade.uncertain_high:.2f})")
+        return cascade
+    
+    def create_line_counter(self):
+        """Cria o contador por linha (ROI do tipo counting_line ou config)"""
+        settings = self.config.get('counting_line', {})
+        points = self.line_points
+        if points is None:
+            if not settings.get('enabled', False):
+                return None
+            if settings.get('roi_path'):
+                with open(settings['roi_path'], 'r', encoding='utf-8') as f:
+                    points = json.load(f)['roi']['points']
+            else:
+                points = settings.get('points')
+            points = self.scale_points(points)
+        
+        counter = LineCounter.from_config(settings, points)
+        logger.info(f"📏 Linha de contagem com {len(counter.points)} pontos "
+                    f"(direção: {counter.direction})")
+        return counter
+    
+    def create_detection_cache(self, video_path, required=False):
+        """Cache de detecções brutas do vídeo se habilitado no config (ou exigido)"""
+        settings = self.config.get('detection_cache', {})
+        if not (settings.get('enabled', False) or required):
+            return None
+        
+        backend_settings = self.config.get('inference_backend', {})
+        # Em mosaico, as caixas brutas também dependem da ROI e da sobreposição dos blocos
+        name = self.backend.cache_tag() if isinstance(self.backend, TiledBackend) else self.backend.name
+        backend = f"{name}_{backend_settings.get('precision', 'fp32')}"
+        return DetectionCache(video_path, self.model_path, self.input_size, self.detection_cache_floor(),
+                              self.nms_threshold, backend, settings.get('cache_dir'))
+    
+    def detection_cache_floor(self):
+        """Piso de confiança das caixas guardadas no cache de detecções"""
+        settings = self.config.get('detection_cache', {})
+        # O piso nunca fica acima do limiar em uso, senão o replay perderia caixas
+        return min(settings.get('conf_floor', 0.05), self.conf_threshold)
+    
+    def artifact_dir(self, settings, video_name, output_path, suffix):
+        """Pasta <vídeo>_<sufixo> em output_dir do config, ao lado da saída ou no diretório atual"""
+        if settings.get('output_dir'):
+            base_dir = Path(settings['output_dir'])
+        elif output_path:
+            base_dir = Path(output_path).parent
+        else:
+            base_dir = Path('.')
+        return base_dir / f"{Path(video_name).stem}_{suffix}"
+    
+    def create_event_recorder(self, video_name, output_path, fps):
+        """Cria o gravador de clipes por evento se habilitado no config"""
+        settings = self.config.get('event_recorder', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        output_dir = self.artifact_dir(settings, video_name, output_path, 'events')
+        roi_points = self.roi_data['roi']['points'] if self.roi_data else None
+        recorder = EventRecorder.from_config(settings, output_dir, fps, roi_points)
+        logger.info(f"🎥 Clipes por evento em {output_dir} (pré-roll {recorder.pre_roll} frames, "
+                    f"eventos: {', '.join(sorted(recorder.events))})")
+        return recorder
+    
+    def create_crop_gallery(self, video_name, output_path, fps):
+        """Cria a galeria de recortes por pacote se habilitada no config"""
+        settings = self.config.get('crop_gallery', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        output_dir = self.artifact_dir(settings, video_name, output_path, 'gallery')
+        gallery = CropGallery.from_config(settings, output_dir, fps,
+                                          counting=self.line_counter is not None)
+        logger.info(f"🖼️ Galeria de recortes em {output_dir} (critério: {gallery.score}"
+                    f"{', só pacotes contados' if gallery.counted_only else ''})")
+        return gallery
+    
+    def apply_quality_level(self, level):
+        """Aplica um nível de qualidade (resolução, stride e lote)"""
+        self.input_size = level.get('input_size', self.input_size)
+        self.detection_stride = max(1, level.get('detection_stride', self.detection_stride))
+        self.batch_size = max(1, level.get('batch_size', self.batch_size))
+    
+    def load_segments(self, video_path, activity_index):
+        """Trechos ativos (frame inicial, frame final) a partir do índice de atividade"""
+        # Recursos opcionais: importados só quando usados (activity_index carrega o PyAV)
+        from activity_index import get_activity_index, load_activity_index
+        
+        if isinstance(activity_index, dict):
+            index = activity_index
+        elif activity_index is True:
+            roi_points = self.roi_data['roi']['points'] if self.roi_data else None
+            index = get_activity_index(video_path, roi_points, self.config.get('activity_index'))
+        else:
+            index = load_activity_index(video_path, activity_index)
+            if index is None:
+                raise FileNotFoundError(f"Índice de atividade inválido: {activity_index}")
+        
+        return [(s['start_frame'], s['end_frame']) for s in index['segments']]
+    
+    def iter_frames(self, source, segments=None, start=0):
+        """Frames da fonte a partir de `start`: (índice, frame, início de trecho)"""
+        if segments is None:
+            if start:
+                source.seek(start)
+            index = start
+            while True:
+                ret, frame = source.read()
+                if not ret:
+                    return
+                yield index, frame, False
+                index += 1
+        
+        for segment_start, end in segments:
+            if end < start:
+                continue
+            # Retomada no meio de um trecho não conta como início de trecho
+            first = max(segment_start, start)
+            source.seek(first)
+            for index in range(first, end + 1):
+                ret, frame = source.read()
+                if not ret:
+                    break
+                yield index, frame, index == segment_start
+    
+    def iter_cached_frames(self, total_frames, segments=None):
+        """Índices de frame sem decodificação (replay do cache): (índice, None, início)"""
+        if segments is None:
+            segments = [(0, total_frames - 1)]
+        for start, end in segments:
+            for index in range(start, end + 1):
+                yield index, None, index == start
+    
+    def replay_frame_indexes(self, total_frames, segments=None, max_frames=float('inf')):
+        """Frames que o replay busca no cache (mesma ordem e stride do loop de processamento)"""
+        indexes = []
+        for position, (index, _, _) in enumerate(self.iter_cached_frames(total_frames, segments)):
+            if position >= max_frames:
+                break
+            if position % self.detection_stride == 0:
+                indexes.append(index)
+        return indexes
+    
+    def check_replay_cache(self, cache, total_frames, segments, max_frames):
+        """Falha (ou avisa, com allow_partial_replay) se o replay encontraria frames sem cache"""
+        needed = self.replay_frame_indexes(total_frames, segments, max_frames)
+        missing = sum(1 for index in needed if index not in cache)
+        if not missing:
+            return 0
+        
+        message = (f"{missing}/{len(needed)} frames do replay sem detecções no cache {cache.path.name} "
+                   "(execução parcial, gate de movimento ou stride diferente)")
+        if missing == len(needed) or not self.config.get('detection_cache', {}).get('allow_partial_replay', False):
+            raise ValueError(f"Cache de detecções incompleto: {message}")
+        logger.warning(f"⚠️ {message}: a contagem desses frames fica de fora")
+        return missing
+    
+    def process_video(self, video_path, output_path=None, max_frames=None, activity_index=None,
+                      replay=False, live=False, resume=False, show_preview=True, on_frame=None):
+        """Processa um vídeo detectando pacotes
+        
+        activity_index: True (usa/gera o índice ao lado do vídeo), caminho do
+        índice ou dicionário; processa apenas os trechos ativos.
+        replay: usa só o cache de detecções, sem decodificar o vídeo nem rodar
+        o modelo (ROI, confiança, rastreamento e contagem são reaplicados).
+        video_path pode ser um frame store (.frames, ver frame_store.py).
+        live: trata a fonte como câmera ao vivo (URLs rtsp:// e índices de
+        câmera já são); um arquivo é reproduzido no ritmo do FPS, para testes.
+        resume: continua do checkpoint (seção 'checkpoint' do config), com os
+        mesmos IDs de rastro e contagem; a saída é gravada em segmentos.
+        show_preview: janela de preview (desligar em processos sem tela).
+        on_frame: chamada com (índice do frame, detecções rastreadas) a cada frame.
+        """
+        
+        # Abre vídeo (frame store pré-decodificado ou stream ao vivo)
+        live = live or is_live_url(video_path)
+        if live:
+            source = LiveSource.from_config(video_path, self.config.get('live_source', {}))
+        else:
+            source = open_source(video_path)
+        
+        # Frame store reduzido: ROI, linha, portão de movimento e blocos na escala dos frames
+        self.set_geometry_scale(source.meta.get('scale', 1.0) if isinstance(source, FrameStoreSource) else 1.0)
         
         # Informações do vídeo
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = source.fps
+        total_frames = source.frame_count
+        width = source.width
+        height = source.height
         
-        logger.info(f"📹 Processando vídeo: {video_path.name}")
+        logger.info(f"📹 Processando vídeo: {source.name}")
         logger.info(f"📊 Dimensões: {width}x{height}, {fps:.2f} FPS")
         logger.info(f"⏱️ Duração: {total_frames/fps:.2f}s ({total_frames} frames)")
         
-        # Configura saída se especificada
+        # Trechos ativos (segunda passada do processamento offline)
+        segments = None
+        if activity_index and live:
+            source.release()
+            raise ValueError("Índice de atividade não se aplica a fonte ao vivo")
+        if activity_index:
+            # O índice é validado contra o vídeo original, que o frame store não é
+            if isinstance(source, FrameStoreSource) and not isinstance(activity_index, dict):
+                source.release()
+                raise ValueError("Com frame store, passe o índice de atividade já carregado (dict)")
+            segments = self.load_segments(source.path, activity_index)
+            total_frames = sum(end - start + 1 for start, end in segments)
+            logger.info(f"🗂️ {len(segments)} trechos ativos ({total_frames} frames)")
+        
+        # Cache de detecções brutas (frames ao vivo não se repetem)
+        if live and replay:
+            source.release()
+            raise ValueError("Replay não se aplica a fonte ao vivo")
+        cache = None if live else self.create_detection_cache(source.path, required=replay)
+        if replay and not len(cache):
+            source.release()
+            raise FileNotFoundError(f"Cache de detecções vazio: {cache.path}")
+        replay_missing = 0
+        if replay:
+            try:
+                replay_missing = self.check_replay_cache(cache, source.frame_count, segments,
+                                                         max_frames or total_frames or float('inf'))
+            except ValueError:
+                source.release()
+                raise
+        if replay and output_path:
+            logger.warning("⚠️ Replay não decodifica o vídeo: saída de vídeo ignorada")
+            output_path = None
+        
+        # Checkpoints periódicos (e retomada)
+        checkpoint_settings = self.config.get('checkpoint', {})
+        checkpoint_every = 0
+        checkpoint_path = None
+        state = None
+        if (checkpoint_settings.get('enabled', False) or resume) and not (live or replay):
+            checkpoint_every = checkpoint_settings.get('every_frames', 1800)
+            checkpoint_path = checkpoint_path_for(source.path, output_path)
+            if resume:
+                state = load_checkpoint(checkpoint_path, source.path)
+                if state is None:
+                    logger.warning("⚠️ Nenhum checkpoint válido, processando desde o início")
+        
+        # Clipes e galeria ficam ao lado da saída pedida, mesmo sem o vídeo completo
+        requested_output = output_path
+        recorder = None
+        if replay:
+            if self.config.get('event_recorder', {}).get('enabled', False):
+                logger.warning("⚠️ Replay não decodifica o vídeo: clipes por evento desativados")
+        else:
+            recorder = self.create_event_recorder(source.name, requested_output, fps)
+        
+        # Vídeo anotado completo só se habilitado (clipes por evento o dispensam)
+        if output_path and not self.config.get('detection_settings', {}).get('save_annotated_frames', True):
+            logger.info("💾 save_annotated_frames desligado: vídeo anotado completo não será gravado")
+            output_path = None
+        
+        # Configura saída se especificada (em segmentos, com checkpoints)
         out = None
+        done_segments = list(state['segments']) if state else []
+        current_segment = None
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         if output_path:
             output_path = Path(output_path)
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
+            if checkpoint_path:
+                current_segment = segment_path(output_path, len(done_segments))
+                out = cv2.VideoWriter(str(current_segment), fourcc, fps, (width, height))
+            else:
+                out = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
             logger.info(f"💾 Salvando em: {output_path}")
         
         # Processa frames
         frame_count = 0
-        max_frames = max_frames or total_frames
+        next_frame = 0
+        last_detections = []
+        if state:
+            # Retoma exatamente do ponto salvo
+            frame_count = state['frames_processed']
+            next_frame = state['next_frame']
+            last_detections = state['last_detections']
+            self.tracker.set_state(state['tracker'])
+            self.stats['total_packages'] = state['total_packages']
+            # Janelas recentes (contagem por minuto, histórico) continuam de onde pararam
+            for key in ('packages_per_minute', 'detection_history'):
+                self.stats[key].clear()
+                self.stats[key].extend(state.get(key, []))
+            logger.info(f"⏯️ Retomando do frame {next_frame} ({frame_count} já processados)")
+        checkpoints_written = 0
+        next_checkpoint = frame_count + checkpoint_every
+        max_frames = max_frames or total_frames or float('inf')
         start_time = time.time()
+        elapsed = 0
+        avg_fps = 0
+        controller = self.create_latency_controller(fps)
+        if controller and cache:
+            # O tamanho de entrada muda em execução e faz parte da chave do cache
+            logger.warning("⚠️ Cache de detecções desativado com o controle de latência")
+            cache = None
+        cascade = None if replay else self.create_model_cascade()
+        if cascade and cache:
+            # O cache guarda saídas do modelo completo, que a cascata só roda às vezes
+            logger.warning("⚠️ Cache de detecções desativado com a cascata de modelos")
+            cache = None
+        gate = None if replay else self.create_motion_gate()
+        self.line_counter = self.create_line_counter()
+        if state and self.line_counter and state.get('line_counter'):
+            self.line_counter.set_state(state['line_counter'])
+        gallery = None
+        if replay:
+            if self.config.get('crop_gallery', {}).get('enabled', False):
+                logger.warning("⚠️ Replay não decodifica o vídeo: galeria de recortes desativada")
+        else:
+            gallery = self.create_crop_gallery(source.name, requested_output, fps)
+            if gallery and state and state.get('crop_gallery'):
+                gallery.set_state(state['crop_gallery'])
+        # Rastros descartados no frame atual (clipes de rastro perdido, galeria)
+        lost_tracks = []
+        if recorder or gallery:
+            self.tracker.on_deregister = lambda track_id, centroid: lost_tracks.append((track_id, centroid))
+        if replay:
+            frame_iter = self.iter_cached_frames(source.frame_count, segments)
+        else:
+            frame_iter = self.iter_frames(source, segments, start=next_frame)
+        live_latencies = deque(maxlen=1000)
+        completed = False
+        stop = False
         
         try:
-            while frame_count < max_frames:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+            while frame_count < max_frames and not stop:
+                batch_start = time.time()
                 
-                # Progresso
-                if frame_count % 30 == 0:  # A cada 30 frames
-                    progress = (frame_count / max_frames) * 100
-                    elapsed = time.time() - start_time
-                    fps_processing = frame_count / elapsed if elapsed > 0 else 0
+                # Lê frames até completar um lote de detecção (respeitando o stride)
+                frames = []
+                indexes = []
+                capture_times = []
+                infer_idxs = []
+                gated_idxs = set()
+                reset_idxs = set()
+                while frame_count + len(frames) < max_frames and len(infer_idxs) < self.batch_size:
+                    item = next(frame_iter, None)
+                    if item is None:
+                        stop = True
+                        break
+                    index, frame, segment_start = item
                     
-                    logger.info(f"🎬 Frame {frame_count}/{max_frames} "
-                              f"({progress:.1f}%) - {fps_processing:.1f} FPS")
-                
-                # Detecta pacotes
-                detections = self.detect_packages(frame)
+                    # Novo trecho ativo: rastros do trecho anterior não continuam
+                    if segment_start:
+                        reset_idxs.add(len(frames))
+                        if gate:
+                            gate.reset()
+                    if (frame_count + len(frames)) % self.detection_stride == 0:
+                        # Sem movimento na ROI e sem rastros ativos: pula o modelo
+                        if gate and not gate.should_infer(frame, len(self.tracker.objects)):
+                            gated_idxs.add(len(frames))
+                        else:
+                            infer_idxs.append(len(frames))
+                    frames.append(frame)
+                    indexes.append(index)
+                    capture_times.append(source.capture_ts if live else None)
                 
-                # Atualiza rastreamento
-                if self.tracking_enabled:
-                    detections = self.update_tracking(detections)
+                if not frames:
+                    break
                 
-                # Atualiza estatísticas
-                self.update_stats(detections)
+                # Detecta pacotes (uma chamada ao modelo por lote)
+                batch_detections = []
+                if infer_idxs:
+                    batch_detections = self.detect_frames([frames[i] for i in infer_idxs],
+                                                          [indexes[i] for i in infer_idxs], cache,
+                                                          cascade)
+                detected = dict(zip(infer_idxs, batch_detections))
                 
-                # Desenha resultados
-                annotated_frame = self.draw_detections(frame, detections)
+                # Fonte ao vivo: carimbo de captura e latência captura -> detecção
+                if live:
+                    now = time.time()
+                    for i in infer_idxs:
+                        live_latencies.append((now - capture_times[i]) * 1000)
+                        for detection in detected[i]:
+                            detection['capture_ts'] = capture_times[i]
                 
-                # Salva frame se necessário
-                if out:
-                    out.write(annotated_frame)
+                for i, frame in enumerate(frames):
+                    if i in reset_idxs:
+                        self.tracker.reset()
+                        last_detections = []
+                        if recorder:
+                            recorder.reset()
+                        if gallery:
+                            gallery.reset()
+                    
+                    # Progresso
+                    if frame_count % 30 == 0:  # A cada 30 frames
+                        elapsed = time.time() - start_time
+                        fps_processing = frame_count / elapsed if elapsed > 0 else 0
+                        
+                        if live:
+                            logger.info(f"🎬 Frame {frame_count} - {fps_processing:.1f} FPS, "
+                                        f"{source.dropped} descartados")
+                        else:
+                            progress = (frame_count / max_frames) * 100
+                            logger.info(f"🎬 Frame {frame_count}/{max_frames} "
+                                      f"({progress:.1f}%) - {fps_processing:.1f} FPS")
+                    
+                    if i in detected:
+                        detections = detected[i]
+                        
+                        # Atualiza rastreamento
+                        if self.tracking_enabled:
+                            detections = self.update_tracking(detections)
+                        last_detections = detections
+                    elif i in gated_idxs:
+                        # Esteira vazia: nenhuma detecção, sem chamar o modelo
+                        detections = []
+                        last_detections = detections
+                    else:
+                        # Frame pulado pelo stride: reaproveita as últimas detecções
+                        detections = last_detections
+                    
+                    # Atualiza estatísticas
+                    self.update_stats(detections)
+                    frame_count += 1
+                    if on_frame:
+                        on_frame(indexes[i], detections)
+                    
+                    # Replay: não há imagem para desenhar
+                    if frame is None:
+                        continue
+                    
+                    # Desenha resultados
+                    annotated_frame = self.draw_detections(frame, detections)
+                    
+                    # Salva frame se necessário
+                    if out:
+                        out.write(annotated_frame)
+                    
+                    crossed = self.line_counter.crossed if self.line_counter else ()
+                    
+                    # Galeria: melhor recorte de cada rastro (só detecções novas, não as do stride)
+                    if gallery:
+                        if i in detected:
+                            gallery.update(indexes[i], frame, detections)
+                        gallery.mark_crossed(crossed, indexes[i])
+                        gallery.release([track_id for track_id, _ in lost_tracks])
+                    
+                    # Clipes por evento (pré-roll em memória, gravação em segundo plano)
+                    if recorder:
+                        recorder.update(indexes[i], annotated_frame, detections, crossed, lost_tracks)
+                    lost_tracks.clear()
+                    
+                    # Mostra preview (opcional)
+                    if show_preview and frame_count % 10 == 0:  # A cada 10 frames
+                        cv2.imshow('Package Detection', annotated_frame)
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            logger.info("⚠️ Processamento interrompido pelo usuário")
+                            stop = True
                 
-                # Mostra preview (opcional)
-                if frame_count % 10 == 0:  # A cada 10 frames
-                    cv2.imshow('Package Detection', annotated_frame)
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        logger.info("⚠️ Processamento interrompido pelo usuário")
-                        break
+                # Controle de latência: frames atrasados em relação ao tempo real
+                # (só ao vivo; um arquivo não acumula fila por ser lido mais devagar que o FPS)
+                if controller:
+                    now = time.time()
+                    frame_latency_ms = (now - batch_start) * 1000 / len(frames)
+                    queue_depth = max(0, int((now - start_time) * fps) - frame_count) if live else 0
+                    level = controller.update(frame_latency_ms, queue_depth, len(frames))
+                    if level:
+                        self.apply_quality_level(level)
                 
-                frame_count += 1
+                # Checkpoint no limite do lote: estado consistente com os frames gravados
+                next_frame = indexes[-1] + 1
+                if checkpoint_path and frame_count >= next_checkpoint and not stop:
+                    if out:
+                        out.release()
+                        done_segments.append(str(current_segment))
+                        current_segment = segment_path(output_path, len(done_segments))
+                        out = cv2.VideoWriter(str(current_segment), fourcc, fps, (width, height))
+                    save_checkpoint(checkpoint_path, source.path, {
+                        'next_frame': next_frame,
+                        'frames_processed': frame_count,
+                        'tracker': self.tracker.get_state(),
+                        'line_counter': self.line_counter.get_state() if self.line_counter else None,
+                        'total_packages': self.stats['total_packages'],
+                        'packages_per_minute': list(self.stats['packages_per_minute']),
+                        'detection_history': list(self.stats['detection_history']),
+                        'last_detections': last_detections,
+                        'crop_gallery': gallery.get_state() if gallery else None,
+                        'output_path': str(output_path) if output_path else None,
+                        'segments': done_segments
+                    })
+                    checkpoints_written += 1
+                    next_checkpoint = frame_count + checkpoint_every
+            
+            # Concluído: junta os segmentos e descarta o checkpoint
+            if checkpoint_path:
+                if out:
+                    out.release()
+                    out = None
+                    concat_segments(done_segments + [str(current_segment)], output_path, fps)
+                if checkpoint_path.exists():
+                    checkpoint_path.unlink()
+            completed = True
             
             # Estatísticas finais
             elapsed = time.time() - start_time
@@ -447,41 +1173,298 @@ class PackageDetector:
             logger.info("⚠️ Processamento interrompido")
         
         finally:
-            cap.release()
+            source.release()
             if out:
                 out.release()
-            cv2.destroyAllWindows()
+            if cache:
+                cache.save()
+            if recorder:
+                recorder.close()
+            if gallery:
+                # Interrompido com checkpoint: rastros ativos ficam para a retomada
+                gallery.close(flush=completed or not checkpoint_path)
+            self.tracker.on_deregister = None
+            if show_preview:
+                cv2.destroyAllWindows()
         
-        return {
+        results = {
             'frames_processed': frame_count,
             'total_packages': self.stats['total_packages'],
             'processing_time': elapsed,
             'average_fps': avg_fps
         }
+        
+        if cache:
+            results['detection_cache'] = cache.stats()
+            if replay:
+                results['detection_cache']['replay_missing_frames'] = replay_missing
+        
+        if self.runtime_profile:
+            results['runtime_profile'] = self.runtime_profile
+        
+        if isinstance(self.backend, TiledBackend):
+            self.stats['tiled_inference'] = self.backend.stats()
+            results['tiled_inference'] = self.stats['tiled_inference']
+            logger.info(f"🧩 Mosaico: {self.stats['tiled_inference']['tiles_per_frame']} blocos/frame, "
+                        f"{self.stats['tiled_inference']['ms_per_tile']} ms/bloco")
+        
+        if cascade:
+            self.stats['model_cascade'] = cascade.stats()
+            results['model_cascade'] = self.stats['model_cascade']
+            savings = self.stats['model_cascade']['estimated_savings']
+            logger.info(f"🪜 Cascata: {cascade.escalated}/{cascade.frames} frames no modelo completo "
+                        f"(acerto {self.stats['model_cascade']['hit_rate'] * 100:.1f}%, "
+                        f"discordância {self.stats['model_cascade']['disagreement_rate'] * 100:.1f}%"
+                        f"{f', economia estimada {savings * 100:.0f}%' if savings is not None else ''})")
+        
+        if gallery:
+            results['crop_gallery'] = gallery.stats()
+            logger.info(f"🖼️ Galeria: {gallery.written} recortes gravados")
+        
+        if recorder:
+            results['event_recorder'] = recorder.stats()
+            logger.info(f"🎥 {recorder.clips} clipes de evento ({recorder.clip_frames}/{recorder.frames} "
+                        f"frames gravados)")
+        
+        if checkpoint_path:
+            results['checkpoints'] = checkpoints_written
+            results['resumed_from'] = state['next_frame'] if state else None
+        
+        if live:
+            results['live'] = source.stats()
+            if live_latencies:
+                results['live']['latency_ms_p50'] = percentile(live_latencies, 0.5)
+                results['live']['latency_ms_p95'] = percentile(live_latencies, 0.95)
+            logger.info(f"📡 Ao vivo: {source.dropped}/{source.captured} frames descartados, "
+                        f"{source.reconnects} reconexões")
+        
+        if self.line_counter:
+            results['line_counts'] = self.line_counter.counts()
+        
+        if gate:
+            self.stats['motion_gate'] = gate.stats()
+            results['motion_gate'] = self.stats['motion_gate']
+            logger.info(f"🌙 Gate de movimento: {gate.skipped}/{gate.frames} frames pulados "
+                        f"({gate.stats()['skip_rate'] * 100:.1f}%), {gate.forced} inferências forçadas")
+        
+        if controller:
+            controller.write_metrics()
+            self.stats['latency'] = controller.metrics()
+            results['latency'] = self.stats['latency']
+            self.apply_quality_level(controller.levels[0])
+        
+        return results
+    
+    def process_images(self, paths_or_dir, results_path=None, annotated_dir=None, writers=4):
+        """Detecta pacotes em imagens avulsas (pasta, arquivo ou lista)
+        
+        Os resultados vão para um único arquivo: .csv gera uma linha por
+        detecção, qualquer outra extensão gera JSONL com uma linha por imagem.
+        """
+        if results_path is None:
+            if isinstance(paths_or_dir, (str, Path)):
+                base = Path(paths_or_dir)
+                results_path = base.parent / f"{base.name}_detections.jsonl"
+            else:
+                # Lista de caminhos: na pasta de saída (anotadas) ou no diretório atual
+                results_path = Path(annotated_dir or Path.cwd()) / "images_detections.jsonl"
+        results_path = Path(results_path)
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        as_csv = results_path.suffix.lower() == '.csv'
+        
+        if annotated_dir:
+            annotated_dir = Path(annotated_dir)
+            annotated_dir.mkdir(parents=True, exist_ok=True)
+        
+        logger.info(f"🖼️ Processando imagens: {paths_or_dir}")
+        logger.info(f"💾 Resultados em: {results_path}")
+        
+        batch_size = max(1, self.batch_size)
+        loader = Prefetcher(iter_images(paths_or_dir), maxsize=batch_size * 4)
+        image_count = 0
+        detection_count = 0
+        start_time = time.time()
+        # Nomes já usados em annotated_dir: imagens homônimas de pastas diferentes não se sobrescrevem
+        annotated_names = set()
+        
+        def annotated_name(path):
+            name, n = path.name, 1
+            while name in annotated_names:
+                name = f"{path.stem}_{n}{path.suffix}"
+                n += 1
+            annotated_names.add(name)
+            return name
+        
+        with open(results_path, 'w', encoding='utf-8', newline='') as f, \
+                AsyncWriterPool(workers=writers, max_pending=batch_size * 4) as pool:
+            if as_csv:
+                writer = csv.writer(f)
+                writer.writerow(['image', 'width', 'height', 'x1', 'y1', 'x2', 'y2',
+                                 'confidence', 'class_id'])
+            
+            def flush(batch):
+                nonlocal image_count, detection_count
+                batch_detections = self.detect_packages_batch([image for _, image in batch])
+                for (path, image), detections in zip(batch, batch_detections):
+                    height, width = image.shape[:2]
+                    image_count += 1
+                    detection_count += len(detections)
+                    
+                    if as_csv:
+                        # Imagens sem detecção ficam com uma linha vazia para auditoria
+                        for d in detections or [None]:
+                            box = [*d['bbox'], round(d['confidence'], 4), d['class_id']] if d else [''] * 6
+                            writer.writerow([str(path), width, height, *box])
+                    else:
+                        f.write(json.dumps({
+                            'image': str(path),
+                            'width': width,
+                            'height': height,
+                            'detections': [{'bbox': d['bbox'], 'confidence': round(d['confidence'], 4),
+                                            'class_id': d['class_id']} for d in detections]
+                        }, ensure_ascii=False) + '\n')
+                    
+                    if annotated_dir:
+                        pool.submit(cv2.imwrite, str(annotated_dir / annotated_name(path)),
+                                    self.draw_detections(image, detections))
+            
+            batch = []
+            try:
+                for item in loader:
+                    batch.append(item)
+                    if len(batch) == batch_size:
+                        flush(batch)
+                        batch = []
+                if batch:
+                    flush(batch)
+            except KeyboardInterrupt:
+                logger.info("⚠️ Processamento interrompido")
+            finally:
+                loader.close()
+        
+        elapsed = time.time() - start_time
+        results = {
+            'images_processed': image_count,
+            'detections': detection_count,
+            'results_path': str(results_path),
+            'processing_time': elapsed,
+            'images_per_second': image_count / elapsed if elapsed > 0 else 0
+        }
+        
+        logger.info(f"✅ {image_count} imagens, {detection_count} detecções em {elapsed:.2f}s "
+                    f"({results['images_per_second']:.1f} img/s)")
+        
+        return results
+    
+    def auto_label(self, sources, output_dir, **overrides):
+        """Exporta as detecções de vídeos/pastas de imagens como dataset YOLO"""
+        from auto_labeler import AutoLabeler
+        
+        settings = dict(self.config.get('auto_label', {}))
+        settings.update(overrides)
+        labeler = AutoLabeler.from_config(self, output_dir, settings)
+        return labeler.run(sources)
+
+def profile_startup(model_path, roi_path=None, config_path=None, video_path=None):
+    """Mede a inicialização a frio: importações, carga do modelo e primeira detecção"""
+    report = {'imports_s': preload(['numpy', 'cv2', 'torch', 'ultralytics'])}
+    
+    detector = PackageDetector(model_path, roi_path, config_path)
+    report.update(detector.startup_times)
+    
+    # Primeiro frame real (ou sintético, sem vídeo)
+    frame = None
+    if video_path:
+        cap = cv2.VideoCapture(str(video_path))
+        ret, frame = cap.read()
+        cap.release()
+        if not ret:
+            frame = None
+    if frame is None:
+        frame = np.full((720, 1280, 3), 114, dtype=np.uint8)
+    
+    start = time.perf_counter()
+    detector.detect_packages(frame)
+    report['first_detection_s'] = time.perf_counter() - start
+    report['time_to_first_detection_s'] = time.perf_counter() - _STARTUP_T0
+    
+    start = time.perf_counter()
+    detector.detect_packages(frame)
+    report['steady_detection_s'] = time.perf_counter() - start
+    
+    print(f"\n⏱️ PERFIL DE INICIALIZAÇÃO")
+    print("="*50)
+    for name, seconds in report['imports_s'].items():
+        print(f"   - import {name}: {seconds:.2f}s")
+    print(f"   - Carga do modelo: {report.get('model_load_s', 0):.2f}s")
+    print(f"   - Aquecimento: {report.get('warmup_s', 0):.2f}s")
+    print(f"   - Primeira detecção: {report['first_detection_s'] * 1000:.1f}ms")
+    print(f"   - Detecção seguinte: {report['steady_detection_s'] * 1000:.1f}ms")
+    print(f"   - Total até a primeira detecção: {report['time_to_first_detection_s']:.2f}s")
+    
+    return report
 
 def main():
     """Função principal"""
     
+    parser = argparse.ArgumentParser(description="Detector de pacotes em esteira")
+    parser.add_argument('--model', help="Modelo .pt")
+    parser.add_argument('--video', help="Vídeo a processar")
+    parser.add_argument('--roi', help="Arquivo JSON de ROI")
+    parser.add_argument('--config', help="Arquivo config.json")
+    parser.add_argument('--images', help="Pasta ou arquivo de imagens a processar (ex.: photos/)")
+    parser.add_argument('--results', help="Arquivo de resultados das imagens (.jsonl ou .csv)")
+    parser.add_argument('--annotated-dir', help="Pasta para as imagens anotadas")
+    parser.add_argument('--active-only', action='store_true',
+                        help="Processa só os trechos ativos (gera o índice de atividade se preciso)")
+    parser.add_argument('--live', action='store_true',
+                        help="Fonte ao vivo (--video com URL rtsp://, índice de câmera ou arquivo em tempo real)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Retoma do último checkpoint do vídeo")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Decodificação, inferência e codificação em processos separados")
+    parser.add_argument('--replay', action='store_true',
+                        help="Reprocessa a partir do cache de detecções, sem rodar o modelo")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="Mede importações, carga do modelo e primeira detecção e sai")
+    args = parser.parse_args()
+    
     print("🚚 DETECTOR DE PACOTES EM ESTEIRA")
     print("="*50)
     
     # Caminhos
-    model_path = Path(r"D:\Sentric\MercadoLivre\dataset3.0\sentricml\models\MercadoLivreBest.pt")
+    model_path = Path(args.model or r"D:\Sentric\MercadoLivre\dataset3.0\sentricml\models\MercadoLivreBest.pt")
     videos_dir = Path(r"D:\Sentric\MercadoLivre\dataset3.0\sentricml\videos")
     roi_dir = Path(r"D:\Sentric\MercadoLivre\dataset3.0\sentricml\roi")
     output_dir = Path(r"D:\Sentric\MercadoLivre\dataset3.0\sentricml\output")
+    config_path = Path(args.config) if args.config else Path(__file__).resolve().parent.parent / "config.json"
+    
+    if args.startup_profile:
+        profile_startup(model_path, args.roi, config_path, args.video)
+        return
     
     # Verifica modelo
     if not model_path.exists():
         print(f"❌ Modelo não encontrado: {model_path}")
         return
     
+    if args.images:
+        detector = PackageDetector(model_path, args.roi, config_path)
+        results = detector.process_images(args.images, args.results, args.annotated_dir)
+        print(f"\n🎉 {results['images_processed']} imagens processadas")
+        print(f"   - Detecções: {results['detections']}")
+        print(f"   - Imagens/s: {results['images_per_second']:.1f}")
+        print(f"   - Resultados: {results['results_path']}")
+        return
+    
     # Lista vídeos disponíveis
     videos = []
-    if videos_dir.exists():
+    if videos_dir.exists() and not args.video:
         videos = list(videos_dir.glob("*.mp4")) + list(videos_dir.glob("*.avi"))
     
-    if not videos:
+    if args.video:
+        video_path = Path(args.video)
+    elif not videos:
         print("❌ Nenhum vídeo encontrado")
         video_path = input("Digite o caminho do vídeo: ").strip()
         if not video_path:
@@ -505,10 +1488,10 @@ def main():
     
     # Lista ROIs disponíveis
     rois = []
-    if roi_dir.exists():
+    if roi_dir.exists() and not args.roi:
         rois = list(roi_dir.glob("*.json"))
     
-    roi_path = None
+    roi_path = Path(args.roi) if args.roi else None
     if rois:
         print(f"\n📍 ROIs encontradas ({len(rois)}):")
         print("   0. Sem ROI (frame completo)")
@@ -531,8 +1514,6 @@ def main():
     
     # Cria detector
     try:
-        detector = PackageDetector(model_path, roi_path)
-        
         # Configura saída
         output_path = output_dir / f"{video_path.stem}_detected.mp4"
         
@@ -540,7 +1521,22 @@ def main():
         max_frames = input("Máximo de frames (Enter para todos): ").strip()
         max_frames = int(max_frames) if max_frames.isdigit() else None
         
-        results = detector.process_video(video_path, output_path, max_frames)
+        if args.pipeline:
+            from shm_pipeline import run_pipeline
+            
+            # O modelo é carregado no processo de inferência
+            with open(config_path, 'r', encoding='utf-8') as f:
+                slots = json.load(f).get('shm_pipeline', {}).get('slots', 8)
+            results = run_pipeline(model_path, video_path, roi_path, config_path, output_path,
+                                   slots, max_frames)
+        else:
+            detector = PackageDetector(model_path, roi_path, config_path)
+            # URLs de stream não passam por Path (que colapsaria 'rtsp://')
+            video_source = args.video if args.video and is_live_url(args.video) else video_path
+            results = detector.process_video(video_source, output_path, max_frames,
+                                             activity_index=args.active_only or None,
+                                             replay=args.replay, live=args.live,
+                                             resume=args.resume)
         
         print(f"\n🎉 Processamento concluído!")
         print(f"📊 Resultados:")
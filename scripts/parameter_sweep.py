@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Varredura de parâmetros de rastreamento, ROI, limiar e linha de contagem
+
+O modelo roda uma única vez por vídeo, com piso de confiança baixo, e as
+caixas brutas ficam no cache de detecções. Cada combinação da grade é então
+reavaliada sobre o cache (filtro de ROI e confiança, rastreador e contagem)
+em um pool de processos, sem decodificar o vídeo nem rodar o modelo.
+
+A grade vem da seção 'parameter_sweep' do config ou de um JSON (--grid):
+    {"max_disappeared": [15, 30], "max_distance": [30, 50, 80],
+     "confidence_threshold": [0.4, 0.5], "counting_lines": [[[320, 0], [320, 360]]],
+     "rois": [null, "roi/esteira.json"]}
+
+Trocas de ID são estimadas sem gabarito: um rastro novo que nasce perto de
+onde outro rastro sumiu há poucos frames conta como uma troca.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from counting_line import LineCounter
+from frame_sources import VideoFileSource
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+GRID_KEYS = ('max_disappeared', 'max_distance', 'confidence_threshold', 'counting_lines', 'rois')
+
+# Caixas brutas por vídeo, carregadas uma vez em cada processo do pool
+_VIDEOS = {}
+
+
+def build_grid(grid):
+    """Lista de combinações (dicionários) do produto cartesiano da grade"""
+    values = [grid.get(key) or [None] for key in GRID_KEYS]
+    return [dict(zip(GRID_KEYS, combo)) for combo in itertools.product(*values)]
+
+
+def fill_cache(detector, video_path):
+    """Roda o modelo nos frames que ainda não estão no cache do vídeo"""
+    cache = detector.create_detection_cache(video_path, required=True)
+    source = VideoFileSource(video_path)
+    try:
+        if len(cache) >= source.frame_count:
+            print(f"♻️ {source.name}: cache completo ({len(cache)} frames)")
+            return cache
+
+        start = time.time()
+        frames, indexes = [], []
+        index = inferred = 0
+        while True:
+            if index in cache:
+                # Frame já inferido: descartado sem conversão
+                if not source.cap.grab():
+                    break
+            else:
+                ret, frame = source.read()
+                if not ret:
+                    break
+                frames.append(frame)
+                indexes.append(index)
+                inferred += 1
+                if len(frames) == detector.batch_size:
+                    detector.detect_frames(frames, indexes, cache)
+                    frames, indexes = [], []
+            index += 1
+        if frames:
+            detector.detect_frames(frames, indexes, cache)
+        cache.save()
+        print(f"🤖 {source.name}: {inferred}/{index} frames inferidos em {time.time() - start:.1f}s")
+    finally:
+        source.release()
+    return cache
+
+
+def _load_roi(roi):
+    if roi is None:
+        return None
+    if isinstance(roi, (list, tuple)):
+        return roi
+    with open(roi, 'r', encoding='utf-8') as f:
+        return json.load(f)['roi']['points']
+
+
+def _init_worker(video_entries):
+    cv2.setNumThreads(1)
+    _VIDEOS.update(video_entries)
+
+
+def replay_video(entries, frame_count, params, default_roi=None, switch_window=15, switch_radius=80):
+    """Reaplica filtro, rastreador e contagem sobre as caixas brutas de um vídeo"""
+    from package_detector_tracker import PackageTracker, assign_track_ids
+
+    roi = _load_roi(params.get('rois')) or default_roi
+    polygon = np.array(roi, dtype=np.float32) if roi else None
+    conf = params.get('confidence_threshold') or 0.5
+    tracker = PackageTracker(max_disappeared=params.get('max_disappeared') or 30,
+                             max_distance=params.get('max_distance') or 50)
+    line = params.get('counting_lines')
+    counter = LineCounter(line) if line else None
+
+    last_seen = {}
+    id_switches = 0
+    empty = np.zeros((0, 6), dtype=np.float32)
+
+    for index in range(frame_count):
+        detections = []
+        for x1, y1, x2, y2, confidence, class_id in entries.get(index, empty):
+            if confidence < conf:
+                continue
+            if polygon is not None and cv2.pointPolygonTest(
+                    polygon, ((x1 + x2) / 2, (y1 + y2) / 2), False) < 0:
+                continue
+            detections.append({'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                               'confidence': float(confidence), 'class_id': int(class_id)})
+
+        objects = tracker.update([d['bbox'] for d in detections])
+        detections = assign_track_ids(detections, objects)
+        if counter:
+            counter.update(detections)
+
+        current = {}
+        for d in detections:
+            if d['track_id'] is not None:
+                x1, y1, x2, y2 = d['bbox']
+                current[d['track_id']] = ((x1 + x2) / 2, (y1 + y2) / 2)
+
+        for track_id, center in current.items():
+            if track_id in last_seen:
+                continue
+            # Rastro novo perto de um que sumiu há pouco: provável troca de ID
+            for other_id, (frame, other_center) in last_seen.items():
+                if other_id in current or index - frame > switch_window:
+                    continue
+                if np.hypot(center[0] - other_center[0], center[1] - other_center[1]) <= switch_radius:
+                    id_switches += 1
+                    break
+
+        for track_id, center in current.items():
+            last_seen[track_id] = (index, center)
+
+    return {
+        'count': counter.total if counter else None,
+        'tracks': tracker.next_object_id,
+        'id_switches': id_switches
+    }
+
+
+def _evaluate(job):
+    config_id, params, default_roi, reference = job
+    rows = []
+    for video, (entries, frame_count) in _VIDEOS.items():
+        result = replay_video(entries, frame_count, params, default_roi)
+        expected = reference.get(video)
+        error = None
+        if expected is not None and result['count'] is not None:
+            error = result['count'] - expected
+        rows.append({'config_id': config_id, 'video': video, **result,
+                     'reference': expected, 'error': error})
+    return config_id, params, rows
+
+
+def check_confidence_grid(grid, conf_floor):
+    """Recusa limiares abaixo do piso do cache: as caixas entre eles já foram descartadas"""
+    below = [conf for conf in grid.get('confidence_threshold') or []
+             if conf is not None and conf < conf_floor]
+    if below:
+        raise ValueError(f"confidence_threshold {below} abaixo do piso do cache de detecções "
+                         f"({conf_floor:g}): reduza detection_cache.conf_floor ou remova esses valores")
+
+
+def run_sweep(detector, videos, grid, reference=None, processes=None, default_roi=None):
+    """Uma inferência por vídeo + reavaliação de todas as combinações da grade
+
+    Sem default_roi, as combinações sem 'rois' usam a ROI do detector (se houver).
+    """
+    reference = reference or {}
+    check_confidence_grid(grid, detector.detection_cache_floor())
+    if default_roi is None and detector.roi_data:
+        default_roi = detector.roi_data['roi']['points']
+    video_entries = {}
+    for video in videos:
+        cache = fill_cache(detector, video)
+        source = VideoFileSource(video)
+        frame_count = source.frame_count
+        source.release()
+        video_entries[Path(video).name] = (cache.entries, frame_count)
+
+    if not grid.get('counting_lines'):
+        # Sem linhas na grade: usa a linha de contagem do config, se houver
+        counter = detector.create_line_counter()
+        if counter:
+            grid = dict(grid, counting_lines=[counter.points])
+
+    combos = build_grid(grid)
+    processes = processes or min(len(combos), os.cpu_count() or 1)
+    print(f"🧪 {len(combos)} combinações x {len(videos)} vídeos em {processes} processos")
+
+    start = time.time()
+    jobs = [(i, params, default_roi, reference) for i, params in enumerate(combos)]
+    summary = []
+    rows = []
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(video_entries,)) as pool:
+        for config_id, params, config_rows in pool.map(_evaluate, jobs):
+            rows.extend(config_rows)
+            errors = [r['error'] for r in config_rows if r['error'] is not None]
+            summary.append({
+                'config_id': config_id,
+                **{k: params[k] for k in GRID_KEYS},
+                'count': sum(r['count'] or 0 for r in config_rows),
+                'tracks': sum(r['tracks'] for r in config_rows),
+                'id_switches': sum(r['id_switches'] for r in config_rows),
+                'abs_error': sum(abs(e) for e in errors) if errors else None,
+                'exact_matches': sum(1 for e in errors if e == 0) if errors else None
+            })
+
+    # Melhores primeiro: menor erro contra a referência, depois menos trocas de ID
+    summary.sort(key=lambda s: (s['abs_error'] if s['abs_error'] is not None else float('inf'),
+                                s['id_switches']))
+    print(f"✅ Varredura concluída em {time.time() - start:.1f}s")
+    return summary, rows
+
+
+def write_results(summary, rows, output_path):
+    """Resumo por combinação (.csv ou .json) e detalhe por vídeo (JSON ao lado)"""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if output_path.suffix.lower() == '.csv':
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary[0].keys()))
+            writer.writeheader()
+            for row in summary:
+                writer.writerow({k: json.dumps(v) if isinstance(v, list) else v
+                                 for k, v in row.items()})
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    details = output_path.with_name(output_path.stem + '_per_video.json')
+    with open(details, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, indent=2, ensure_ascii=False)
+    return details
+
+
+def main():
+    """Função principal"""
+    from package_detector_tracker import PackageDetector
+
+    parser = argparse.ArgumentParser(description="Varredura de parâmetros pós-inferência")
+    parser.add_argument('videos', nargs='+', help="Vídeos avaliados")
+    parser.add_argument('--model', required=True, help="Modelo .pt")
+    parser.add_argument('--config', help="Arquivo config.json")
+    parser.add_argument('--roi', help="Arquivo de ROI do detector, padrão das combinações sem 'rois'")
+    parser.add_argument('--grid', help="JSON da grade (padrão: seção parameter_sweep do config)")
+    parser.add_argument('--reference', help="JSON {nome_do_video: contagem_manual}")
+    parser.add_argument('--processes', type=int, help="Número de processos")
+    parser.add_argument('--output', default='sweep_results.csv', help="Resumo (.csv ou .json)")
+    parser.add_argument('--top', type=int, default=10, help="Combinações exibidas")
+    args = parser.parse_args()
+
+    config_path = Path(args.config) if args.config else Path(__file__).resolve().parent.parent / "config.json"
+    detector = PackageDetector(args.model, args.roi, config_path=config_path)
+
+    if args.grid:
+        with open(args.grid, 'r', encoding='utf-8') as f:
+            grid = json.load(f)
+    else:
+        grid = detector.config.get('parameter_sweep', {})
+
+    reference = {}
+    if args.reference:
+        with open(args.reference, 'r', encoding='utf-8') as f:
+            reference = json.load(f)
+
+    try:
+        summary, rows = run_sweep(detector, args.videos, grid, reference, args.processes)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    details = write_results(summary, rows, args.output)
+
+    print(f"\n🏆 Melhores combinações:")
+    for s in summary[:args.top]:
+        error = f"erro {s['abs_error']}" if s['abs_error'] is not None else "sem referência"
+        print(f"   #{s['config_id']}: disappeared={s['max_disappeared']} distance={s['max_distance']} "
+              f"conf={s['confidence_threshold']} -> {s['count']} pacotes, {error}, "
+              f"{s['id_switches']} trocas de ID")
+    print(f"\n💾 Resumo: {args.output}")
+    print(f"💾 Por vídeo: {details}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
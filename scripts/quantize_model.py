@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Quantização INT8 pós-treinamento do modelo de pacotes (ONNX Runtime)
+
+Calibra com frames de `photos/` (capturados por take_single_picture.py) ou
+amostrados de vídeos, gera o modelo INT8 no cache de exportação e mede a
+aceleração e a diferença de detecções em relação ao FP32 em frames separados.
+
+Para usar o modelo gerado no detector:
+    "inference_backend": {"name": "onnx", "precision": "int8"}
+"""
+
+import argparse
+import json
+import logging
+import random
+import sys
+
+from benchmark_inference import compare_detections, load_frames, run_detector
+from inference_backends import create_backend, export_cache_path, export_model, to_input_tensor
+from package_detector_tracker import PackageDetector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def collect_frames(sources, limit):
+    """Junta frames de várias pastas de imagens e/ou vídeos"""
+    frames = []
+    per_source = max(1, limit // max(1, len(sources)))
+
+    for source in sources:
+        frames.extend(load_frames(source, per_source))
+
+    return frames[:limit]
+
+
+def split_frames(frames, holdout_ratio=0.2, seed=0):
+    """Separa frames de calibração e frames de avaliação (held-out)"""
+    shuffled = list(frames)
+    random.Random(seed).shuffle(shuffled)
+
+    holdout = max(1, int(len(shuffled) * holdout_ratio))
+    return shuffled[holdout:], shuffled[:holdout]
+
+
+class FrameCalibrationReader:
+    """Fornece os frames de calibração ao ONNX Runtime, um lote por vez"""
+
+    def __init__(self, frames, input_name, input_size, batch_size):
+        self.batches = []
+        for start in range(0, len(frames) - batch_size + 1, batch_size):
+            chunk = frames[start:start + batch_size]
+            self.batches.append({input_name: to_input_tensor(chunk, input_size)})
+        self.index = 0
+
+    def get_next(self):
+        if self.index >= len(self.batches):
+            return None
+        batch = self.batches[self.index]
+        self.index += 1
+        return batch
+
+    def rewind(self):
+        self.index = 0
+
+
+def quantize_onnx(model_path, calibration_frames, input_size, batch_size):
+    """Gera o modelo INT8 (QDQ, por canal) a partir do ONNX FP32 em cache"""
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32_path = export_model(model_path, 'onnx', input_size, batch_size)
+    int8_path = export_cache_path(model_path, 'onnx', input_size, batch_size, tag='_int8')
+    prep_path = int8_path.with_name(int8_path.stem + '_prep.onnx')
+
+    if len(calibration_frames) < batch_size:
+        raise ValueError(f"Calibração precisa de pelo menos {batch_size} frames")
+
+    # Pré-processamento recomendado (formas estáticas: dispensa inferência simbólica)
+    quant_pre_process(str(fp32_path), str(prep_path), skip_symbolic_shape=True)
+
+    input_name = ort.InferenceSession(
+        str(prep_path), providers=['CPUExecutionProvider']
+    ).get_inputs()[0].name
+    reader = FrameCalibrationReader(calibration_frames, input_name, input_size, batch_size)
+
+    logger.info(f"🎯 Calibrando com {len(calibration_frames)} frames...")
+
+    # Apenas Conv/MatMul: a cabeça de decodificação (concat/sigmoid) fica em float
+    tmp_path = int8_path.with_name(int8_path.name + '.tmp')
+    quantize_static(
+        str(prep_path), str(tmp_path), reader,
+        quant_format=QuantFormat.QDQ,
+        op_types_to_quantize=['Conv', 'MatMul'],
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+
+    # Preserva os metadados do ultralytics (classes, stride, imgsz)
+    fp32_model = onnx.load(str(fp32_path))
+    int8_model = onnx.load(str(tmp_path))
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, str(tmp_path))
+
+    tmp_path.replace(int8_path)
+    prep_path.unlink(missing_ok=True)
+
+    logger.info(f"✅ Modelo INT8 salvo: {int8_path}")
+    return int8_path
+
+
+def evaluate(detector, holdout_frames, batch_size):
+    """Mede FP32 x INT8 nos frames separados (FP32 é a referência)"""
+    report = {}
+    detections = {}
+
+    for precision in ('fp32', 'int8'):
+        detector.backend = create_backend('onnx', detector.model_path, detector.input_size,
+                                          batch_size, precision=precision)
+        detector.detect_packages_batch(holdout_frames[:batch_size])  # aquecimento
+        detections[precision], report[precision] = run_detector(detector, holdout_frames)
+
+    parity = compare_detections(detections['fp32'], detections['int8'])
+    reference = max(1, parity['reference_detections'])
+    candidate = max(1, parity['candidate_detections'])
+    precision_rate = parity['matched'] / candidate
+    recall_rate = parity['matched'] / reference
+
+    report['speedup'] = report['fp32']['ms_per_frame'] / max(1e-9, report['int8']['ms_per_frame'])
+    report['accuracy_delta'] = {
+        'holdout_frames': len(holdout_frames),
+        'fp32_detections': parity['reference_detections'],
+        'int8_detections': parity['candidate_detections'],
+        'precision_vs_fp32': precision_rate,
+        'recall_vs_fp32': recall_rate,
+        'f1_vs_fp32': (2 * precision_rate * recall_rate / (precision_rate + recall_rate)
+                       if precision_rate + recall_rate > 0 else 0.0),
+        'min_iou': parity['min_iou'],
+        'max_conf_diff': parity['max_conf_diff']
+    }
+    return report
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Quantização INT8 do modelo de pacotes")
+    parser.add_argument('--model', required=True, help="Modelo .pt")
+    parser.add_argument('--sources', nargs='+', default=['photos'],
+                        help="Pastas de imagens e/ou vídeos para calibração")
+    parser.add_argument('--config', help="Arquivo config.json")
+    parser.add_argument('--frames', type=int, default=300, help="Total de frames amostrados")
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fração para avaliação")
+    parser.add_argument('--input-size', type=int, help="Sobrescreve o input_size do config")
+    parser.add_argument('--batch-size', type=int, help="Sobrescreve o batch_size do config")
+    args = parser.parse_args()
+
+    detector = PackageDetector(args.model, None, args.config)
+    input_size = args.input_size or detector.input_size
+    batch_size = args.batch_size or detector.batch_size
+    detector.input_size = input_size
+    detector.batch_size = batch_size
+
+    frames = collect_frames(args.sources, args.frames)
+    if len(frames) < 2:
+        print("❌ Frames insuficientes para calibração e avaliação")
+        return 1
+
+    calibration, holdout = split_frames(frames, args.holdout)
+    print(f"🎞️ {len(calibration)} frames de calibração, {len(holdout)} de avaliação")
+
+    int8_path = quantize_onnx(detector.model_path, calibration, input_size, batch_size)
+    report = evaluate(detector, holdout, batch_size)
+    report['int8_model'] = str(int8_path)
+
+    report_path = int8_path.with_name(int8_path.stem + '_report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    delta = report['accuracy_delta']
+    print(f"\n📊 Resultado da quantização:")
+    print(f"   - FP32: {report['fp32']['ms_per_frame']:.1f} ms/frame")
+    print(f"   - INT8: {report['int8']['ms_per_frame']:.1f} ms/frame")
+    print(f"   - Aceleração: {report['speedup']:.2f}x")
+    print(f"   - Detecções FP32/INT8: {delta['fp32_detections']}/{delta['int8_detections']}")
+    print(f"   - F1 vs FP32: {delta['f1_vs_fp32']:.3f} "
+          f"(precisão {delta['precision_vs_fp32']:.3f}, recall {delta['recall_vs_fp32']:.3f})")
+    print(f"   - Relatório: {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
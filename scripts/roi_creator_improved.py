@@ -1,11 +1,14 @@
-import cv2
-import numpy as np
-from PIL import Image
 import json
 import os
 from pathlib import Path
 from datetime import datetime
 
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+Image = LazyModule('PIL.Image')
+
 class ROICreator:
     """Criador de ROI otimizado para detecção de pacotes em esteira"""
     
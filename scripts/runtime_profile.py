@@ -0,0 +1,141 @@
+"""
+Perfil de execução em CPU: threads, afinidade de núcleos e formato de memória
+
+Com vários detectores na mesma máquina (nós multi-socket), o padrão de
+threads do torch e do OpenCV cria mais threads que núcleos. O perfil fixa:
+
+- threads intra-op e inter-op do torch (e OMP/MKL_NUM_THREADS, se o torch
+  ainda não foi importado);
+- threads do OpenCV (cv2.setNumThreads);
+- afinidade do processo a um conjunto de núcleos ("0-7,16-23");
+- pesos em channels_last e, no backend torch_lean, torch.compile.
+
+apply_runtime_profile() roda antes da carga do modelo; os valores efetivos
+(lidos de volta) vão para o relatório da execução.
+"""
+
+import logging
+import os
+import sys
+
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+torch = LazyModule('torch')
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cores(spec):
+    """'0-3,8' ou [0, 1, 2, 3, 8] -> conjunto de núcleos"""
+    if isinstance(spec, (list, tuple, set)):
+        return {int(core) for core in spec}
+    cores = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cores.update(range(int(first), int(last) + 1))
+        else:
+            cores.add(int(part))
+    return cores
+
+
+def set_affinity(cores):
+    """Fixa o processo nos núcleos; retorna os núcleos efetivos ou None"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+        return sorted(os.sched_getaffinity(0))
+    try:
+        import psutil
+    except ImportError:
+        logger.warning("⚠️ Afinidade de núcleos requer Linux ou o pacote psutil: ignorada")
+        return None
+    process = psutil.Process()
+    process.cpu_affinity(sorted(cores))
+    return process.cpu_affinity()
+
+
+def current_affinity():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return None
+
+
+def apply_runtime_profile(settings):
+    """Aplica threads e afinidade; retorna as configurações efetivas"""
+    effective = {'name': settings.get('name', 'custom')}
+
+    cores = None
+    if settings.get('cpu_affinity'):
+        cores = set_affinity(parse_cores(settings['cpu_affinity']))
+    effective['cpu_affinity'] = cores or current_affinity()
+
+    torch_threads = settings.get('torch_threads')
+    if torch_threads is None and cores:
+        # Sem valor explícito: uma thread por núcleo reservado
+        torch_threads = len(cores)
+
+    # Só vale se o torch ainda não foi importado (lido na inicialização do OpenMP)
+    torch_loaded = 'torch' in sys.modules
+    if torch_threads and not torch_loaded:
+        os.environ['OMP_NUM_THREADS'] = str(torch_threads)
+        os.environ['MKL_NUM_THREADS'] = str(torch_threads)
+
+    # Backends onnx/openvino: sem ajuste explícito de torch, não importa o torch só para lê-lo
+    interop = settings.get('torch_interop_threads')
+    use_torch = torch_loaded or settings.get('torch_threads') is not None or bool(interop)
+    effective['torch_threads'] = effective['torch_interop_threads'] = None
+    if use_torch:
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+        if interop:
+            try:
+                torch.set_num_interop_threads(interop)
+            except RuntimeError as e:
+                # Só pode ser definido antes do primeiro trabalho paralelo do processo
+                logger.warning(f"⚠️ Threads inter-op não alteradas: {e}")
+        effective['torch_threads'] = torch.get_num_threads()
+        effective['torch_interop_threads'] = torch.get_num_interop_threads()
+    effective['omp_env_applied'] = bool(torch_threads) and not torch_loaded
+
+    if settings.get('opencv_threads') is not None:
+        cv2.setNumThreads(settings['opencv_threads'])
+    effective['opencv_threads'] = cv2.getNumThreads()
+
+    torch_info = (f"torch {effective['torch_threads']}/{effective['torch_interop_threads']} threads"
+                  if use_torch else "torch não carregado")
+    logger.info(f"🧵 Perfil de execução '{effective['name']}': {torch_info}, "
+                f"OpenCV {effective['opencv_threads']}, "
+                f"núcleos {effective['cpu_affinity'] if cores else 'todos'}")
+    return effective
+
+
+def apply_model_profile(backend, settings):
+    """channels_last e torch.compile no modelo carregado; retorna o que foi aplicado"""
+    applied = {'channels_last': False, 'compile': False}
+    # torch_lean expõe a rede em .net; o backend torch, dentro do YOLO do ultralytics
+    net = getattr(backend, 'net', None)
+    if net is None and getattr(backend, 'name', None) == 'torch':
+        net = getattr(backend.model, 'model', None)
+    if net is None:
+        if settings.get('channels_last') or settings.get('compile'):
+            logger.warning(f"⚠️ channels_last/compile não se aplicam ao backend {backend.name}")
+        return applied
+
+    if settings.get('channels_last'):
+        net.to(memory_format=torch.channels_last)
+        if hasattr(backend, 'channels_last'):
+            backend.channels_last = True
+        applied['channels_last'] = True
+
+    if settings.get('compile'):
+        if hasattr(backend, 'net'):
+            backend.net = torch.compile(net)
+            applied['compile'] = True
+        else:
+            logger.warning("⚠️ torch.compile só é suportado no backend torch_lean")
+
+    return applied
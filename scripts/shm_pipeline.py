@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Pipeline multiprocesso com memória compartilhada
+
+Decodificação, inferência/rastreamento e anotação/codificação rodam em
+processos separados, cada um com seu próprio GIL. Os frames ficam em um anel
+de slots pré-alocados em `multiprocessing.shared_memory`; pelas filas passam
+apenas índices de slot e metadados pequenos, nunca cópias serializadas dos
+frames.
+
+    decodificador --(slot, frame)--> inferência --(slot, detecções)--> codificador
+         ^                                                                  |
+         +------------------------- slots livres ---------------------------+
+
+Contrapressão: o decodificador só avança quando há slot livre. Um erro em
+qualquer processo sinaliza parada para todos e é relançado no processo
+principal com o traceback original.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import queue
+import sys
+import time
+import traceback
+from multiprocessing import shared_memory
+from pathlib import Path
+
+from frame_sources import FrameStoreSource, open_source
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+POLL_S = 0.1
+JOIN_TIMEOUT_S = 10
+
+
+class PipelineStopped(Exception):
+    """Parada sinalizada por outro processo"""
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=POLL_S)
+            return
+        except queue.Full:
+            continue
+    raise PipelineStopped()
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=POLL_S)
+        except queue.Empty:
+            continue
+    raise PipelineStopped()
+
+
+def _run_stage(name, target, stop, status_q, *args):
+    """Executa um estágio reportando conclusão ou erro ao processo principal"""
+    try:
+        result = target(stop, *args)
+        status_q.put(('done', name, result))
+    except PipelineStopped:
+        status_q.put(('stopped', name, None))
+    except BaseException:
+        stop.set()
+        status_q.put(('error', name, traceback.format_exc()))
+
+
+def _attach(shm_name, slots, shape):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots, *shape), dtype=np.uint8, buffer=shm.buf)
+    return shm, ring
+
+
+def _decoder(stop, video_path, shm_name, slots, shape, max_frames, free_q, infer_q):
+    cv2.setNumThreads(1)
+    shm, ring = _attach(shm_name, slots, shape)
+    source = open_source(video_path)
+    busy = 0.0
+    count = 0
+    try:
+        while max_frames is None or count < max_frames:
+            # Contrapressão: espera um slot livre antes de decodificar
+            slot = _get(free_q, stop)
+            start = time.perf_counter()
+            ret, frame = source.read()
+            if not ret:
+                _put(free_q, slot, stop)
+                break
+            ring[slot] = frame
+            busy += time.perf_counter() - start
+            _put(infer_q, (slot, count, time.time()), stop)
+            count += 1
+        _put(infer_q, None, stop)
+    finally:
+        source.release()
+        del ring
+        shm.close()
+    return {'frames': count, 'busy_s': busy}
+
+
+def _inference(stop, detector_args, geometry_scale, shm_name, slots, shape, infer_q, encode_q, free_q,
+               has_encoder):
+    from package_detector_tracker import PackageDetector
+
+    shm, ring = _attach(shm_name, slots, shape)
+    detector = PackageDetector(*detector_args)
+    # Antes da linha de contagem: ela também é criada na escala dos frames
+    detector.set_geometry_scale(geometry_scale)
+    detector.line_counter = detector.create_line_counter()
+    last_detections = []
+    busy = 0.0
+    count = 0
+    finished = False
+    try:
+        while not finished:
+            batch = [_get(infer_q, stop)]
+            while batch[-1] is not None and len(batch) < detector.batch_size:
+                try:
+                    batch.append(infer_q.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            # Visões do anel, sem cópia; o slot só é liberado depois do uso
+            infer = [i for i, (_, index, _) in enumerate(batch)
+                     if index % detector.detection_stride == 0]
+            outputs = dict(zip(infer, detector.detect_packages_batch(
+                [ring[batch[i][0]] for i in infer]))) if infer else {}
+
+            for i, (slot, index, captured_at) in enumerate(batch):
+                if i in outputs:
+                    detections = outputs[i]
+                    if detector.tracking_enabled:
+                        detections = detector.update_tracking(detections)
+                    last_detections = detections
+                else:
+                    detections = last_detections
+                detector.update_stats(detections)
+                count += 1
+
+                if has_encoder:
+                    _put(encode_q, (slot, index, captured_at, detections), stop)
+                else:
+                    _put(free_q, slot, stop)
+            busy += time.perf_counter() - start
+
+        if has_encoder:
+            _put(encode_q, None, stop)
+    finally:
+        del ring
+        shm.close()
+
+    return {
+        'frames': count,
+        'busy_s': busy,
+        'total_packages': detector.stats['total_packages'],
+        'line_counts': detector.line_counter.counts() if detector.line_counter else None
+    }
+
+
+def _encoder(stop, output_path, fps, roi_points, shm_name, slots, shape, encode_q, free_q):
+    from package_detector_tracker import draw_boxes
+
+    cv2.setNumThreads(1)
+    shm, ring = _attach(shm_name, slots, shape)
+    height, width = shape[:2]
+    out = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    polygon = np.array(roi_points, dtype=np.int32) if roi_points else None
+    busy = 0.0
+    count = 0
+    try:
+        while True:
+            item = _get(encode_q, stop)
+            if item is None:
+                break
+            slot, _, _, detections = item
+            start = time.perf_counter()
+            frame = ring[slot].copy()
+            # O slot volta ao decodificador assim que o frame foi copiado
+            _put(free_q, slot, stop)
+            if polygon is not None:
+                cv2.polylines(frame, [polygon], True, (255, 255, 0), 2)
+            out.write(draw_boxes(frame, detections))
+            busy += time.perf_counter() - start
+            count += 1
+    finally:
+        out.release()
+        del ring
+        shm.close()
+    return {'frames': count, 'busy_s': busy}
+
+
+def run_pipeline(model_path, video_path, roi_path=None, config_path=None, output_path=None,
+                 slots=8, max_frames=None):
+    """Processa um vídeo no pipeline multiprocesso; retorna o resumo"""
+    source = open_source(video_path)
+    shape = (source.height, source.width, 3)
+    fps = source.fps
+    # Frame store reduzido: ROI e linha de contagem na escala dos frames, como em process_video
+    geometry_scale = source.meta.get('scale', 1.0) if isinstance(source, FrameStoreSource) else 1.0
+    source.release()
+
+    roi_points = None
+    if roi_path:
+        with open(roi_path, 'r', encoding='utf-8') as f:
+            roi = json.load(f)['roi']
+        if roi['type'] != 'counting_line':
+            roi_points = [[int(round(x * geometry_scale)), int(round(y * geometry_scale))]
+                          for x, y in roi['points']]
+
+    ctx = mp.get_context('spawn')
+    stop = ctx.Event()
+    status_q = ctx.Queue()
+    free_q, infer_q, encode_q = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    for slot in range(slots):
+        free_q.put(slot)
+
+    frame_bytes = int(np.prod(shape))
+    shm = shared_memory.SharedMemory(create=True, size=slots * frame_bytes)
+    logger.info(f"🧵 Pipeline multiprocesso: {slots} slots de {shape[1]}x{shape[0]} "
+                f"({slots * frame_bytes / (1024 * 1024):.0f} MB compartilhados)")
+
+    detector_args = (str(model_path), str(roi_path) if roi_path else None,
+                     str(config_path) if config_path else None)
+    stages = {
+        'decoder': (_decoder, (str(video_path), shm.name, slots, shape, max_frames, free_q, infer_q)),
+        'inference': (_inference, (detector_args, geometry_scale, shm.name, slots, shape, infer_q,
+                                   encode_q, free_q, output_path is not None))
+    }
+    if output_path:
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        stages['encoder'] = (_encoder, (str(output_path), fps, roi_points, shm.name, slots, shape,
+                                        encode_q, free_q))
+
+    processes = {
+        name: ctx.Process(target=_run_stage, args=(name, target, stop, status_q, *args),
+                          name=f"pipeline-{name}", daemon=True)
+        for name, (target, args) in stages.items()
+    }
+
+    start_time = time.time()
+    results = {}
+    error = None
+    try:
+        for process in processes.values():
+            process.start()
+
+        while len(results) < len(processes) and error is None:
+            try:
+                status, name, payload = status_q.get(timeout=POLL_S * 5)
+            except queue.Empty:
+                # Processo que morreu sem reportar (ex.: falha nativa)
+                for name, process in processes.items():
+                    if name not in results and not process.is_alive() and process.exitcode:
+                        error = f"Processo {name} terminou com código {process.exitcode}"
+                        stop.set()
+                continue
+
+            if status == 'error':
+                error = f"Erro no processo {name}:\n{payload}"
+            elif status == 'done':
+                results[name] = payload
+            else:
+                results[name] = None
+    except KeyboardInterrupt:
+        logger.info("⚠️ Pipeline interrompido")
+        stop.set()
+    finally:
+        stop.set()
+        for process in processes.values():
+            process.join(JOIN_TIMEOUT_S)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for q in (status_q, free_q, infer_q, encode_q):
+            q.cancel_join_thread()
+        shm.close()
+        shm.unlink()
+
+    if error:
+        raise RuntimeError(error)
+
+    elapsed = time.time() - start_time
+    inference = results.get('inference') or {}
+    summary = {
+        'frames_processed': inference.get('frames', 0),
+        'total_packages': inference.get('total_packages', 0),
+        'processing_time': elapsed,
+        'average_fps': inference.get('frames', 0) / elapsed if elapsed > 0 else 0,
+        'stage_busy_s': {name: round(r['busy_s'], 3) for name, r in results.items() if r},
+        'slots': slots
+    }
+    if inference.get('line_counts'):
+        summary['line_counts'] = inference['line_counts']
+
+    logger.info(f"✅ Pipeline concluído: {summary['frames_processed']} frames em {elapsed:.2f}s "
+                f"({summary['average_fps']:.1f} FPS)")
+    for name, busy in summary['stage_busy_s'].items():
+        logger.info(f"   - {name}: {busy:.2f}s ocupado ({busy / elapsed * 100:.0f}%)")
+    return summary
+
+
+def main():
+    """Função principal"""
+    parser = argparse.ArgumentParser(description="Pipeline multiprocesso com memória compartilhada")
+    parser.add_argument('video', help="Vídeo ou frame store (.frames)")
+    parser.add_argument('--model', required=True, help="Modelo .pt")
+    parser.add_argument('--roi', help="Arquivo JSON de ROI")
+    parser.add_argument('--config', help="Arquivo config.json")
+    parser.add_argument('--output', help="Vídeo anotado de saída")
+    parser.add_argument('--slots', type=int, help="Slots no anel de frames")
+    parser.add_argument('--max-frames', type=int, help="Limite de frames")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config_path = Path(args.config) if args.config else Path(__file__).resolve().parent.parent / "config.json"
+    slots = args.slots
+    if slots is None and config_path.exists():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            slots = json.load(f).get('shm_pipeline', {}).get('slots')
+
+    summary = run_pipeline(args.model, args.video, args.roi, config_path, args.output,
+                           slots or 8, args.max_frames)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,18 @@
-import cv2
+import logging
 import os
+import queue
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 
-def capturar_foto_unica(caminho_video, pasta_destino, segundo_desejado=0):
+from lazy_imports import LazyModule, is_available
+from video_index import (FrameSeeker, build_index, cached_index, frame_at_second, index_path,
+                         keyframe_before)
+
+cv2 = LazyModule('cv2')
+
+def capturar_foto_unica(caminho_video, pasta_destino, segundo_desejado=0, usar_indice=None):
     """
     Captura uma única foto de um vídeo no segundo especificado.
     
@@ -11,6 +20,9 @@ def capturar_foto_unica(caminho_video, pasta_destino, segundo_desejado=0):
         caminho_video (str): Caminho completo para o arquivo de vídeo
         pasta_destino (str): Caminho da pasta onde salvar a foto
         segundo_desejado (int): Segundo do vídeo para capturar (padrão: 0)
+        usar_indice (bool ou None): True constrói o índice de frames (se preciso) para um
+            posicionamento exato; None (padrão) usa só um índice já salvo, sem
+            pagar uma passada pelo vídeo inteiro por uma foto; False nunca usa
     
     Returns:
         str: Caminho da foto capturada ou None se houver erro
@@ -47,11 +59,20 @@ def capturar_foto_unica(caminho_video, pasta_destino, segundo_desejado=0):
         segundo_desejado = int(duracao / 2)  # Usar o meio do vídeo
         print(f"   Usando segundo {segundo_desejado} (meio do vídeo)")
     
-    # Calcular o frame desejado
-    frame_desejado = int(segundo_desejado * fps)
-    
-    # Posicionar no frame desejado
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_desejado)
+    # Calcular o frame desejado e posicionar nele
+    indice = None
+    if usar_indice:
+        indice = build_index(caminho_video)
+    elif usar_indice is None:
+        indice = cached_index(caminho_video)
+    
+    if indice:
+        frame_desejado = frame_at_second(indice, segundo_desejado)
+        if not FrameSeeker(cap, indice).seek(frame_desejado):
+            print(f"⚠️  Aviso: Posicionamento pode estar impreciso no frame {frame_desejado}")
+    else:
+        frame_desejado = int(segundo_desejado * fps)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_desejado)
     
     # Capturar o frame
     ret, frame = cap.read()
@@ -82,6 +103,237 @@ def capturar_foto_unica(caminho_video, pasta_destino, segundo_desejado=0):
         print(f"❌ Erro ao salvar a foto em '{caminho_foto}'")
         return None
 
+def _escritor_de_fotos(fila, salvas, falhas):
+    """Thread que grava as fotos da fila em disco (um erro não derruba a thread)"""
+    while True:
+        item = fila.get()
+        if item is None:
+            break
+        caminho_foto, frame = item
+        try:
+            ok = cv2.imwrite(caminho_foto, frame)
+        except Exception as e:
+            print(f"❌ Erro ao gravar '{caminho_foto}': {e}")
+            ok = False
+        if ok:
+            salvas.append(caminho_foto)
+        else:
+            falhas.append(caminho_foto)
+
+def _enfileirar(fila, escritor, item, espera=1.0):
+    """put() que não trava para sempre se a thread de gravação morreu"""
+    while True:
+        try:
+            fila.put(item, timeout=espera)
+            return True
+        except queue.Full:
+            if not escritor.is_alive():
+                return False
+
+def capturar_fotos_em_lote(caminho_video, pasta_destino, segundos=None, intervalo=None):
+    """
+    Extrai várias fotos em uma única passada sequencial pelo vídeo.
+    
+    Args:
+        caminho_video (str): Caminho do vídeo
+        pasta_destino (str): Pasta onde salvar as fotos
+        segundos (list): Lista de segundos a capturar
+        intervalo (float): Alternativa: captura a cada `intervalo` segundos
+    
+    Returns:
+        list: Caminhos das fotos salvas
+    """
+    
+    if not os.path.exists(caminho_video):
+        print(f"❌ Erro: O arquivo de vídeo '{caminho_video}' não foi encontrado.")
+        return []
+    
+    if not segundos and not intervalo:
+        print("❌ Informe a lista de segundos ou o intervalo")
+        return []
+    
+    indice = build_index(caminho_video)
+    total_frames = indice['total_frames']
+    if total_frames == 0:
+        print("❌ Vídeo sem frames")
+        return []
+    
+    duracao = (indice['pts_ms'][-1] - indice['pts_ms'][0]) / 1000
+    if intervalo:
+        quantidade = int(duracao // intervalo) + 1
+        segundos = [i * intervalo for i in range(quantidade)]
+    
+    alvos = sorted({frame_at_second(indice, s) for s in segundos if 0 <= s <= duracao})
+    if not alvos:
+        print("❌ Nenhum segundo dentro da duração do vídeo")
+        return []
+    
+    Path(pasta_destino).mkdir(parents=True, exist_ok=True)
+    nome_video = Path(caminho_video).stem
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    # Gravação em segundo plano para não travar a decodificação
+    fila = queue.Queue(maxsize=32)
+    salvas, falhas = [], []
+    escritor = threading.Thread(target=_escritor_de_fotos, args=(fila, salvas, falhas), daemon=True)
+    escritor.start()
+    
+    cap = cv2.VideoCapture(caminho_video)
+    keyframes = indice.get('keyframes') or []
+    frame_atual = 0
+    
+    print(f"🎞️  Extraindo {len(alvos)} fotos em uma passada...")
+    
+    try:
+        for alvo in alvos:
+            # Lacuna grande: salta para o keyframe anterior ao alvo (sem reabrir o vídeo)
+            if keyframes:
+                keyframe = keyframe_before(keyframes, alvo)
+                if keyframe > frame_atual:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                    frame_atual = keyframe
+            
+            # grab() descarta os frames intermediários sem convertê-los
+            while frame_atual < alvo and cap.grab():
+                frame_atual += 1
+            
+            ret, frame = cap.read()
+            if not ret:
+                print(f"⚠️  Fim do vídeo antes do frame {alvo}")
+                break
+            frame_atual += 1
+            
+            nome_foto = f"{nome_video}_frame_{alvo:06d}_{timestamp}.jpg"
+            if not _enfileirar(fila, escritor, (os.path.join(pasta_destino, nome_foto), frame)):
+                print("❌ Thread de gravação encerrada, interrompendo a extração")
+                break
+    finally:
+        cap.release()
+        _enfileirar(fila, escritor, None)
+        escritor.join()
+    
+    print(f"✅ {len(salvas)} fotos salvas em: {pasta_destino}")
+    if falhas:
+        print(f"❌ {len(falhas)} fotos não puderam ser salvas")
+    
+    return sorted(salvas)
+
+class CacheDeFrames:
+    """
+    Cache LRU de frames decodificados com leitura antecipada em segundo plano.
+    
+    A thread de leitura antecipada usa sua própria VideoCapture e decodifica os
+    próximos frames na direção em que o usuário está navegando.
+    """
+    
+    def __init__(self, caminho_video, indice=None, limite_mb=256, leitura_antecipada=8):
+        self.caminho_video = caminho_video
+        self.indice = indice
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self.leitura_antecipada = leitura_antecipada
+        
+        self.frames = OrderedDict()
+        self.bytes_em_cache = 0
+        self.lock = threading.Lock()
+        self.cap = cv2.VideoCapture(caminho_video)
+        self.estado_leitura = {'proximo': 0}
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        
+        self.posicao = 0
+        self.passo = 0
+        self.geracao = 0
+        self.pedido = threading.Condition()
+        self.ativo = True
+        self.acertos = 0
+        self.faltas = 0
+        self.thread = threading.Thread(target=self._ler_adiante, daemon=True)
+        self.thread.start()
+    
+    def _decodificar(self, cap, estado, indice_frame):
+        """Decodifica um frame, avançando com grab() quando o salto é curto"""
+        salto = indice_frame - estado['proximo']
+        if 0 <= salto <= 30:
+            for _ in range(salto):
+                cap.grab()
+        elif self.indice:
+            # Um posicionador por captura: guarda o PTS inicial dela
+            if 'posicionador' not in estado:
+                estado['posicionador'] = FrameSeeker(cap, self.indice)
+            estado['posicionador'].seek(indice_frame)
+        else:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, indice_frame)
+        
+        ret, frame = cap.read()
+        estado['proximo'] = indice_frame + 1 if ret else -1
+        return frame if ret else None
+    
+    def _guardar(self, indice_frame, frame):
+        with self.lock:
+            if indice_frame in self.frames:
+                return
+            self.frames[indice_frame] = frame
+            self.bytes_em_cache += frame.nbytes
+            while self.bytes_em_cache > self.limite_bytes and len(self.frames) > 1:
+                _, antigo = self.frames.popitem(last=False)
+                self.bytes_em_cache -= antigo.nbytes
+    
+    def obter(self, indice_frame):
+        """Frame pelo índice: do cache ou decodificado na hora"""
+        with self.lock:
+            frame = self.frames.get(indice_frame)
+            if frame is not None:
+                self.frames.move_to_end(indice_frame)
+                self.acertos += 1
+                return frame
+        
+        self.faltas += 1
+        frame = self._decodificar(self.cap, self.estado_leitura, indice_frame)
+        if frame is not None:
+            self._guardar(indice_frame, frame)
+        return frame
+    
+    def navegar(self, posicao, passo):
+        """Informa a nova posição e o passo (com sinal) para a leitura antecipada"""
+        with self.pedido:
+            self.posicao = posicao
+            self.passo = passo
+            self.geracao += 1
+            self.pedido.notify()
+    
+    def _ler_adiante(self):
+        cap = cv2.VideoCapture(self.caminho_video)
+        estado = {'proximo': 0}
+        
+        while True:
+            with self.pedido:
+                while self.ativo and self.passo == 0:
+                    self.pedido.wait()
+                if not self.ativo:
+                    break
+                posicao, passo, geracao = self.posicao, self.passo, self.geracao
+                self.passo = 0
+            
+            for k in range(1, self.leitura_antecipada + 1):
+                alvo = posicao + k * passo
+                if alvo < 0 or alvo >= self.total_frames or geracao != self.geracao:
+                    break
+                with self.lock:
+                    presente = alvo in self.frames
+                if not presente:
+                    frame = self._decodificar(cap, estado, alvo)
+                    if frame is None:
+                        break
+                    self._guardar(alvo, frame)
+        
+        cap.release()
+    
+    def fechar(self):
+        with self.pedido:
+            self.ativo = False
+            self.pedido.notify()
+        self.thread.join(timeout=2)
+        self.cap.release()
+
 def capturar_foto_interativa(caminho_video, pasta_destino):
     """
     Modo interativo para escolher o frame a ser capturado.
@@ -107,6 +359,13 @@ def capturar_foto_interativa(caminho_video, pasta_destino):
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     duracao = total_frames / fps
+    cap.release()
+    
+    # Índice exato só quando for barato (PyAV) ou já existir em disco
+    indice = None
+    if is_available('av') or index_path(caminho_video).exists():
+        indice = build_index(caminho_video)
+    cache = CacheDeFrames(caminho_video, indice)
     
     print(f"📹 Vídeo carregado - Duração: {duracao:.2f}s")
     print(f"🎮 Controles:")
@@ -115,70 +374,81 @@ def capturar_foto_interativa(caminho_video, pasta_destino):
     print(f"   - ESC: Sair sem capturar")
     
     frame_atual = 0
+    frame_exibido = None
+    frame = None
     janela_nome = "Selecionador de Frame - Pressione ESPAÇO para capturar"
     
     cv2.namedWindow(janela_nome, cv2.WINDOW_AUTOSIZE)
     
-    while True:
-        # Posicionar no frame atual
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_atual)
-        ret, frame = cap.read()
-        
-        if not ret:
-            break
-        
-        # Adicionar informações no frame
-        segundo_atual = frame_atual / fps
-        info_text = f"Frame: {frame_atual}/{total_frames} | Segundo: {segundo_atual:.2f}s"
-        
-        frame_info = frame.copy()
-        cv2.putText(frame_info, info_text, (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
-        cv2.putText(frame_info, info_text, (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 1)
-        
-        cv2.imshow(janela_nome, frame_info)
-        
-        key = cv2.waitKey(1) & 0xFF
-        
-        if key == 27:  # ESC
-            print("❌ Captura cancelada")
-            break
-        elif key == 32:  # Espaço
-            # Capturar foto atual
-            nome_video = Path(caminho_video).stem
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            nome_foto = f"{nome_video}_frame_{frame_atual:06d}_{timestamp}.jpg"
-            caminho_foto = os.path.join(pasta_destino, nome_foto)
+    try:
+        while True:
+            # Só decodifica e redesenha quando a posição muda
+            if frame_atual != frame_exibido:
+                frame = cache.obter(frame_atual)
+                
+                if frame is None:
+                    break
+                
+                # Adicionar informações no frame
+                segundo_atual = frame_atual / fps
+                info_text = f"Frame: {frame_atual}/{total_frames} | Segundo: {segundo_atual:.2f}s"
+                
+                frame_info = frame.copy()
+                cv2.putText(frame_info, info_text, (10, 30), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+                cv2.putText(frame_info, info_text, (10, 30), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 1)
+                
+                cv2.imshow(janela_nome, frame_info)
+                frame_exibido = frame_atual
             
-            Path(pasta_destino).mkdir(parents=True, exist_ok=True)
+            key = cv2.waitKey(30) & 0xFF
+            passo = 0
             
-            if cv2.imwrite(caminho_foto, frame):
-                print(f"✅ Foto capturada!")
-                print(f"   - Frame: {frame_atual}")
-                print(f"   - Segundo: {segundo_atual:.2f}s")
-                print(f"   - Salva em: {caminho_foto}")
-                cap.release()
-                cv2.destroyAllWindows()
-                return caminho_foto
-            else:
-                print(f"❌ Erro ao salvar foto")
-        elif key == 81:  # Seta esquerda
-            frame_atual = max(0, frame_atual - int(fps))  # Voltar 1 segundo
-        elif key == 83:  # Seta direita
-            frame_atual = min(total_frames - 1, frame_atual + int(fps))  # Avançar 1 segundo
-        elif key == 82:  # Seta para cima
-            frame_atual = min(total_frames - 1, frame_atual + int(fps * 10))  # Avançar 10 segundos
-        elif key == 84:  # Seta para baixo
-            frame_atual = max(0, frame_atual - int(fps * 10))  # Voltar 10 segundos
+            if key == 27:  # ESC
+                print("❌ Captura cancelada")
+                break
+            elif key == 32:  # Espaço
+                # Capturar foto atual
+                nome_video = Path(caminho_video).stem
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                nome_foto = f"{nome_video}_frame_{frame_atual:06d}_{timestamp}.jpg"
+                caminho_foto = os.path.join(pasta_destino, nome_foto)
+                
+                Path(pasta_destino).mkdir(parents=True, exist_ok=True)
+                
+                if cv2.imwrite(caminho_foto, frame):
+                    print(f"✅ Foto capturada!")
+                    print(f"   - Frame: {frame_atual}")
+                    print(f"   - Segundo: {segundo_atual:.2f}s")
+                    print(f"   - Salva em: {caminho_foto}")
+                    return caminho_foto
+                else:
+                    print(f"❌ Erro ao salvar foto")
+            elif key == 81:  # Seta esquerda
+                passo = -int(fps)  # Voltar 1 segundo
+            elif key == 83:  # Seta direita
+                passo = int(fps)  # Avançar 1 segundo
+            elif key == 82:  # Seta para cima
+                passo = int(fps * 10)  # Avançar 10 segundos
+            elif key == 84:  # Seta para baixo
+                passo = -int(fps * 10)  # Voltar 10 segundos
+            
+            if passo:
+                frame_atual = min(total_frames - 1, max(0, frame_atual + passo))
+                cache.navegar(frame_atual, passo)
+    finally:
+        cache.fechar()
+        cv2.destroyAllWindows()
     
-    cap.release()
-    cv2.destroyAllWindows()
     return None
 
 def main():
     """Função principal com menu de opções"""
     
+    # Mensagens do índice de frames (video_index.py)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     print("=" * 60)
     print("🎬 CAPTURADOR DE FOTO ÚNICA DE VÍDEO")
     print("=" * 60)
@@ -232,15 +502,25 @@ def main():
     print("\n🎯 Escolha o modo:")
     print("1. Capturar frame específico por segundo")
     print("2. Modo interativo (navegar e escolher)")
+    print("3. Várias fotos (lista de segundos ou intervalo)")
     
     try:
-        modo = int(input("Modo (1 ou 2): "))
+        modo = int(input("Modo (1, 2 ou 3): "))
         
         if modo == 1:
             segundo = int(input("⏱️  Segundo para capturar (0 para início): "))
             foto_path = capturar_foto_unica(caminho_video, pasta_destino, segundo)
         elif modo == 2:
             foto_path = capturar_foto_interativa(caminho_video, pasta_destino)
+        elif modo == 3:
+            entrada = input("⏱️  Segundos separados por vírgula, ou 'a cada N' (ex.: a cada 5): ").strip()
+            if entrada.lower().startswith('a cada'):
+                fotos = capturar_fotos_em_lote(caminho_video, pasta_destino,
+                                               intervalo=float(entrada.split()[-1]))
+            else:
+                segundos = [float(s) for s in entrada.split(',') if s.strip()]
+                fotos = capturar_fotos_em_lote(caminho_video, pasta_destino, segundos=segundos)
+            foto_path = fotos[0] if fotos else None
         else:
             print("❌ Modo inválido")
             return
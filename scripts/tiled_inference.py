@@ -0,0 +1,224 @@
+"""
+Inferência em mosaico restrita à ROI, para pacotes pequenos em câmeras de alta resolução
+
+Em vez de reduzir o frame inteiro para `input_size` (pacotes distantes somem
+em 4K), o frame é recortado em blocos sobrepostos na resolução nativa, apenas
+onde os blocos tocam o polígono da ROI. Os pixels fora da ROI são pintados de
+cinza, então nunca chegam ao modelo. Os blocos de todos os frames do lote vão
+numa única chamada ao backend; as caixas voltam para coordenadas do frame e
+as duplicatas nas emendas são fundidas por NMS.
+
+TiledBackend tem a mesma interface dos backends de inference_backends.py, de
+modo que cache de detecções, cascata e processamento de imagens funcionam sem
+mudança.
+"""
+
+import hashlib
+import json
+import logging
+import time
+
+from lazy_imports import LazyModule
+
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+
+logger = logging.getLogger(__name__)
+
+PAD_VALUE = 114
+
+
+def tile_starts(start, end, tile, step):
+    """Inícios dos blocos cobrindo [start, end); o último encosta no fim"""
+    if end - start <= tile:
+        return [start]
+    starts = list(range(start, end - tile, step))
+    starts.append(end - tile)
+    return starts
+
+
+def merge_nms(boxes, threshold, metric='ios'):
+    """NMS por classe sobre caixas (N, 6) de blocos diferentes
+
+    metric 'ios' (interseção sobre a menor caixa) também funde a metade de um
+    pacote cortado pela emenda com a caixa inteira do bloco vizinho, o que o
+    IoU comum deixaria passar.
+    """
+    if len(boxes) < 2:
+        return boxes
+
+    order = np.argsort(-boxes[:, 4])
+    boxes = boxes[order]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    suppressed = np.zeros(len(boxes), dtype=bool)
+
+    for i in range(len(boxes)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        rest = np.arange(i + 1, len(boxes))
+        rest = rest[~suppressed[rest] & (boxes[rest, 5] == boxes[i, 5])]
+        if not len(rest):
+            continue
+        w = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        h = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        inter = w * h
+        if metric == 'ios':
+            overlap = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-6)
+        else:
+            overlap = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        suppressed[rest[overlap >= threshold]] = True
+
+    return boxes[keep]
+
+
+class TiledBackend:
+    """Backend que roda o backend interno em blocos da ROI"""
+
+    def __init__(self, backend, roi_points=None, tile_size=640, overlap=0.2,
+                 mask_outside_roi=True, merge_metric='ios', merge_threshold=0.5):
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap deve estar em [0, 1)")
+        if merge_metric not in ('iou', 'ios'):
+            raise ValueError(f"Métrica de fusão desconhecida: {merge_metric}")
+
+        self.backend = backend
+        self.roi_points = roi_points
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.mask_outside_roi = mask_outside_roi and roi_points is not None
+        self.merge_metric = merge_metric
+        self.merge_threshold = merge_threshold
+        self.name = f"{backend.name}_tiled{tile_size}"
+        self.model = backend.model
+
+        # Plano de blocos por tamanho de frame: lotes podem misturar tamanhos (imagens, serviço)
+        self.plans = {}
+
+        self.frames = 0
+        self.tile_count = 0
+        self.predict_s = 0.0
+
+    @classmethod
+    def from_config(cls, settings, backend, roi_points=None):
+        """Envolve o backend a partir da seção 'tiled_inference' do config"""
+        return cls(
+            backend, roi_points,
+            tile_size=settings.get('tile_size', 640),
+            overlap=settings.get('overlap', 0.2),
+            mask_outside_roi=settings.get('mask_outside_roi', True),
+            merge_metric=settings.get('merge_metric', 'ios'),
+            merge_threshold=settings.get('merge_threshold', 0.5)
+        )
+
+    @property
+    def names(self):
+        return self.backend.names
+
+    def prepare(self, sizes):
+        if hasattr(self.backend, 'prepare'):
+            self.backend.prepare(sizes)
+
+    def cache_tag(self):
+        """Identifica as saídas no cache de detecções: dependem da ROI e do plano, não só do backend"""
+        roi = json.dumps([[int(x), int(y)] for x, y in self.roi_points]) if self.roi_points is not None else 'full'
+        roi_hash = hashlib.sha1(roi.encode()).hexdigest()[:8]
+        return (f"{self.name}_o{self.overlap:g}_{'m' if self.mask_outside_roi else 'u'}"
+                f"_{self.merge_metric}{self.merge_threshold:g}_roi{roi_hash}")
+
+    def plan(self, shape):
+        """Blocos (x, y, w, h) e máscaras que tocam a ROI para frames deste tamanho"""
+        key = tuple(shape[:2])
+        if key in self.plans:
+            return self.plans[key]
+        height, width = key
+        tile_w, tile_h = min(self.tile_size, width), min(self.tile_size, height)
+        step_x = max(1, int(tile_w * (1 - self.overlap)))
+        step_y = max(1, int(tile_h * (1 - self.overlap)))
+
+        roi_mask = None
+        x0, y0, x1, y1 = 0, 0, width, height
+        if self.roi_points is not None:
+            points = np.array(self.roi_points, dtype=np.int32)
+            roi_mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(roi_mask, [points], 1)
+            bx, by, bw, bh = cv2.boundingRect(points)
+            x0, y0 = max(0, bx), max(0, by)
+            x1, y1 = min(width, bx + bw), min(height, by + bh)
+
+        # Grade na área da ROI (blocos encostados dentro do frame)
+        tiles, masks = [], []
+        for y in tile_starts(y0, y1, tile_h, step_y):
+            y = min(max(0, y), height - tile_h)
+            for x in tile_starts(x0, x1, tile_w, step_x):
+                x = min(max(0, x), width - tile_w)
+                mask = None
+                if roi_mask is not None:
+                    mask = roi_mask[y:y + tile_h, x:x + tile_w]
+                    if not mask.any():
+                        continue
+                    if mask.all():
+                        mask = None
+                tiles.append((x, y, tile_w, tile_h))
+                masks.append(mask if self.mask_outside_roi else None)
+
+        full_grid_tiles = len(tile_starts(0, width, tile_w, step_x)) * \
+            len(tile_starts(0, height, tile_h, step_y))
+        self.plans[key] = (tiles, masks, full_grid_tiles)
+        logger.info(f"🧩 Mosaico {width}x{height}: {len(tiles)} blocos {tile_w}x{tile_h} por frame "
+                    f"({full_grid_tiles} no frame inteiro)")
+        return self.plans[key]
+
+    def _crop(self, frame, tile, mask):
+        x, y, w, h = tile
+        crop = frame[y:y + h, x:x + w]
+        if mask is None:
+            return crop
+        crop = crop.copy()
+        crop[mask == 0] = PAD_VALUE
+        return crop
+
+    def predict(self, frames, conf, iou, imgsz):
+        """Mesma interface dos backends: caixas (N, 6) por frame, em coordenadas do frame"""
+        if not frames:
+            return []
+        # Plano por frame: um lote pode misturar resoluções
+        plans = [self.plan(frame.shape) for frame in frames]
+        crops = [self._crop(frame, tile, mask)
+                 for frame, (tiles, masks, _) in zip(frames, plans)
+                 for tile, mask in zip(tiles, masks)]
+        start = time.perf_counter()
+        outputs = self.backend.predict(crops, conf=conf, iou=iou, imgsz=imgsz) if crops else []
+        self.predict_s += time.perf_counter() - start
+        self.frames += len(frames)
+        self.tile_count += len(crops)
+
+        results = []
+        offset = 0
+        for tiles, _, _ in plans:
+            parts = []
+            for t, (x, y, _, _) in enumerate(tiles):
+                boxes = outputs[offset + t]
+                if len(boxes):
+                    boxes = boxes.copy()
+                    boxes[:, [0, 2]] += x
+                    boxes[:, [1, 3]] += y
+                    parts.append(boxes)
+            offset += len(tiles)
+            merged = np.concatenate(parts) if parts else np.zeros((0, 6), dtype=np.float32)
+            results.append(merge_nms(merged, self.merge_threshold, self.merge_metric))
+        return results
+
+    def stats(self):
+        """Modelo de custo: blocos por frame e tempo por bloco"""
+        return {
+            'tile_size': self.tile_size,
+            'tiles_per_frame': round(self.tile_count / self.frames, 2) if self.frames else None,
+            'plans': {f"{width}x{height}": {'tiles': len(tiles), 'full_frame_tiles': full}
+                      for (height, width), (tiles, _, full) in self.plans.items()},
+            'frames': self.frames,
+            'tiles': self.tile_count,
+            'ms_per_tile': round(self.predict_s * 1000 / self.tile_count, 3) if self.tile_count else None,
+            'ms_per_frame': round(self.predict_s * 1000 / self.frames, 3) if self.frames else None
+        }
@@ -0,0 +1,188 @@
+"""
+Índice de frames de um vídeo (PTS e keyframes) e posicionamento exato
+
+O índice é construído uma vez - com PyAV, lendo só os pacotes, ou numa
+passada de grab() no OpenCV - e salvo ao lado do vídeo (`<vídeo>.idx.json`).
+FrameSeeker usa o índice para deixar uma VideoCapture exatamente num frame:
+CAP_PROP_POS_FRAMES sozinho não é preciso em H.264 com GOP longo, então cada
+salto confere o PTS de onde caiu e faz o resto com grab(). Sem índice, o PTS
+esperado vem do FPS.
+
+Usado pela captura de fotos (take_single_picture.py) e por VideoFileSource.
+"""
+
+import bisect
+import json
+import logging
+from pathlib import Path
+
+from lazy_imports import LazyModule, is_available
+
+cv2 = LazyModule('cv2')
+# PyAV (opcional): lê PTS e keyframes sem decodificar o vídeo
+av = LazyModule('av')
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.idx.json'
+
+# Saltos curtos para frente são feitos com grab(), mais preciso que reposicionar;
+# também é o primeiro recuo quando um salto passa do alvo
+MAX_GRAB_SKIP = 120
+
+
+def index_path(video_path):
+    """Caminho do índice de frames salvo ao lado do vídeo"""
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + INDEX_SUFFIX)
+
+
+def _index_pyav(video_path):
+    """PTS (ms) e keyframes lendo apenas os pacotes (sem decodificar)"""
+    with av.open(str(video_path)) as container:
+        stream = container.streams.video[0]
+        base = float(stream.time_base) * 1000
+        packets = []
+        for packet in container.demux(stream):
+            if packet.pts is not None:
+                packets.append((packet.pts * base, packet.is_keyframe))
+        fps = float(stream.average_rate or 0)
+
+    # Pacotes chegam em ordem de decodificação; frames seguem a ordem de exibição
+    packets.sort()
+    pts_ms = [round(pts, 3) for pts, _ in packets]
+    keyframes = [i for i, (_, key) in enumerate(packets) if key]
+    return fps, pts_ms, keyframes
+
+
+def _index_opencv(video_path):
+    """PTS (ms) com OpenCV: uma passada com grab(); keyframes desconhecidos"""
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    pts_ms = []
+    while cap.grab():
+        pts_ms.append(round(cap.get(cv2.CAP_PROP_POS_MSEC), 3))
+    cap.release()
+    return fps, pts_ms, []
+
+
+def cached_index(video_path):
+    """Índice já salvo e válido para o vídeo (mesmo tamanho e mtime), ou None"""
+    video_path = Path(video_path)
+    path = index_path(video_path)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    stat = video_path.stat()
+    if index.get('size') == stat.st_size and index.get('mtime') == stat.st_mtime:
+        return index
+    return None
+
+
+def build_index(video_path, force=False):
+    """Índice persistente (fps, total_frames, pts_ms, keyframes), construído uma vez"""
+    video_path = Path(video_path)
+    stat = video_path.stat()
+    path = index_path(video_path)
+
+    if not force and path.exists():
+        index = cached_index(video_path)
+        if index is not None:
+            return index
+        logger.warning(f"⚠️ Índice desatualizado, reconstruindo: {path.name}")
+
+    logger.info(f"🗂️ Construindo índice de frames de {video_path.name}...")
+    if is_available('av'):
+        fps, pts_ms, keyframes = _index_pyav(video_path)
+        source = 'pyav'
+    else:
+        fps, pts_ms, keyframes = _index_opencv(video_path)
+        source = 'opencv'
+
+    index = {
+        'video': video_path.name,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'fonte': source,
+        'fps': fps,
+        'total_frames': len(pts_ms),
+        'pts_ms': pts_ms,
+        'keyframes': keyframes
+    }
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    tmp_path.replace(path)
+
+    logger.info(f"✅ Índice salvo: {len(pts_ms)} frames, {len(keyframes)} keyframes ({source})")
+    return index
+
+
+def frame_at_second(index, second):
+    """Primeiro frame exibido a partir do segundo indicado"""
+    pts_ms = index['pts_ms']
+    if not pts_ms:
+        return 0
+    target = pts_ms[0] + second * 1000
+    return min(bisect.bisect_left(pts_ms, target - 0.5), len(pts_ms) - 1)
+
+
+def keyframe_before(keyframes, frame_index):
+    """Último keyframe em ou antes do frame (0 se não houver)"""
+    k = bisect.bisect_right(keyframes, frame_index) - 1
+    return keyframes[k] if k >= 0 else 0
+
+
+class FrameSeeker:
+    """Posiciona uma VideoCapture exatamente num frame, conferindo o PTS de cada salto"""
+
+    def __init__(self, cap, index=None, fps=None):
+        self.cap = cap
+        self.index = index or {}
+        self.fps = fps or self.index.get('fps') or cap.get(cv2.CAP_PROP_FPS) or 30.0
+        # PTS do primeiro frame segundo a própria captura (pode não ser zero)
+        self.pts_base = None
+
+    def landed_frame(self):
+        """Índice do último frame lido, pelo PTS (do índice ou, sem ele, pelo FPS)"""
+        elapsed = self.cap.get(cv2.CAP_PROP_POS_MSEC) - self.pts_base
+        pts_ms = self.index.get('pts_ms')
+        if pts_ms:
+            half_frame = 500 / self.fps
+            return min(bisect.bisect_left(pts_ms, pts_ms[0] + elapsed - half_frame), len(pts_ms) - 1)
+        return int(round(elapsed * self.fps / 1000))
+
+    def seek(self, frame_index):
+        """Deixa o próximo read() no frame indicado; False se não foi possível confirmar"""
+        if self.pts_base is None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.cap.grab()
+            self.pts_base = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if frame_index == 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return True
+
+        # Para no frame anterior ao alvo e confere onde caiu
+        previous = frame_index - 1
+        keyframes = self.index.get('keyframes') or []
+        back = 0
+        while True:
+            start = max(0, previous - back)
+            if keyframes:
+                # Com keyframes conhecidos, o salto é sempre para um keyframe
+                start = keyframe_before(keyframes, start)
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            landed = self.landed_frame() if self.cap.grab() else None
+
+            # Caiu antes do (ou no) anterior: avança com grab() e confere de novo
+            if landed is not None and landed <= previous:
+                for _ in range(previous - landed):
+                    if not self.cap.grab():
+                        break
+                if self.landed_frame() == previous:
+                    return True
+            if start == 0 or back >= previous:
+                return False
+            back = back * 4 if back else MAX_GRAB_SKIP
@@ -0,0 +1,48 @@
+"""
+Utilitários compartilhados de imagem e vídeo
+
+Extensões reconhecidas, IoU entre caixas, nome único de amostra por arquivo e
+a leitura amostrada de uma VideoCapture (grab() nos frames descartados), usados
+por fontes de frames, benchmark, índice de atividade, amostragem de datasets,
+rotulagem automática, cascata e trechos paralelos.
+"""
+
+import hashlib
+from pathlib import Path
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def box_iou(a, b):
+    """IoU entre duas caixas (x1, y1, x2, y2)"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def sample_name(path):
+    """Nome da amostra: stem + hash curto do caminho (a/cam1.mp4, b/cam1.mp4 e a/cam1.avi não colidem)"""
+    path = Path(path)
+    digest = hashlib.sha1(str(path.resolve()).encode('utf-8')).hexdigest()[:6]
+    return f"{path.stem}_{digest}"
+
+
+def iter_capture_samples(cap, sample_every=1):
+    """Frames (índice, frame) a cada `sample_every` de uma VideoCapture já aberta
+
+    Os frames descartados passam por grab(), sem decodificação completa nem
+    conversão de cor. Não libera a captura.
+    """
+    index = 0
+    while True:
+        if index % sample_every == 0:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield index, frame
+        elif not cap.grab():
+            return
+        index += 1
@@ -0,0 +1,62 @@
+"""
+Configuração comum dos testes: scripts/ no path e vídeo sintético numerado
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+# Modelo e vídeo reais para os testes de ponta a ponta (pulados sem eles)
+MODEL_PATH = os.environ.get('PACKAGE_TEST_MODEL')
+VIDEO_PATH = os.environ.get('PACKAGE_TEST_VIDEO')
+# Config base dos testes de ponta a ponta (linha de contagem do vídeo, por exemplo)
+CONFIG_PATH = Path(os.environ.get('PACKAGE_TEST_CONFIG') or Path(__file__).resolve().parent.parent / 'config.json')
+
+# Cada frame leva seu índice em 4 blocos de níveis de cinza (base 6)
+DIGITS = 4
+LEVEL_STEP = 50
+BLOCK = 32
+
+
+def encode_index(frame, index):
+    for d in range(DIGITS):
+        level = (index // 6 ** d) % 6 * LEVEL_STEP
+        frame[:BLOCK, d * BLOCK:(d + 1) * BLOCK] = level
+
+
+def decode_index(frame):
+    index = 0
+    for d in range(DIGITS):
+        block = frame[4:BLOCK - 4, d * BLOCK + 4:(d + 1) * BLOCK - 4]
+        index += int(round(block.mean() / LEVEL_STEP)) * 6 ** d
+    return index
+
+
+@pytest.fixture(scope='session')
+def numbered_video(tmp_path_factory):
+    """Vídeo de 400 frames (320x240, 30 FPS) com o índice gravado em cada frame"""
+    cv2 = pytest.importorskip('cv2')
+    np = pytest.importorskip('numpy')
+
+    path = tmp_path_factory.mktemp('video') / 'numbered.mp4'
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 30, (320, 240))
+    for index in range(400):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        encode_index(frame, index)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def require_model():
+    """Modelo real (PACKAGE_TEST_MODEL) e ultralytics, ou pula o teste"""
+    pytest.importorskip('torch')
+    pytest.importorskip('ultralytics')
+    if not MODEL_PATH or not Path(MODEL_PATH).exists():
+        pytest.skip("Defina PACKAGE_TEST_MODEL com um modelo .pt")
+    return Path(MODEL_PATH)
@@ -0,0 +1,42 @@
+"""
+Cache do índice de atividade: reaproveitado só com a mesma ROI e os mesmos parâmetros
+"""
+
+import shutil
+
+import pytest
+
+pytest.importorskip('cv2')
+
+from activity_index import get_activity_index, index_matches  # noqa: E402
+
+ROI = [[0, 40], [320, 40], [320, 200], [0, 200]]
+
+
+@pytest.fixture
+def video(tmp_path, numbered_video):
+    path = tmp_path / 'video.mp4'
+    shutil.copy(numbered_video, path)
+    return path
+
+
+def test_index_reused_with_same_roi_and_params(video):
+    first = get_activity_index(video, ROI, {'sample_every': 5, 'enabled': True})
+    # Tuplas (ROI de outro formato) e chaves alheias do config não invalidam o cache
+    again = get_activity_index(video, [tuple(p) for p in ROI], {'sample_every': 5})
+    assert again['index_time_s'] == first['index_time_s']
+    assert index_matches(again, ROI, {'sample_every': 5})
+
+
+@pytest.mark.parametrize('roi, settings', [
+    (None, {'sample_every': 5}),
+    ([[0, 0], [160, 0], [160, 120], [0, 120]], {'sample_every': 5}),
+    (ROI, {'sample_every': 3}),
+    (ROI, {'sample_every': 5, 'pixel_threshold': 40}),
+])
+def test_index_rebuilt_when_roi_or_params_change(video, roi, settings):
+    first = get_activity_index(video, ROI, {'sample_every': 5})
+    rebuilt = get_activity_index(video, roi, settings)
+    assert rebuilt['index_time_s'] != first['index_time_s']
+    assert index_matches(rebuilt, roi, settings)
+    assert not index_matches(rebuilt, ROI, {'sample_every': 5})
@@ -0,0 +1,60 @@
+"""
+Fontes do rotulador automático: intercaladas e com nomes únicos por caminho
+"""
+
+import shutil
+
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from auto_labeler import AutoLabeler, iter_sources, sample_name  # noqa: E402
+
+
+@pytest.fixture
+def sources(tmp_path, numbered_video):
+    """a/cam1.mp4, b/cam1.mp4 (mesmo nome) e duas pastas de imagens com img001.jpg"""
+    for folder in ('a', 'b'):
+        (tmp_path / folder).mkdir()
+        shutil.copy(numbered_video, tmp_path / folder / 'cam1.mp4')
+        (tmp_path / f"fotos_{folder}").mkdir()
+        cv2.imwrite(str(tmp_path / f"fotos_{folder}" / 'img001.jpg'), np.zeros((8, 8, 3), np.uint8))
+    return [tmp_path / 'a' / 'cam1.mp4', tmp_path / 'b' / 'cam1.mp4',
+            tmp_path / 'fotos_a', tmp_path / 'fotos_b']
+
+
+def test_sample_names_are_unique_per_source(sources):
+    names = [name for name, _ in iter_sources(sources, sample_every=100)]
+    assert len(names) == len(set(names)) == 2 * 4 + 2
+    assert sample_name(sources[0]) != sample_name(sources[1])
+    assert sample_name(sources[0]).startswith('cam1_')
+
+
+def test_sources_are_interleaved(sources):
+    names = [name for name, _ in iter_sources(sources, sample_every=100)]
+    first, second = sample_name(sources[0]), sample_name(sources[1])
+    # Um item de cada fonte por rodada, não um vídeo inteiro depois do outro
+    assert names[:4] == [f"{first}_000000", f"{second}_000000", sample_name(sources[2] / 'img001.jpg'),
+                         sample_name(sources[3] / 'img001.jpg')]
+    assert names[4:] == [f"{first}_000100", f"{second}_000100", f"{first}_000200", f"{second}_000200",
+                         f"{first}_000300", f"{second}_000300"]
+
+
+
+def test_open_sources_are_bounded(sources):
+    names = [name for name, _ in iter_sources(sources, sample_every=100, max_open=2)]
+    first, second = sample_name(sources[0]), sample_name(sources[1])
+    # As pastas de imagens só abrem quando os dois vídeos terminam
+    assert names[:8] == [f"{video}_{index:06d}" for index in (0, 100, 200, 300)
+                         for video in (first, second)]
+    assert names[8:] == [sample_name(sources[2] / 'img001.jpg'), sample_name(sources[3] / 'img001.jpg')]
+
+def test_quota_is_shared_between_sources(sources):
+    labeler = AutoLabeler(None, sources[0].parent.parent / 'dataset', max_per_stratum=4)
+    kept = []
+    empty = np.zeros((0, 6), dtype=np.float32)
+    for name, _ in iter_sources(sources[:2], sample_every=50):
+        if labeler._select(empty) is not None:
+            kept.append(name.rsplit('_', 1)[0])
+    assert kept.count(sample_name(sources[0])) == kept.count(sample_name(sources[1])) == 2
@@ -0,0 +1,109 @@
+"""
+Pareamento de detecções, relatório de paridade e chave do cache de exportação
+
+O teste de paridade entre backends roda de ponta a ponta com o modelo de
+PACKAGE_TEST_MODEL; é pulado sem ele ou sem o runtime do backend.
+"""
+
+import json
+
+import pytest
+
+from benchmark_inference import box_iou, compare_detections, match_detections
+from conftest import CONFIG_PATH, VIDEO_PATH, require_model
+from inference_backends import EXPORT_CACHE_DIR, export_cache_path
+
+
+def det(x1, y1, x2, y2, confidence=0.9, class_id=0):
+    return {'bbox': [x1, y1, x2, y2], 'confidence': confidence, 'class_id': class_id}
+
+
+def test_box_iou():
+    assert box_iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+    assert box_iou([0, 0, 10, 10], [20, 20, 30, 30]) == 0.0
+    assert box_iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(50 / 150)
+
+
+def test_match_detections_pairs_by_iou_and_class():
+    reference = [det(0, 0, 10, 10), det(50, 50, 60, 60), det(100, 100, 110, 110, class_id=1)]
+    candidate = [det(51, 50, 61, 60), det(0, 0, 10, 11), det(100, 100, 110, 110, class_id=2)]
+    pairs, missed, extra = match_detections(reference, candidate)
+    assert [(ref['bbox'], cand['bbox']) for ref, cand, _ in pairs] == [
+        ([0, 0, 10, 10], [0, 0, 10, 11]), ([50, 50, 60, 60], [51, 50, 61, 60])]
+    # Mesma caixa com outra classe não pareia
+    assert (missed, extra) == (1, 1)
+
+
+def test_match_detections_is_greedy_by_confidence():
+    # A referência mais confiante fica com o candidato de maior IoU
+    reference = [det(0, 0, 10, 10, confidence=0.5), det(1, 0, 11, 10, confidence=0.9)]
+    candidate = [det(1, 0, 11, 10)]
+    pairs, missed, extra = match_detections(reference, candidate)
+    assert pairs[0][0]['confidence'] == 0.9 and pairs[0][2] == 1.0
+    assert (missed, extra) == (1, 0)
+
+
+def test_match_detections_respects_threshold():
+    pairs, missed, extra = match_detections([det(0, 0, 10, 10)], [det(5, 0, 15, 10)], iou_threshold=0.5)
+    assert pairs == [] and (missed, extra) == (1, 1)
+
+
+def test_compare_detections_identical_frames_have_parity():
+    frames = [[det(0, 0, 10, 10)], [], [det(5, 5, 20, 20, 0.7), det(40, 40, 50, 50, 0.6)]]
+    report = compare_detections(frames, json.loads(json.dumps(frames)))
+    assert report['parity']
+    assert report['matched'] == report['reference_detections'] == 3
+    assert report['min_iou'] == 1.0 and report['max_conf_diff'] == 0.0
+
+
+@pytest.mark.parametrize('candidate, field', [
+    ([[det(0, 0, 10, 10, confidence=0.95)]], 'max_conf_diff'),
+    ([[det(0, 0, 10, 10.6)]], 'min_iou'),
+    ([[det(0, 0, 10, 10), det(30, 30, 40, 40)]], 'extra'),
+    ([[]], 'missed'),
+])
+def test_compare_detections_flags_each_difference(candidate, field):
+    report = compare_detections([[det(0, 0, 10, 10)]], candidate)
+    assert not report['parity']
+    baseline = compare_detections([[det(0, 0, 10, 10)]], [[det(0, 0, 10, 10)]])
+    assert report[field] != baseline[field]
+
+
+def test_export_cache_path_keys(tmp_path):
+    model = tmp_path / 'modelo.pt'
+    model.write_bytes(b'pesos v1')
+    onnx = export_cache_path(model, 'onnx', 640, 1)
+    assert onnx.parent == tmp_path / EXPORT_CACHE_DIR
+    assert onnx.suffix == '.onnx'
+    assert export_cache_path(model, 'openvino', 640, 1).name.endswith('_openvino_model')
+
+    # Cada parâmetro da exportação muda a chave
+    variants = {onnx.name,
+                export_cache_path(model, 'onnx', 320, 1).name,
+                export_cache_path(model, 'onnx', 640, 4).name,
+                export_cache_path(model, 'onnx', 640, 1, tag='_int8').name}
+    assert len(variants) == 4
+    assert export_cache_path(model, 'onnx', 640, 1) == onnx
+
+    # Pesos novos no mesmo caminho: outro artefato
+    model.write_bytes(b'pesos v2')
+    assert export_cache_path(model, 'onnx', 640, 1) != onnx
+
+    with pytest.raises(ValueError):
+        export_cache_path(model, 'torch', 640, 1)
+
+
+@pytest.mark.parametrize('backend, runtime', [('onnx', 'onnxruntime'), ('openvino', 'openvino')])
+def test_backend_parity_with_torch(tmp_path, numbered_video, backend, runtime):
+    model_path = require_model()
+    pytest.importorskip(runtime)
+    from benchmark_inference import benchmark_backends, load_frames
+    from package_detector_tracker import PackageDetector
+
+    model = tmp_path / model_path.name
+    model.write_bytes(model_path.read_bytes())
+    detector = PackageDetector(model, None, CONFIG_PATH)
+    frames = load_frames(VIDEO_PATH or numbered_video, limit=16)
+
+    results = benchmark_backends(detector, ['torch', backend], frames)
+    assert results[backend]['parity']['parity'], results[backend]['parity']
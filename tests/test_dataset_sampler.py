@@ -0,0 +1,29 @@
+"""
+Amostragem de datasets: vídeos de mesmo nome não sobrescrevem as fotos uns dos outros
+"""
+
+import shutil
+
+import pytest
+
+pytest.importorskip('cv2')
+pytest.importorskip('numpy')
+
+from dataset_sampler import amostrar_video  # noqa: E402
+
+
+def test_same_stem_videos_keep_separate_photos(numbered_video, tmp_path):
+    videos = [tmp_path / 'a.mp4', tmp_path / 'a.avi', tmp_path / 'outra' / 'a.mp4']
+    for video in videos:
+        video.parent.mkdir(exist_ok=True)
+        shutil.copy(numbered_video, video)
+
+    destino = tmp_path / 'fotos'
+    nomes = []
+    for video in videos:
+        resultado = amostrar_video(video, destino, intervalo=5.0, limiar=-1)
+        assert resultado['mantidos']
+        nomes.extend(entrada['arquivo'] for entrada in resultado['mantidos'])
+
+    assert len(nomes) == len(set(nomes))
+    assert sorted(p.name for p in destino.iterdir()) == sorted(nomes)
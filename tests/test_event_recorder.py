@@ -0,0 +1,40 @@
+"""
+Clipes por evento: pré-roll + frames seguintes gravados direto no VideoWriter
+"""
+
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from event_recorder import EventRecorder  # noqa: E402
+
+
+def test_clip_streams_pre_roll_and_post_roll(tmp_path):
+    recorder = EventRecorder(tmp_path, fps=10, pre_roll=5, post_roll=4, scale=1.0,
+                             events=('line_crossing',))
+    for index in range(30):
+        frame = np.full((64, 80, 3), index * 8, dtype=np.uint8)
+        recorder.update(index, frame, [], crossed=[7] if index == 10 else ())
+        if recorder.clip is not None:
+            # Nada acumula na memória além da fila curta da thread de escrita
+            assert not recorder.ring
+            assert isinstance(recorder.clip['frames'], int)
+    recorder.close()
+
+    entries = [json.loads(line) for line in (tmp_path / 'events.jsonl').read_text().splitlines()]
+    assert len(entries) == 1
+    entry = entries[0]
+    assert (entry['start_frame'], entry['end_frame'], entry['frames']) == (6, 14, 9)
+    assert entry['events'][0]['track_id'] == 7
+
+    cap = cv2.VideoCapture(str(tmp_path / entry['clip']))
+    count = 0
+    while cap.read()[0]:
+        count += 1
+    cap.release()
+    assert count == 9
+    assert not list(tmp_path.glob('*.tmp*'))
+    assert recorder.stats()['clip_frames'] == 9
@@ -0,0 +1,95 @@
+"""
+Posicionamento exato de VideoFileSource (retomada e trechos paralelos dependem dele)
+e encerramento da leitura antecipada
+"""
+
+import pytest
+
+from conftest import decode_index
+
+cv2 = pytest.importorskip('cv2')
+
+from frame_sources import Prefetcher, VideoFileSource  # noqa: E402
+from video_index import build_index  # noqa: E402
+
+TARGETS = [10, 200, 150, 0, 399, 260, 130]
+
+
+class ImpreciseCapture:
+    """VideoCapture cujo CAP_PROP_POS_FRAMES cai `offset` frames fora do pedido"""
+
+    def __init__(self, cap, offset):
+        self.cap = cap
+        self.offset = offset
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES and value > 0:
+            value = max(0, value + self.offset)
+        return self.cap.set(prop, value)
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+def read_targets(source):
+    landed = []
+    for target in TARGETS:
+        source.seek(target)
+        ret, frame = source.read()
+        assert ret
+        landed.append(decode_index(frame))
+    return landed
+
+
+def test_numbered_video_decodes_sequentially(numbered_video):
+    source = VideoFileSource(numbered_video)
+    indexes = []
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        indexes.append(decode_index(frame))
+    source.release()
+    assert indexes == list(range(400))
+
+
+def test_seek_lands_on_exact_frame(numbered_video):
+    source = VideoFileSource(numbered_video)
+    assert read_targets(source) == TARGETS
+    source.release()
+
+
+@pytest.mark.parametrize('offset', [-13, 7, 40])
+def test_seek_corrects_imprecise_position(numbered_video, offset):
+    source = VideoFileSource(numbered_video)
+    source.cap = ImpreciseCapture(source.cap, offset)
+    assert read_targets(source) == TARGETS
+    source.release()
+
+
+@pytest.mark.parametrize('offset', [-13, 40])
+def test_seek_with_saved_index(tmp_path, numbered_video, offset):
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(numbered_video.read_bytes())
+    assert build_index(video)['total_frames'] == 400
+    source = VideoFileSource(video)
+    source.cap = ImpreciseCapture(source.cap, offset)
+    assert read_targets(source) == TARGETS
+    source.release()
+
+def test_prefetcher_close_releases_producer():
+    released = []
+
+    def frames():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            released.append(True)
+
+    loader = Prefetcher(frames(), maxsize=2)
+    for item in loader:
+        break
+    loader.close()
+    assert not loader.thread.is_alive()
+    assert released == [True]
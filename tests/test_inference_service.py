@@ -0,0 +1,64 @@
+"""
+Serviço de inferência: fila limitada recusa pedidos com 503, cabeçalhos inválidos dão 400
+"""
+
+import asyncio
+import threading
+
+from inference_service import InferenceService, MicroBatcher, RequestError
+
+
+class BlockingDetector:
+    """Detector que só responde quando liberado"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def detect_packages_batch(self, frames):
+        self.release.wait(5)
+        return [[] for _ in frames]
+
+
+def test_full_queue_rejects_with_503():
+    async def scenario():
+        detector = BlockingDetector()
+        batcher = MicroBatcher(detector, max_batch_size=1, max_wait_ms=0, max_queue=2)
+        batcher.start()
+        # O primeiro pedido ocupa o modelo; os dois seguintes enchem a fila
+        pending = [asyncio.ensure_future(batcher.submit(0))]
+        await asyncio.sleep(0.05)
+        pending += [asyncio.ensure_future(batcher.submit(i)) for i in (1, 2)]
+        await asyncio.sleep(0.05)
+        try:
+            await batcher.submit(3)
+        except RequestError as e:
+            status = e.status
+        else:
+            status = None
+        detector.release.set()
+        results = await asyncio.gather(*pending)
+        await batcher.stop()
+        return status, results, batcher.metrics()
+
+    status, results, metrics = asyncio.run(scenario())
+    assert status == 503
+    assert len(results) == 3
+    assert metrics['rejected'] == 1
+    assert metrics['max_queue'] == 2
+
+
+def test_invalid_content_length_is_a_bad_request():
+    async def scenario(length):
+        service = InferenceService(BlockingDetector())
+        reader = asyncio.StreamReader()
+        reader.feed_data(f"POST /detect HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+        reader.feed_eof()
+        try:
+            await service._read_request(reader)
+        except RequestError as e:
+            return e.status
+        finally:
+            service.batcher.executor.shutdown()
+
+    assert asyncio.run(scenario('abc')) == 400
+    assert asyncio.run(scenario('-5')) == 400
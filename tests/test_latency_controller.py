@@ -0,0 +1,43 @@
+"""
+Controlador de latência: p95 da janela e volta de nível contada em frames
+"""
+
+from latency_controller import LatencySLOController, percentile
+
+LEVELS = [{'input_size': 640, 'detection_stride': 1, 'batch_size': 1},
+          {'input_size': 480, 'detection_stride': 1, 'batch_size': 1}]
+
+
+def test_p95_uses_nearest_rank():
+    controller = LatencySLOController(100, LEVELS, window=20)
+    for latency in range(1, 21):
+        controller.latencies.append(latency)
+    # Posto ceil(0.95 * 20) = 19, não o 18º valor
+    assert controller.metrics()['p95_latency_ms'] == 19
+
+    controller.latencies.clear()
+    controller.latencies.append(7)
+    assert controller.metrics()['p95_latency_ms'] == 7
+
+
+def test_percentile_nearest_rank():
+    values = list(range(20, 0, -1))
+    assert percentile(values, 0.95) == 19
+    assert percentile(values, 0.5) == 10
+    assert percentile([], 0.95) == 0.0
+    assert percentile([3.5], 0.0) == 3.5
+
+
+def _restore_frame(batch_size):
+    controller = LatencySLOController(100, LEVELS, window=10, cooldown=0, restore_windows=3)
+    controller.level = 1
+    for _ in range(100):
+        if controller.update(10, frames=batch_size) is not None:
+            return controller.frames_seen
+    return None
+
+
+def test_restore_waits_the_same_frames_for_any_batch_size():
+    # restore_windows x window = 30 frames de folga, com lote 1 ou 5
+    assert _restore_frame(1) == 30
+    assert _restore_frame(5) == 30
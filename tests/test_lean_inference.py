@@ -0,0 +1,96 @@
+"""
+Backend torch_lean: decodificação da saída bruta e paridade com o caminho padrão
+
+A paridade roda de ponta a ponta com o modelo de PACKAGE_TEST_MODEL; é
+pulada sem torch, ultralytics ou o modelo.
+"""
+
+from collections import OrderedDict
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from conftest import CONFIG_PATH, VIDEO_PATH, require_model  # noqa: E402
+from lean_inference import MAX_BUFFERS, LeanTorchBackend  # noqa: E402
+
+
+def raw_output(boxes, num_classes=2, anchors=8):
+    """Saída (4 + classes, âncoras) com as caixas (cx, cy, w, h, classe, conf) nas primeiras âncoras"""
+    output = np.zeros((4 + num_classes, anchors), dtype=np.float32)
+    for i, (cx, cy, w, h, class_id, conf) in enumerate(boxes):
+        output[:4, i] = cx, cy, w, h
+        output[4 + class_id, i] = conf
+    return output
+
+
+@pytest.fixture
+def backend():
+    # Só a decodificação e os buffers: sem carregar modelo
+    pytest.importorskip('torch')
+    pytest.importorskip('torchvision')
+    backend = LeanTorchBackend.__new__(LeanTorchBackend)
+    backend.num_classes = 2
+    backend.channels_last = False
+    backend.buffers = OrderedDict()
+    return backend
+
+
+def test_decode_maps_back_to_frame(backend):
+    output = raw_output([(320, 320, 100, 50, 0, 0.9)])
+    # Frame 1280x720 em letterbox 640: escala 0.5, pad vertical 140
+    boxes = backend.decode(output, conf=0.25, iou=0.5, scale=0.5, pad=(0, 140), shape=(720, 1280))
+    assert boxes.shape == (1, 6)
+    np.testing.assert_allclose(boxes[0], [540, 310, 740, 410, 0.9, 0], rtol=1e-5)
+
+
+def test_decode_filters_confidence_and_runs_nms_per_class(backend):
+    output = raw_output([
+        (100, 100, 40, 40, 0, 0.9),
+        (102, 100, 40, 40, 0, 0.8),   # duplicata da primeira
+        (102, 100, 40, 40, 1, 0.7),   # mesma região, outra classe
+        (300, 300, 40, 40, 0, 0.1),   # abaixo do limiar
+    ])
+    boxes = backend.decode(output, conf=0.25, iou=0.5, scale=1.0, pad=(0, 0), shape=(640, 640))
+    assert sorted(boxes[:, 5].tolist()) == [0, 1]
+    assert boxes[boxes[:, 5] == 0][0, 4] == pytest.approx(0.9)
+
+
+def test_decode_without_candidates(backend):
+    boxes = backend.decode(raw_output([]), conf=0.25, iou=0.5, scale=1.0, pad=(0, 0), shape=(640, 640))
+    assert boxes.shape == (0, 6)
+
+
+def test_input_buffers_are_bounded(backend):
+    first = backend._buffer((1, 3, 320, 320))
+    for size in range(352, 352 + 32 * MAX_BUFFERS, 32):
+        backend._buffer((1, 3, size, size))
+    assert len(backend.buffers) == MAX_BUFFERS
+    # O formato mais antigo saiu e é realocado
+    assert backend._buffer((1, 3, 320, 320))[0] is not first[0]
+    # O mais recente é reaproveitado
+    latest = backend._buffer((1, 3, 320, 320))
+    assert backend._buffer((1, 3, 320, 320))[0] is latest[0]
+
+
+@pytest.mark.parametrize('channels_last', [False, True])
+def test_parity_with_torch_backend(numbered_video, channels_last):
+    model_path = require_model()
+    from benchmark_inference import compare_detections, load_frames, run_detector
+    from inference_backends import create_backend
+    from package_detector_tracker import PackageDetector
+    from runtime_profile import apply_model_profile
+
+    detector = PackageDetector(model_path, None, CONFIG_PATH)
+    frames = load_frames(VIDEO_PATH or numbered_video, limit=16)
+
+    detector.backend = create_backend('torch', model_path, detector.input_size, detector.batch_size)
+    reference, _ = run_detector(detector, frames)
+
+    detector.backend = create_backend('torch_lean', model_path, detector.input_size, detector.batch_size)
+    if channels_last:
+        assert apply_model_profile(detector.backend, {'channels_last': True})['channels_last']
+    lean, _ = run_detector(detector, frames)
+
+    report = compare_detections(reference, lean)
+    assert report['parity'], report
@@ -0,0 +1,25 @@
+"""
+Portão de movimento: ROI parcialmente ou totalmente fora do frame
+"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from motion_gate import MotionGate  # noqa: E402
+
+
+def test_roi_partly_off_frame_is_clipped():
+    gate = MotionGate([[-50, -20], [150, -20], [150, 100], [-50, 100]], scale=0.5)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    gate.motion_score(frame)
+    assert gate.crop == (0, 0, 151, 101)
+    assert gate.mask.shape == (50, 75)
+    assert gate.mask.any()
+
+
+def test_roi_off_frame_is_rejected():
+    gate = MotionGate([[200, 10], [260, 10], [260, 60], [200, 60]])
+    with pytest.raises(ValueError, match='fora do frame'):
+        gate.motion_score(np.zeros((120, 160, 3), dtype=np.uint8))
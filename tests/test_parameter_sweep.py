@@ -0,0 +1,39 @@
+"""
+Varredura de parâmetros: limiares abaixo do piso do cache e ROI padrão do detector
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('cv2')
+
+from parameter_sweep import check_confidence_grid, replay_video, run_sweep  # noqa: E402
+
+ROI = [[0, 0], [100, 0], [100, 100], [0, 100]]
+
+
+def _entries():
+    # Uma caixa dentro da ROI e outra fora, paradas por 5 frames
+    boxes = np.array([[10, 10, 30, 30, 0.9, 0], [200, 10, 220, 30, 0.9, 0]], dtype=np.float32)
+    return {index: boxes for index in range(5)}
+
+
+def test_confidence_below_floor_rejected():
+    check_confidence_grid({'confidence_threshold': [0.05, 0.5, None]}, 0.05)
+    with pytest.raises(ValueError, match='0.01'):
+        check_confidence_grid({'confidence_threshold': [0.01, 0.5]}, 0.05)
+
+
+def test_sweep_checks_floor_before_inference():
+    detector = SimpleNamespace(detection_cache_floor=lambda: 0.05, roi_data=None)
+    with pytest.raises(ValueError):
+        run_sweep(detector, ['nao_existe.mp4'], {'confidence_threshold': [0.02]})
+
+
+def test_default_roi_filters_boxes():
+    full = replay_video(_entries(), 5, {})
+    restricted = replay_video(_entries(), 5, {}, default_roi=ROI)
+    assert full['tracks'] == 2
+    assert restricted['tracks'] == 1
@@ -0,0 +1,45 @@
+"""
+Imagens avulsas: resultados dentro da pasta de saída e anotadas sem sobrescrita
+
+Pulado sem o modelo de PACKAGE_TEST_MODEL.
+"""
+
+import json
+import os
+
+import pytest
+
+from conftest import CONFIG_PATH, require_model
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+
+def test_same_named_images_are_kept_apart(tmp_path):
+    model_path = require_model()
+    from package_detector_tracker import PackageDetector
+
+    paths = []
+    for folder, value in (('a', 40), ('b', 200)):
+        (tmp_path / folder).mkdir()
+        path = tmp_path / folder / 'img001.jpg'
+        cv2.imwrite(str(path), np.full((64, 64, 3), value, dtype=np.uint8))
+        paths.append(path)
+
+    annotated = tmp_path / 'anotadas'
+    workdir = tmp_path / 'trabalho'
+    workdir.mkdir()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        detector = PackageDetector(model_path, None, CONFIG_PATH)
+        results = detector.process_images(paths, annotated_dir=annotated)
+    finally:
+        os.chdir(cwd)
+
+    assert results['images_processed'] == 2
+    assert sorted(p.name for p in annotated.glob('*.jpg')) == ['img001.jpg', 'img001_1.jpg']
+    results_path = annotated / 'images_detections.jsonl'
+    assert results['results_path'] == str(results_path)
+    lines = results_path.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['image'] for line in lines] == [str(p) for p in paths]
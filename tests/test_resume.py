@@ -0,0 +1,75 @@
+"""
+Retomada do checkpoint: mesmos IDs de rastro e mesma contagem da execução sem interrupção
+
+Roda de ponta a ponta com o modelo de PACKAGE_TEST_MODEL, no vídeo de
+PACKAGE_TEST_VIDEO (ou no vídeo sintético) e com o config de PACKAGE_TEST_CONFIG
+(ou o config.json do repositório); pulado sem o modelo.
+"""
+
+import json
+import shutil
+import pytest
+
+from conftest import CONFIG_PATH, VIDEO_PATH, require_model
+
+CHECKPOINT_EVERY = 50
+
+
+class Interrupted(Exception):
+    pass
+
+
+def make_config(tmp_path, checkpoint):
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['checkpoint'] = {'enabled': checkpoint, 'every_frames': CHECKPOINT_EVERY}
+    # Adaptativos (tempo de execução) mudariam as detecções entre as execuções
+    for name in ('latency_controller', 'model_cascade', 'event_recorder', 'crop_gallery',
+                 'detection_cache'):
+        config[name] = {'enabled': False}
+    path = tmp_path / f"config_{'checkpoint' if checkpoint else 'plain'}.json"
+    path.write_text(json.dumps(config), encoding='utf-8')
+    return path
+
+
+def run(model_path, config_path, video, output=None, resume=False, stop_at=None):
+    from package_detector_tracker import PackageDetector
+
+    frames = {}
+
+    def record(index, detections):
+        if stop_at is not None and index >= stop_at:
+            raise Interrupted()
+        frames[index] = [(tuple(d['bbox']), d.get('track_id')) for d in detections]
+
+    detector = PackageDetector(model_path, None, config_path)
+    results = detector.process_video(str(video), output, resume=resume, show_preview=False,
+                                     on_frame=record)
+    results['history_counts'] = [entry['count'] for entry in detector.stats['detection_history']]
+    results['minute_counts'] = [entry['count'] for entry in detector.stats['packages_per_minute']]
+    return results, frames
+
+
+def test_resume_matches_uninterrupted_run(tmp_path, numbered_video):
+    model_path = require_model()
+    video = tmp_path / 'video.mp4'
+    shutil.copy(VIDEO_PATH or numbered_video, video)
+    output = str(tmp_path / 'saida.mp4')
+
+    full, full_frames = run(model_path, make_config(tmp_path, False), video)
+    total = max(full_frames) + 1
+    stop_at = total // 2 + CHECKPOINT_EVERY // 3
+
+    config_path = make_config(tmp_path, True)
+    with pytest.raises(Interrupted):
+        run(model_path, config_path, video, output, stop_at=stop_at)
+    resumed, resumed_frames = run(model_path, config_path, video, output, resume=True)
+
+    assert resumed['resumed_from'] and 0 < resumed['resumed_from'] <= stop_at
+    assert resumed_frames == {i: full_frames[i] for i in resumed_frames}
+    assert max(resumed_frames) == max(full_frames)
+    assert resumed['total_packages'] == full['total_packages']
+    assert resumed.get('line_counts') == full.get('line_counts')
+    # Histórico e contagem por minuto também vêm do checkpoint
+    assert resumed['history_counts'] == full['history_counts']
+    assert resumed['minute_counts'] == full['minute_counts']
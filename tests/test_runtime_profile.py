@@ -0,0 +1,30 @@
+"""
+Perfil de execução: sem ajustes de torch, o torch não é importado
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS = Path(__file__).resolve().parent.parent / 'scripts'
+
+
+def _run(settings):
+    pytest.importorskip('cv2')
+    code = ("import sys; from runtime_profile import apply_runtime_profile; "
+            f"effective = apply_runtime_profile({settings!r}); "
+            "print('torch' in sys.modules, effective['torch_threads'])")
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS, capture_output=True,
+                            text=True, check=True)
+    return result.stdout.split()
+
+
+def test_profile_without_torch_settings_skips_torch():
+    assert _run({'opencv_threads': 1}) == ['False', 'None']
+
+
+def test_profile_with_torch_threads_applies_them():
+    pytest.importorskip('torch')
+    assert _run({'torch_threads': 2}) == ['True', '2']
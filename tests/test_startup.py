@@ -0,0 +1,20 @@
+"""
+Inicialização: importar o detector não carrega pacotes pesados nem recursos opcionais
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent.parent / 'scripts'
+
+DEFERRED = ('av', 'cv2', 'numpy', 'torch', 'ultralytics', 'activity_index', 'auto_labeler',
+            'shm_pipeline')
+
+
+def test_import_defers_heavy_modules():
+    code = ("import sys, package_detector_tracker; "
+            f"print(','.join(m for m in {DEFERRED!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS, capture_output=True,
+                            text=True, check=True)
+    assert result.stdout.strip() == ''